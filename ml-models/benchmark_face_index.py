@@ -0,0 +1,84 @@
+"""
+Face Index Benchmark
+=====================
+Measures FaceIndex search latency and recall against exact search.
+
+Galleries are synthetic: one random template per student, with queries
+formed by adding noise to an enrolled template (a new selfie of the same
+person). Recall@k is the fraction of exact top-k neighbours the IVF index
+also returns.
+
+Usage:
+    python benchmark_face_index.py --size 50000 --dim 512 --queries 500
+"""
+
+import time
+import argparse
+
+import numpy as np
+
+from services.face_index import FaceIndex
+
+
+def make_gallery(size: int, dim: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    templates = rng.standard_normal((size, dim)).astype(np.float32)
+    return [f"S{i:07d}" for i in range(size)], templates
+
+
+def make_queries(templates: np.ndarray, count: int, noise: float, seed: int = 1) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(templates), count, replace=False)
+    norms = np.linalg.norm(templates[picks], axis=1, keepdims=True)
+    return templates[picks] + noise * norms / np.sqrt(templates.shape[1]) * rng.standard_normal(
+        (count, templates.shape[1])).astype(np.float32)
+
+
+def timed_search(index: FaceIndex, queries: np.ndarray, k: int, exact: bool):
+    start = time.perf_counter()
+    results = [index.search(q, k=k, exact=exact) for q in queries]
+    return results, (time.perf_counter() - start) * 1000.0 / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark FaceIndex recall and latency")
+    parser.add_argument("--size", type=int, default=50000, help="Enrolled students")
+    parser.add_argument("--dim", type=int, default=512, help="Embedding size")
+    parser.add_argument("--queries", type=int, default=500, help="Number of queries")
+    parser.add_argument("--k", type=int, default=5, help="Neighbours per query")
+    parser.add_argument("--noise", type=float, default=0.8, help="Selfie noise relative to template norm")
+    parser.add_argument("--n-lists", type=int, default=None, help="IVF partitions (default ~sqrt(size))")
+    parser.add_argument("--n-probe", type=int, nargs="+", default=[1, 4, 8, 16, 32], help="Probe counts to test")
+    args = parser.parse_args()
+
+    ids, templates = make_gallery(args.size, args.dim)
+    queries = make_queries(templates, args.queries, args.noise)
+
+    index = FaceIndex(ivf_min_size=0, n_lists=args.n_lists)
+    start = time.perf_counter()
+    index.add(ids, templates)
+    index.build()
+    build_s = time.perf_counter() - start
+    stats = index.stats()
+
+    print(f"Gallery: {args.size} x {args.dim}, {args.queries} queries, k={args.k}")
+    print(f"IVF build: {build_s:.2f}s, {stats['n_lists']} lists")
+    print()
+
+    exact, exact_ms = timed_search(index, queries, args.k, exact=True)
+    print(f"{'search':<14}{'ms/query':>10}{'recall@1':>10}{'recall@k':>10}")
+    print(f"{'exact':<14}{exact_ms:>10.3f}{1.0:>10.3f}{1.0:>10.3f}")
+
+    for n_probe in args.n_probe:
+        index.n_probe = n_probe
+        approx, approx_ms = timed_search(index, queries, args.k, exact=False)
+        recall_1 = np.mean([bool(a) and a[0][0] == e[0][0] for a, e in zip(approx, exact)])
+        recall_k = np.mean([
+            len({sid for sid, _ in a} & {sid for sid, _ in e}) / max(1, len(e))
+            for a, e in zip(approx, exact)
+        ])
+        print(f"{'ivf nprobe=' + str(n_probe):<14}{approx_ms:>10.3f}{recall_1:>10.3f}{recall_k:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
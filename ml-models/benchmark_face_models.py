@@ -0,0 +1,357 @@
+"""
+Face Model Benchmark
+=====================
+Measures every supported face model on a labelled set of selfie/profile
+pairs, so MODEL_THRESHOLDS can be reproduced and the fastest model that
+meets the accuracy bar can be chosen.
+
+Dataset layout (one folder per person):
+    <dataset>/<person>/selfie*.jpg    - live selfies
+    <dataset>/<person>/profile*.jpg   - profile / ID photos
+
+Every selfie is paired with its own person's profile photos (genuine) and
+with the other people's profile photos (impostor). Alternatively, pass
+--pairs with a CSV of explicit `selfie,profile,label` rows (label 1 =
+same person, 0 = different; paths relative to the dataset directory).
+
+Each model runs in its own process so peak memory is measured per model.
+
+--backends compares embedding backends of the same model: the DeepFace
+(Keras) path against the ONNX exports (export_face_models.py) run with
+ONNX Runtime (FP32 or INT8) or cv2.dnn (FP32). Besides latency and memory, the
+report then shows how far each backend's embeddings drift from DeepFace's
+(cosine distance between the two embeddings of the same image).
+
+Usage:
+    python benchmark_face_models.py <dataset> --output benchmarks/face_models.md
+    python benchmark_face_models.py <dataset> --models SFace ArcFace --batch-size 16
+    python benchmark_face_models.py <dataset> --models Facenet512 --backends deepface onnxruntime onnxruntime-int8
+"""
+
+import os
+import csv
+import sys
+import json
+import time
+import queue
+import argparse
+import itertools
+import multiprocessing
+from datetime import datetime
+from typing import Dict, Any, List, Tuple
+
+import numpy as np
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".bmp")
+
+# (selfie path, profile path, 1 = same person / 0 = different)
+Pair = Tuple[str, str, int]
+
+# --backends choices -> FaceVerifier keyword arguments
+BACKENDS = {
+    "deepface": {},
+    "onnxruntime": {"embedding_backend": "onnxruntime"},
+    "onnxruntime-int8": {"embedding_backend": "onnxruntime", "onnx_int8": True},
+    "opencv-dnn": {"embedding_backend": "opencv-dnn"},
+}
+
+
+def load_pairs(dataset: str, pairs_csv: str = None) -> List[Pair]:
+    """Builds the labelled pair list from a CSV or from the per-person folder layout."""
+    if pairs_csv:
+        with open(pairs_csv, newline="", encoding="utf-8") as f:
+            return [(os.path.join(dataset, row["selfie"]), os.path.join(dataset, row["profile"]), int(row["label"]))
+                    for row in csv.DictReader(f)]
+
+    selfies, profiles = {}, {}
+    for person in sorted(os.listdir(dataset)):
+        folder = os.path.join(dataset, person)
+        if not os.path.isdir(folder):
+            continue
+        for name in sorted(os.listdir(folder)):
+            if not name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            kind = selfies if name.lower().startswith("selfie") else profiles if name.lower().startswith("profile") else None
+            if kind is not None:
+                kind.setdefault(person, []).append(os.path.join(folder, name))
+
+    pairs = []
+    for person, person_selfies in selfies.items():
+        for other, other_profiles in profiles.items():
+            label = int(person == other)
+            pairs.extend((s, p, label) for s, p in itertools.product(person_selfies, other_profiles))
+    return pairs
+
+
+def _peak_rss_mb() -> float:
+    """Peak resident memory of this process in MB."""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports KB, macOS bytes
+        return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+    except ImportError:
+        return float("nan")
+
+
+def _run_model(model_name: str, images: List[str], detector_backend: str, batch_size: int,
+               backend: str = "deepface", onnx_dir: str = "./models/onnx") -> Dict[str, Any]:
+    """Embeds every image with one model and backend (runs in a fresh process)."""
+    from services.face_service import FaceVerifier, decode_image
+
+    verifier = FaceVerifier(model_name=model_name, detector_backend=detector_backend,
+                            onnx_model_dir=onnx_dir, **BACKENDS[backend])
+    warm = verifier.warm_up()
+    if not warm["success"]:
+        return {"model": model_name, "backend": backend, "error": warm["error"]}
+
+    embeddings: Dict[str, List[float]] = {}
+    failures = 0
+    elapsed = 0.0
+    for start in range(0, len(images), batch_size):
+        paths = images[start:start + batch_size]
+        # Decode one batch at a time so peak memory does not grow with the dataset
+        batch = [decode_image(path) for path in paths]
+        valid = [i for i, img in enumerate(batch) if img is not None]
+
+        t0 = time.perf_counter()
+        results = verifier.represent_batch([batch[i] for i in valid]) if valid else []
+        elapsed += time.perf_counter() - t0
+
+        failures += len(batch) - len(valid)
+        for i, result in zip(valid, results):
+            if isinstance(result, Exception):
+                failures += 1
+            else:
+                embeddings[paths[i]] = np.asarray(result, dtype=np.float32).tolist()
+
+    return {
+        "model": model_name,
+        "backend": backend,
+        "warmup_seconds": warm["seconds"],
+        "embed_seconds": elapsed,
+        "images": len(images),
+        "failures": failures,
+        "peak_rss_mb": _peak_rss_mb(),
+        "embeddings": embeddings
+    }
+
+
+def _worker(args, results) -> None:
+    try:
+        results.put(_run_model(*args))
+    except Exception as e:
+        results.put({"model": args[0], "backend": args[4], "error": str(e)})
+
+
+def run_model_isolated(model_name: str, images: List[str], detector_backend: str, batch_size: int,
+                       backend: str = "deepface", onnx_dir: str = "./models/onnx") -> Dict[str, Any]:
+    """
+    Runs _run_model in a spawned process so each model's peak memory is its own.
+    A process that dies without a result (e.g. killed for running out of
+    memory) is reported as an error instead of blocking the benchmark.
+    """
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=_worker,
+                              args=((model_name, images, detector_backend, batch_size, backend, onnx_dir), results))
+    process.start()
+    result = None
+    while result is None:
+        try:
+            result = results.get(timeout=5.0)
+        except queue.Empty:
+            if process.is_alive():
+                continue
+            # The result may have been queued just before the process exited
+            try:
+                result = results.get(timeout=1.0)
+            except queue.Empty:
+                result = {"model": model_name, "backend": backend,
+                          "error": f"Benchmark process exited with code {process.exitcode} without a result"}
+    process.join()
+    return result
+
+
+def roc_metrics(genuine: np.ndarray, impostor: np.ndarray) -> Dict[str, Any]:
+    """
+    ROC summary over cosine distances (lower = more similar).
+
+    Returns:
+        dict: AUC, equal error rate and the distance at which it occurs,
+              plus the ROC curve as (threshold, FAR, FRR) points
+    """
+    thresholds = np.unique(np.concatenate([genuine, impostor, [0.0, 2.0]]))
+    far = np.searchsorted(np.sort(impostor), thresholds, side="right") / max(1, len(impostor))
+    frr = 1.0 - np.searchsorted(np.sort(genuine), thresholds, side="right") / max(1, len(genuine))
+
+    eer_index = int(np.argmin(np.abs(far - frr)))
+    # AUC = P(genuine distance < impostor distance), ties counted half
+    if len(genuine) and len(impostor):
+        ranks = np.argsort(np.argsort(np.concatenate([genuine, impostor]), kind="stable"), kind="stable") + 1
+        auc = 1.0 - (ranks[:len(genuine)].sum() - len(genuine) * (len(genuine) + 1) / 2) / (len(genuine) * len(impostor))
+    else:
+        auc = float("nan")
+
+    step = max(1, len(thresholds) // 200)
+    return {
+        "auc": round(float(auc), 4),
+        "eer": round(float((far[eer_index] + frr[eer_index]) / 2), 4),
+        "eer_threshold": round(float(thresholds[eer_index]), 4),
+        "roc": [[round(float(t), 4), round(float(a), 4), round(float(r), 4)]
+                for t, a, r in zip(thresholds[::step], far[::step], frr[::step])]
+    }
+
+
+def embedding_drift(run: Dict[str, Any], reference: Dict[str, Any]) -> Dict[str, Any]:
+    """Cosine distance between two backends' embeddings of the same images."""
+    from services.face_service import FaceVerifier
+
+    shared = [path for path in run["embeddings"] if path in reference["embeddings"]]
+    drift = np.array([FaceVerifier.cosine_distance(np.asarray(run["embeddings"][path]),
+                                                   np.asarray(reference["embeddings"][path])) for path in shared])
+    return {
+        "images": len(shared),
+        "mean": round(float(drift.mean()), 5) if len(drift) else None,
+        "max": round(float(drift.max()), 5) if len(drift) else None
+    }
+
+
+def evaluate(model_name: str, run: Dict[str, Any], pairs: List[Pair]) -> Dict[str, Any]:
+    """Turns embeddings into pair distances, FAR/FRR per threshold mode and timing figures."""
+    from services.face_service import FaceVerifier
+
+    embeddings = {path: np.asarray(vector) for path, vector in run["embeddings"].items()}
+    genuine, impostor, missing = [], [], 0
+    for selfie, profile, label in pairs:
+        if selfie not in embeddings or profile not in embeddings:
+            missing += 1
+            continue
+        distance = FaceVerifier.cosine_distance(embeddings[selfie], embeddings[profile])
+        (genuine if label else impostor).append(distance)
+    genuine, impostor = np.asarray(genuine), np.asarray(impostor)
+    genuine_total = sum(1 for p in pairs if p[2])
+
+    modes = {}
+    for mode, threshold in FaceVerifier.MODEL_THRESHOLDS.get(model_name, {}).items():
+        # Pairs whose faces could not be embedded count as rejections
+        modes[mode] = {
+            "threshold": threshold,
+            "far": round(float((impostor <= threshold).sum() / max(1, len(impostor))), 4),
+            "frr": round(float(1 - (genuine <= threshold).sum() / max(1, genuine_total)), 4)
+        }
+
+    embedded = run["images"] - run["failures"]
+    return {
+        "model": model_name,
+        "backend": run["backend"],
+        "warmup_seconds": run["warmup_seconds"],
+        "latency_ms_per_image": round(run["embed_seconds"] * 1000.0 / max(1, embedded), 2),
+        "throughput_images_per_s": round(embedded / run["embed_seconds"], 2) if run["embed_seconds"] else None,
+        "peak_rss_mb": run["peak_rss_mb"],
+        "images": run["images"],
+        "failed_images": run["failures"],
+        "pairs": {"genuine": len(genuine), "impostor": len(impostor), "skipped": missing},
+        "distance": {
+            "genuine_median": round(float(np.median(genuine)), 4) if len(genuine) else None,
+            "impostor_median": round(float(np.median(impostor)), 4) if len(impostor) else None
+        },
+        "threshold_modes": modes,
+        **roc_metrics(genuine, impostor)
+    }
+
+
+def render_table(results: List[Dict[str, Any]], dataset: str, pairs: List[Pair]) -> str:
+    """Formats the results as a Markdown report."""
+    lines = [
+        "# Face Model Benchmark",
+        "",
+        f"Generated {datetime.now().isoformat(timespec='seconds')} by `benchmark_face_models.py` "
+        f"on `{os.path.basename(os.path.normpath(dataset))}` "
+        f"({sum(p[2] for p in pairs)} genuine / {sum(1 - p[2] for p in pairs)} impostor pairs).",
+        "",
+        "| Model | Backend | ms/image | images/s | Peak RSS (MB) | Failed | AUC | EER | EER distance "
+        "| Genuine median | Impostor median |",
+        "|---|---|---|---|---|---|---|---|---|---|---|",
+    ]
+    for r in results:
+        if "error" in r:
+            lines.append(f"| {r['model']} | {r['backend']} | error: {r['error']} | | | | | | | | |")
+            continue
+        lines.append(
+            f"| {r['model']} | {r['backend']} | {r['latency_ms_per_image']} | {r['throughput_images_per_s']} "
+            f"| {r['peak_rss_mb']} | {r['failed_images']}/{r['images']} | {r['auc']} | {r['eer']} "
+            f"| {r['eer_threshold']} | {r['distance']['genuine_median']} | {r['distance']['impostor_median']} |"
+        )
+
+    lines += ["", "## FAR / FRR at each threshold mode", "",
+              "| Model | Backend | Mode | Threshold | FAR | FRR |", "|---|---|---|---|---|---|"]
+    for r in results:
+        for mode, m in r.get("threshold_modes", {}).items():
+            lines.append(f"| {r['model']} | {r['backend']} | {mode} | {m['threshold']} | {m['far']} | {m['frr']} |")
+
+    drifts = [r for r in results if r.get("drift_vs_deepface")]
+    if drifts:
+        lines += ["", "## Embedding drift vs DeepFace (cosine distance, same image)", "",
+                  "| Model | Backend | Images | Mean | Max |", "|---|---|---|---|---|"]
+        for r in drifts:
+            d = r["drift_vs_deepface"]
+            lines.append(f"| {r['model']} | {r['backend']} | {d['images']} | {d['mean']} | {d['max']} |")
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    from services.face_service import FaceVerifier
+
+    parser = argparse.ArgumentParser(description="Benchmark face models on labelled selfie/profile pairs")
+    parser.add_argument("dataset", help="Dataset directory (one folder per person)")
+    parser.add_argument("--pairs", help="CSV of selfie,profile,label rows instead of the folder layout")
+    parser.add_argument("--models", nargs="+", default=list(FaceVerifier.MODEL_THRESHOLDS),
+                        help="Models to benchmark (default: all in MODEL_THRESHOLDS)")
+    parser.add_argument("--detector", default="opencv", help="DeepFace detector backend")
+    parser.add_argument("--batch-size", type=int, default=8, help="Images per forward pass")
+    parser.add_argument("--backends", nargs="+", default=["deepface"], choices=list(BACKENDS),
+                        help="Embedding backends to compare (default: deepface)")
+    parser.add_argument("--onnx-dir", default=os.getenv("FACE_ONNX_MODEL_DIR", "./models/onnx"),
+                        help="Exported ONNX models (export_face_models.py)")
+    parser.add_argument("--output", default="benchmarks/face_models.md", help="Markdown report path")
+    parser.add_argument("--json", help="Also write full results (including ROC curves) as JSON")
+    args = parser.parse_args()
+
+    pairs = load_pairs(args.dataset, args.pairs)
+    if not pairs:
+        parser.error(f"No selfie/profile pairs found in {args.dataset}")
+    images = sorted({p for pair in pairs for p in pair[:2]})
+    print(f"{len(images)} images, {len(pairs)} pairs, models: {', '.join(args.models)}")
+
+    results = []
+    for model_name in args.models:
+        reference = None
+        for backend in args.backends:
+            print(f"Running {model_name} ({backend})...")
+            run = run_model_isolated(model_name, images, args.detector, args.batch_size, backend, args.onnx_dir)
+            if "error" in run:
+                print(f"  {model_name} ({backend}) failed: {run['error']}")
+                results.append({"model": model_name, "backend": backend, "error": run["error"]})
+                continue
+            result = evaluate(model_name, run, pairs)
+            if backend == "deepface":
+                reference = run
+            elif reference is not None:
+                result["drift_vs_deepface"] = embedding_drift(run, reference)
+            print(f"  {result['latency_ms_per_image']} ms/image, {result['peak_rss_mb']} MB, "
+                  f"AUC {result['auc']}, EER {result['eer']}")
+            results.append(result)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        f.write(render_table(results, args.dataset, pairs))
+    print(f"Report written to {args.output}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
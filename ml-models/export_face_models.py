@@ -0,0 +1,160 @@
+"""
+Face Model Export
+==================
+Exports DeepFace's Keras face models to ONNX for the "onnxruntime" and
+"opencv-dnn" embedding backends, optionally with an INT8-quantized copy.
+
+For each model this writes, into the output directory:
+    <model>.onnx        - FP32 graph (same function as the Keras model)
+    <model>.int8.onnx   - INT8 graph (with --int8)
+    <model>.json        - input size / layout used by the opencv-dnn runtime
+
+Without --calibration-dir the INT8 copy uses dynamic quantization (weights
+only). With a folder of face photos it uses static QDQ quantization, which
+also quantizes activations and is usually faster on CPU; check the result
+with test_onnx_parity.py before deploying it.
+
+Models that are not Keras graphs in DeepFace (SFace, Dlib) are skipped.
+
+Requires (export time only): pip install tf2onnx onnx onnxruntime
+
+Usage:
+    python export_face_models.py --models VGG-Face Facenet512 --int8
+    python export_face_models.py --models ArcFace --int8 --calibration-dir ./calibration_faces
+"""
+
+import os
+import json
+import argparse
+import importlib.metadata
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+from services.onnx_embedder import model_paths
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".bmp")
+
+
+def export_model(model_name: str, output_dir: str, opset: int = 13) -> Optional[Dict[str, Any]]:
+    """
+    Converts one DeepFace Keras model to ONNX.
+
+    Returns:
+        dict: The export metadata written next to the model, or None if
+              the model is not a Keras graph
+    """
+    import tensorflow as tf
+    import tf2onnx
+    from services.face_service import FaceVerifier
+
+    verifier = FaceVerifier(model_name=model_name)
+    model = verifier._get_model()
+    keras_model = getattr(model, "model", model)
+    if not hasattr(keras_model, "predict"):
+        print(f"  {model_name}: not a Keras model, skipped")
+        return None
+
+    height, width = verifier._model_input_size()
+    path, metadata_path = model_paths(output_dir, model_name)
+    signature = [tf.TensorSpec((None, height, width, 3), tf.float32, name="input")]
+    tf2onnx.convert.from_keras(keras_model, input_signature=signature, opset=opset, output_path=path)
+
+    metadata = {
+        "model": model_name,
+        "input_size": [height, width],
+        "layout": "NHWC",
+        "opset": opset,
+        "deepface_version": importlib.metadata.version("deepface"),
+        "exported": datetime.now().isoformat(timespec="seconds")
+    }
+    with open(metadata_path, "w", encoding="utf-8") as f:
+        json.dump(metadata, f, indent=2)
+    print(f"  {model_name}: wrote {path}")
+    return metadata
+
+
+def calibration_faces(model_name: str, folder: str, limit: int) -> List[np.ndarray]:
+    """Detects, crops and preprocesses up to `limit` faces the way FaceVerifier does."""
+    from services.face_service import FaceVerifier, decode_image
+
+    verifier = FaceVerifier(model_name=model_name)
+    faces = []
+    for name in sorted(os.listdir(folder)):
+        if len(faces) >= limit:
+            break
+        if not name.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        image = decode_image(os.path.join(folder, name))
+        if image is None:
+            continue
+        try:
+            faces.append(verifier._prepare_face(verifier._detect_face(image)[0]).astype(np.float32))
+        except ValueError:
+            continue
+    return faces
+
+
+def quantize_model(model_name: str, output_dir: str, calibration_dir: Optional[str] = None,
+                   calibration_size: int = 200) -> str:
+    """
+    Writes the INT8 copy of an exported model.
+
+    Returns:
+        str: Path of the INT8 model
+    """
+    import onnxruntime
+    from onnxruntime.quantization import (
+        CalibrationDataReader, QuantFormat, QuantType, quantize_dynamic, quantize_static
+    )
+
+    fp32_path, _ = model_paths(output_dir, model_name)
+    int8_path, _ = model_paths(output_dir, model_name, int8=True)
+
+    if not calibration_dir:
+        quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8, per_channel=True)
+        print(f"  {model_name}: wrote {int8_path} (dynamic)")
+        return int8_path
+
+    faces = calibration_faces(model_name, calibration_dir, calibration_size)
+    if not faces:
+        raise RuntimeError(f"No faces found in {calibration_dir} for calibration")
+
+    input_name = onnxruntime.InferenceSession(fp32_path, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+
+    class FaceReader(CalibrationDataReader):
+        def __init__(self):
+            self._faces = iter(faces)
+
+        def get_next(self):
+            face = next(self._faces, None)
+            return None if face is None else {input_name: face[np.newaxis]}
+
+    quantize_static(fp32_path, int8_path, FaceReader(), quant_format=QuantFormat.QDQ,
+                    activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8, per_channel=True)
+    print(f"  {model_name}: wrote {int8_path} (static, {len(faces)} calibration faces)")
+    return int8_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export DeepFace models to ONNX")
+    parser.add_argument("--models", nargs="+", default=["VGG-Face"],
+                        help="Models to export (default: VGG-Face, the service's default)")
+    parser.add_argument("--output-dir", default=os.getenv("FACE_ONNX_MODEL_DIR", "./models/onnx"),
+                        help="Output directory (FACE_ONNX_MODEL_DIR)")
+    parser.add_argument("--opset", type=int, default=13, help="ONNX opset")
+    parser.add_argument("--int8", action="store_true", help="Also write an INT8-quantized copy")
+    parser.add_argument("--calibration-dir", help="Face photos for static INT8 quantization")
+    parser.add_argument("--calibration-size", type=int, default=200, help="Maximum calibration faces")
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    for model_name in args.models:
+        print(f"Exporting {model_name}...")
+        if export_model(model_name, args.output_dir, args.opset) and args.int8:
+            quantize_model(model_name, args.output_dir, args.calibration_dir, args.calibration_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -14,27 +14,43 @@ Author: Smart Attendance Team
 Version: 1.0.0
 """
 
+import time
+
+# Startup phases are timed from here (see /startup)
+_STARTUP_T0 = time.perf_counter()
+STARTUP_TIMINGS = {}
+
 import os
-import uuid
+import queue
+import asyncio
 import json
 import logging
-import shutil
 from datetime import datetime
-from typing import Optional
+from typing import Optional, List
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Query
+from fastapi import FastAPI, File, UploadFile, Form, Header, HTTPException, Query, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
+from starlette.formparsers import MultiPartParser
 from pydantic import BaseModel, Field
 from dotenv import load_dotenv
 
+STARTUP_TIMINGS["framework_imports"] = round(time.perf_counter() - _STARTUP_T0, 3)
+
 # Load environment variables from .env file
 load_dotenv()
 
 # Import our service modules
 from services.gps_service import GPSManager, get_dummy_teacher, DUMMY_TEACHERS
-from services.face_service import FaceVerifier, get_dummy_student, DUMMY_STUDENTS
+from services.face_service import FaceVerifier, FaceQualityGate, decode_image
+from services.embedding_cache import EmbeddingCache
+from services.face_gallery import FaceGallery
+from services.face_index import FaceIndex, fingerprint as face_index_fingerprint
+from services.face_cascade import CascadeVerifier
+from services.liveness_service import LivenessDetector, load_mediapipe
+from services.inference_pool import InferencePool
 from services.ocr_service import IDCardExtractor, get_dummy_ocr_result
 from services.bluetooth_service import (
     BluetoothProximityService, 
@@ -43,6 +59,21 @@ from services.bluetooth_service import (
     get_dummy_beacon,
     DEFAULT_RSSI_THRESHOLD
 )
+from services.lazy_imports import preload, import_report
+from services.upload_buffer import UploadLimitMiddleware, UploadRejectedError, read_image
+from services.stage_timer import StageTimer
+from services.job_queue import JobQueue, QueueFullError
+from services.admission import AdmissionController, AdmissionMiddleware
+from services.brownout import BrownoutController, BrownoutTier
+from services import metrics
+from services.metrics import Metric
+from services.tracing import ServerTimingMiddleware, current_trace
+from services.profiler import MODES as PROFILE_MODES, ProfilingMiddleware, RequestProfiler
+from services.deadline import (
+    DeadlineExceeded, DeadlineMiddleware, check_deadline, deadline_expired, deadline_stats, record_drop, remaining_budget
+)
+
+STARTUP_TIMINGS["service_imports"] = round(time.perf_counter() - _STARTUP_T0 - sum(STARTUP_TIMINGS.values()), 3)
 
 # Configure logging
 logging.basicConfig(
@@ -51,9 +82,183 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Directory for temporary file uploads
+# Scratch directory of the face verifier (preprocessed document images);
+# uploads themselves are never written here
 TEMP_DIR = "./temp_uploads"
-os.makedirs(TEMP_DIR, exist_ok=True)
+
+# Image uploads are read into memory and decoded from there. Each image may
+# be at most UPLOAD_MAX_BYTES; the request body of an upload endpoint at most
+# UPLOAD_MAX_REQUEST_BYTES, enforced while it streams in. The multipart
+# parser keeps a file part in memory up to UPLOAD_SPOOL_BYTES and spills
+# larger ones to an anonymous temporary file (0 disables a limit).
+# Classroom photos may be up to UPLOAD_GROUP_MAX_BYTES (request body
+# UPLOAD_GROUP_MAX_REQUEST_BYTES), and bulk enrollment requests, which carry
+# many photos of UPLOAD_MAX_BYTES each, up to UPLOAD_BULK_MAX_REQUEST_BYTES
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(10 * 1024 * 1024)))
+UPLOAD_MAX_REQUEST_BYTES = int(os.getenv("UPLOAD_MAX_REQUEST_BYTES", str(3 * UPLOAD_MAX_BYTES + 1024 * 1024)))
+UPLOAD_GROUP_MAX_BYTES = int(os.getenv("UPLOAD_GROUP_MAX_BYTES", str(25 * 1024 * 1024)))
+UPLOAD_GROUP_MAX_REQUEST_BYTES = int(os.getenv("UPLOAD_GROUP_MAX_REQUEST_BYTES", str(UPLOAD_GROUP_MAX_BYTES + 1024 * 1024)))
+UPLOAD_BULK_MAX_REQUEST_BYTES = int(os.getenv("UPLOAD_BULK_MAX_REQUEST_BYTES", str(20 * UPLOAD_MAX_BYTES + 1024 * 1024)))
+UPLOAD_SPOOL_BYTES = int(os.getenv("UPLOAD_SPOOL_BYTES", str(4 * 1024 * 1024)))
+UPLOAD_LIMITED_PATHS = ("/face/verify", "/face/enroll", "/face/identify", "/ocr/extract",
+                        "/attendance/verify", "/attendance/jobs")
+UPLOAD_GROUP_PATHS = ("/attendance/group",)
+UPLOAD_BULK_PATHS = ("/face/enroll/bulk",)
+MultiPartParser.spool_max_size = UPLOAD_SPOOL_BYTES
+
+# Profile embedding cache (FACE_CACHE_DIR enables the persistent disk tier)
+FACE_CACHE_SIZE = int(os.getenv("FACE_CACHE_SIZE", "512"))
+FACE_CACHE_DIR = os.getenv("FACE_CACHE_DIR") or None
+
+# Enrolled student face templates
+FACE_GALLERY_DIR = os.getenv("FACE_GALLERY_DIR", "./face_gallery")
+
+# 1:N search index over the gallery (exact below FACE_INDEX_IVF_MIN_SIZE
+# students, partitioned IVF search probing FACE_INDEX_NPROBE lists above)
+FACE_INDEX_DIR = os.getenv("FACE_INDEX_DIR", os.path.join(FACE_GALLERY_DIR, "index"))
+FACE_INDEX_IVF_MIN_SIZE = int(os.getenv("FACE_INDEX_IVF_MIN_SIZE", "5000"))
+FACE_INDEX_NPROBE = int(os.getenv("FACE_INDEX_NPROBE", "8"))
+
+# Face detector backend ("haar", "opencv-dnn", "mediapipe" or a DeepFace
+# detector such as "opencv", "ssd", "retinaface") and the longest side of the
+# downscaled copy faces are detected on (0 = full resolution)
+FACE_DETECTOR = os.getenv("FACE_DETECTOR", "opencv")
+FACE_DETECTION_MAX_SIDE = int(os.getenv("FACE_DETECTION_MAX_SIDE", "640")) or None
+
+# Longest side selfies/profile photos must keep when decoded: large JPEGs are
+# decoded at 1/2, 1/4 or 1/8 scale down to it (0 = full resolution). Images
+# above IMAGE_MAX_PIXELS (default 50 MP) are rejected before decoding.
+FACE_DECODE_MAX_SIDE = int(os.getenv("FACE_DECODE_MAX_SIDE", "1280")) or None
+
+# Embedding backend: "deepface" (TensorFlow/Keras), or "onnxruntime" /
+# "opencv-dnn" to run the model exported by export_face_models.py from
+# FACE_ONNX_MODEL_DIR (FACE_ONNX_INT8=1 loads the INT8-quantized export,
+# onnxruntime only).
+# Combine with a native FACE_DETECTOR ("haar", "opencv-dnn", "mediapipe")
+# to run without TensorFlow at all. Cascade stages use the same backend, so
+# FACE_CASCADE_MODELS must be exported too.
+FACE_EMBEDDING_BACKEND = os.getenv("FACE_EMBEDDING_BACKEND", "deepface")
+FACE_ONNX_MODEL_DIR = os.getenv("FACE_ONNX_MODEL_DIR", "./models/onnx")
+FACE_ONNX_INT8 = os.getenv("FACE_ONNX_INT8", "0") == "1"
+
+# Blink liveness: FaceMesh instances per worker (= concurrent streams),
+# hard frame budget per stream and longest side frames are downscaled to.
+# A stream holds a FaceMesh, so it ends undecided when no frame arrives
+# within LIVENESS_FRAME_TIMEOUT_S or it runs past LIVENESS_STREAM_TIMEOUT_S.
+# Each uploaded frame may be at most LIVENESS_FRAME_MAX_BYTES; a request with
+# more than LIVENESS_MAX_FRAMES frames is rejected with 413
+LIVENESS_MESH_POOL_SIZE = int(os.getenv("LIVENESS_MESH_POOL_SIZE", "2"))
+LIVENESS_MAX_FRAMES = int(os.getenv("LIVENESS_MAX_FRAMES", "90"))
+LIVENESS_FRAME_MAX_BYTES = int(os.getenv("LIVENESS_FRAME_MAX_BYTES", str(1024 * 1024)))
+LIVENESS_MAX_REQUEST_BYTES = int(os.getenv(
+    "LIVENESS_MAX_REQUEST_BYTES", str(LIVENESS_MAX_FRAMES * LIVENESS_FRAME_MAX_BYTES + 1024 * 1024)))
+LIVENESS_FRAME_MAX_SIDE = int(os.getenv("LIVENESS_FRAME_MAX_SIDE", "480"))
+LIVENESS_FRAME_TIMEOUT_S = float(os.getenv("LIVENESS_FRAME_TIMEOUT_S", "5"))
+LIVENESS_STREAM_TIMEOUT_S = float(os.getenv("LIVENESS_STREAM_TIMEOUT_S", "30"))
+
+# Quality pre-gate: rejects dark, blurry, tiny or turned faces in live
+# selfies before the embedding network runs; stored profile, ID card and
+# enrollment photos are never gated (FACE_QUALITY_GATE=0 disables it)
+FACE_QUALITY_GATE = os.getenv("FACE_QUALITY_GATE", "1") == "1"
+FACE_QUALITY_MIN_BRIGHTNESS = float(os.getenv("FACE_QUALITY_MIN_BRIGHTNESS", "40"))
+FACE_QUALITY_MAX_BRIGHTNESS = float(os.getenv("FACE_QUALITY_MAX_BRIGHTNESS", "220"))
+FACE_QUALITY_MIN_SHARPNESS = float(os.getenv("FACE_QUALITY_MIN_SHARPNESS", "30"))
+FACE_QUALITY_MIN_FACE_FRACTION = float(os.getenv("FACE_QUALITY_MIN_FACE_FRACTION", "0.10"))
+
+# Build the face model and run a dummy inference before serving traffic.
+# In the background (default), GPS/Bluetooth serve immediately and /ready
+# returns 503 until the model is loaded; FACE_WARMUP_BACKGROUND=0 blocks
+# startup until the warm-up is done
+FACE_WARMUP = os.getenv("FACE_WARMUP", "1") == "1"
+FACE_WARMUP_BACKGROUND = os.getenv("FACE_WARMUP_BACKGROUND", "1") == "1"
+
+# Micro-batching of face embeddings across concurrent requests: each request
+# detects its face itself, only the forward passes are batched
+# (FACE_BATCH_MAX_SIZE=1 disables batching)
+FACE_BATCH_MAX_SIZE = int(os.getenv("FACE_BATCH_MAX_SIZE", "8"))
+FACE_BATCH_MAX_WAIT_MS = float(os.getenv("FACE_BATCH_MAX_WAIT_MS", "5"))
+
+# Out-of-process face inference: the embedding network (and group photos)
+# run in FACE_WORKERS processes, single faces are detected in the API process
+# (FACE_WORKERS=0 keeps inference in-process; FACE_WORKER_THREADS defaults
+# to cores / workers). Each cascade stage model gets a pool of its own
+FACE_WORKERS = int(os.getenv("FACE_WORKERS", "0"))
+FACE_WORKER_THREADS = int(os.getenv("FACE_WORKER_THREADS", "0")) or None
+
+# Cascaded verification: comma-separated cheap models tried before the main
+# model, e.g. "SFace" or "OpenFace,SFace" (empty disables the cascade)
+FACE_CASCADE_MODELS = [m.strip() for m in os.getenv("FACE_CASCADE_MODELS", "").split(",") if m.strip()]
+
+# Asynchronous attendance jobs (/attendance/jobs): verifications running at
+# once, jobs that may wait (each holds its uploaded images in memory) and
+# how long a finished result can be fetched (ATTENDANCE_JOB_WORKERS=0
+# disables the queue)
+ATTENDANCE_JOB_WORKERS = int(os.getenv("ATTENDANCE_JOB_WORKERS", "4"))
+ATTENDANCE_JOB_QUEUE_SIZE = int(os.getenv("ATTENDANCE_JOB_QUEUE_SIZE", "256"))
+ATTENDANCE_JOB_RESULT_TTL = float(os.getenv("ATTENDANCE_JOB_RESULT_TTL", "300"))
+
+# Admission control per endpoint group: requests running at once, requests
+# that may wait for a slot, and the longest wait before a request is shed
+# with 429 (queue full) or 503 (wait over budget) and Retry-After.
+# Checked before the request body is read (*_MAX_CONCURRENT=0 disables)
+FACE_MAX_CONCURRENT = int(os.getenv("FACE_MAX_CONCURRENT", "8"))
+FACE_MAX_QUEUED = int(os.getenv("FACE_MAX_QUEUED", "32"))
+FACE_MAX_WAIT_S = float(os.getenv("FACE_MAX_WAIT_S", "10"))
+OCR_MAX_CONCURRENT = int(os.getenv("OCR_MAX_CONCURRENT", "4"))
+OCR_MAX_QUEUED = int(os.getenv("OCR_MAX_QUEUED", "16"))
+OCR_MAX_WAIT_S = float(os.getenv("OCR_MAX_WAIT_S", "15"))
+ATTENDANCE_MAX_CONCURRENT = int(os.getenv("ATTENDANCE_MAX_CONCURRENT", "8"))
+ATTENDANCE_MAX_QUEUED = int(os.getenv("ATTENDANCE_MAX_QUEUED", "64"))
+ATTENDANCE_MAX_WAIT_S = float(os.getenv("ATTENDANCE_MAX_WAIT_S", "10"))
+# Group photos and bulk enrollment embed many faces per request, so few run
+# at once and each may wait longer for a slot
+FACE_BULK_MAX_CONCURRENT = int(os.getenv("FACE_BULK_MAX_CONCURRENT", "2"))
+FACE_BULK_MAX_QUEUED = int(os.getenv("FACE_BULK_MAX_QUEUED", "8"))
+FACE_BULK_MAX_WAIT_S = float(os.getenv("FACE_BULK_MAX_WAIT_S", "30"))
+# Blink checks each hold a FaceMesh, so by default as many run as the pool has
+LIVENESS_MAX_CONCURRENT = int(os.getenv("LIVENESS_MAX_CONCURRENT", str(LIVENESS_MESH_POOL_SIZE)))
+LIVENESS_MAX_QUEUED = int(os.getenv("LIVENESS_MAX_QUEUED", "16"))
+LIVENESS_MAX_WAIT_S = float(os.getenv("LIVENESS_MAX_WAIT_S", "10"))
+
+# Request deadlines: clients send X-Request-Timeout-Ms (or an absolute
+# X-Request-Deadline in Unix ms); queued work for a request past its
+# deadline is dropped. REQUEST_DEFAULT_TIMEOUT_S applies to requests
+# without the header (0 = no deadline). OCR (optional) is skipped when less
+# than OCR_MIN_BUDGET_S remains - a Groq round trip would not fit
+REQUEST_DEFAULT_TIMEOUT_S = float(os.getenv("REQUEST_DEFAULT_TIMEOUT_S", "0"))
+OCR_MIN_BUDGET_S = float(os.getenv("OCR_MIN_BUDGET_S", "3"))
+
+# Responses of these endpoints carry a Server-Timing header with the time
+# spent in each stage; their `debug=true` query flag attaches the full trace
+SERVER_TIMING_PATHS = ("/attendance/verify", "/face/verify", "/ocr/extract")
+
+# Brownout: under load, 1:1 face verification steps down to cheaper tiers -
+# selfies decoded at BROWNOUT_DECODE_MAX_SIDE, then (if set) the cheaper
+# BROWNOUT_MODEL (a MODEL_THRESHOLDS model, e.g. "SFace" or "OpenFace") -
+# and back up with hysteresis. A tier is entered when the face queue depth
+# or p95 latency reaches the ENTER threshold and left when both are at or
+# below EXIT, at most once per BROWNOUT_HOLD_S (BROWNOUT=0 disables;
+# BROWNOUT_DECODE_MAX_SIDE=0 skips the resolution tier)
+BROWNOUT = os.getenv("BROWNOUT", "1") == "1"
+BROWNOUT_DECODE_MAX_SIDE = int(os.getenv("BROWNOUT_DECODE_MAX_SIDE", "640"))
+BROWNOUT_MODEL = os.getenv("BROWNOUT_MODEL", "").strip()
+BROWNOUT_ENTER_DEPTH = int(os.getenv("BROWNOUT_ENTER_DEPTH", "16"))
+BROWNOUT_EXIT_DEPTH = int(os.getenv("BROWNOUT_EXIT_DEPTH", "4"))
+BROWNOUT_ENTER_P95_MS = float(os.getenv("BROWNOUT_ENTER_P95_MS", "3000"))
+BROWNOUT_EXIT_P95_MS = float(os.getenv("BROWNOUT_EXIT_P95_MS", "1000"))
+BROWNOUT_HOLD_S = float(os.getenv("BROWNOUT_HOLD_S", "15"))
+
+# On-demand profiling of SERVER_TIMING_PATHS requests, admin only (disabled
+# unless ADMIN_TOKEN is set). POST /admin/profile arms it for the next N
+# requests or a sampled fraction; a request sending `X-Profile: 1` (or the
+# mode) profiles itself. Both need `X-Admin-Token`. Each profile lands in
+# PROFILE_DIR as collapsed stacks (sampled every PROFILE_SAMPLE_INTERVAL_MS)
+# or cProfile stats, plus the request's stage timings; the newest
+# PROFILE_KEEP profiles are kept
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+PROFILE_DIR = os.getenv("PROFILE_DIR", "./profiles")
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5"))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "100"))
 
 
 # ============================================================================
@@ -93,6 +298,9 @@ class AttendanceVerifyResponse(BaseModel):
     face_verification: dict
     ocr_extraction: dict
     overall_verified: bool
+    service_tier: Optional[str] = None  # Brownout tier that verified the face
+    timings: dict = Field(default_factory=dict)  # Per-stage durations (StageTimer.summary)
+    trace: Optional[dict] = None  # Full request trace (debug=true only)
 
 
 # --- Bluetooth Proximity Models ---
@@ -138,15 +346,239 @@ class HealthResponse(BaseModel):
     services: dict
 
 
+class ReadinessResponse(BaseModel):
+    """Response model for readiness check endpoint."""
+    ready: bool
+    timestamp: str
+    model: str
+    model_loaded: bool
+    warmup_seconds: Optional[float] = None
+    warmup_error: Optional[str] = None
+    queue_depth: int
+
+
 # ============================================================================
 # Service Initialization
 # ============================================================================
 
 # Initialize service instances (singleton pattern)
 gps_manager = GPSManager()
-face_verifier = FaceVerifier(temp_dir=TEMP_DIR)
+embedding_cache = EmbeddingCache(max_entries=FACE_CACHE_SIZE, disk_dir=FACE_CACHE_DIR)
+face_gallery = FaceGallery(storage_dir=FACE_GALLERY_DIR)
+face_quality_gate = FaceQualityGate(
+    min_brightness=FACE_QUALITY_MIN_BRIGHTNESS,
+    max_brightness=FACE_QUALITY_MAX_BRIGHTNESS,
+    min_sharpness=FACE_QUALITY_MIN_SHARPNESS,
+    min_face_fraction=FACE_QUALITY_MIN_FACE_FRACTION
+) if FACE_QUALITY_GATE else None
+face_verifier = FaceVerifier(
+    temp_dir=TEMP_DIR,
+    embedding_cache=embedding_cache,
+    gallery=face_gallery,
+    detector_backend=FACE_DETECTOR,
+    detection_max_side=FACE_DETECTION_MAX_SIDE,
+    decode_max_side=FACE_DECODE_MAX_SIDE,
+    quality_gate=face_quality_gate,
+    embedding_backend=FACE_EMBEDDING_BACKEND,
+    onnx_model_dir=FACE_ONNX_MODEL_DIR,
+    onnx_int8=FACE_ONNX_INT8
+)
+
+
+def _serve_with_pool_and_batching(verifier: FaceVerifier) -> Optional[InferencePool]:
+    """
+    Gives a FaceVerifier its own inference pool (FACE_WORKERS > 0) and
+    micro-batcher (FACE_BATCH_MAX_SIZE > 1), as configured.
+    
+    Returns:
+        InferencePool: The verifier's pool, or None when inference is in-process
+    """
+    pool = None
+    if FACE_WORKERS > 0:
+        pool = InferencePool(
+            model_name=verifier.model_name,
+            workers=FACE_WORKERS,
+            threads_per_worker=FACE_WORKER_THREADS,
+            detector_backend=verifier.detector_backend,
+            detection_max_side=verifier.detection_max_side,
+            embedding_config=verifier.embedding_config()
+        )
+        verifier.use_inference_pool(pool)
+    if FACE_BATCH_MAX_SIZE > 1:
+        verifier.enable_batching(max_batch_size=FACE_BATCH_MAX_SIZE, max_wait_ms=FACE_BATCH_MAX_WAIT_MS)
+    return pool
+
+
+inference_pool = _serve_with_pool_and_batching(face_verifier)
+cascade_verifier = None
+if FACE_CASCADE_MODELS:
+    cascade_verifier = CascadeVerifier([
+        FaceVerifier(model_name=model, temp_dir=TEMP_DIR, embedding_cache=embedding_cache, gallery=face_gallery,
+                     detector_backend=FACE_DETECTOR, detection_max_side=FACE_DETECTION_MAX_SIDE,
+                     decode_max_side=FACE_DECODE_MAX_SIDE, quality_gate=face_quality_gate, **face_verifier.embedding_config())
+        for model in FACE_CASCADE_MODELS
+    ] + [face_verifier])
+    # Cheap stages are on the hot path too: they batch and run out of process like the final model
+    for stage in cascade_verifier.stages[:-1]:
+        _serve_with_pool_and_batching(stage)
+# 1:1 verification and enrollment go through the cascade when it is enabled
+face_engine = cascade_verifier or face_verifier
+# Brownout tiers of 1:1 verification, full quality first. The cheap model
+# reuses its cascade stage (and templates) when it is one
+brownout_verifier = None
+if BROWNOUT_MODEL:
+    if BROWNOUT_MODEL not in FaceVerifier.MODEL_THRESHOLDS or BROWNOUT_MODEL == face_verifier.model_name:
+        raise ValueError(f"BROWNOUT_MODEL must be one of {', '.join(FaceVerifier.MODEL_THRESHOLDS)} "
+                         f"other than {face_verifier.model_name}")
+    brownout_verifier = next(
+        (stage for stage in (cascade_verifier.stages if cascade_verifier else []) if stage.model_name == BROWNOUT_MODEL),
+        None
+    ) or FaceVerifier(model_name=BROWNOUT_MODEL, temp_dir=TEMP_DIR, embedding_cache=embedding_cache, gallery=face_gallery,
+                      detector_backend=FACE_DETECTOR, detection_max_side=FACE_DETECTION_MAX_SIDE,
+                      decode_max_side=FACE_DECODE_MAX_SIDE, quality_gate=face_quality_gate, **face_verifier.embedding_config())
+brownout_decode_side = BROWNOUT_DECODE_MAX_SIDE or FACE_DECODE_MAX_SIDE
+face_tiers = [BrownoutTier("full", face_engine, FACE_DECODE_MAX_SIDE)]
+if BROWNOUT_DECODE_MAX_SIDE and (FACE_DECODE_MAX_SIDE is None or BROWNOUT_DECODE_MAX_SIDE < FACE_DECODE_MAX_SIDE):
+    face_tiers.append(BrownoutTier("reduced_resolution", face_engine, brownout_decode_side))
+if brownout_verifier is not None:
+    face_tiers.append(BrownoutTier("cheap_model", brownout_verifier, brownout_decode_side))
 ocr_extractor = IDCardExtractor()
+attendance_jobs = None
+if ATTENDANCE_JOB_WORKERS > 0:
+    attendance_jobs = JobQueue(
+        workers=ATTENDANCE_JOB_WORKERS,
+        max_queued=ATTENDANCE_JOB_QUEUE_SIZE,
+        result_ttl=ATTENDANCE_JOB_RESULT_TTL,
+        name="attendance"
+    )
 bluetooth_service = BluetoothProximityService()
+admission_controllers = {
+    name: AdmissionController(name, max_concurrent=concurrent, max_queued=queued, max_wait_s=wait)
+    for name, concurrent, queued, wait in (
+        ("face", FACE_MAX_CONCURRENT, FACE_MAX_QUEUED, FACE_MAX_WAIT_S),
+        ("ocr", OCR_MAX_CONCURRENT, OCR_MAX_QUEUED, OCR_MAX_WAIT_S),
+        ("attendance", ATTENDANCE_MAX_CONCURRENT, ATTENDANCE_MAX_QUEUED, ATTENDANCE_MAX_WAIT_S),
+        ("face_bulk", FACE_BULK_MAX_CONCURRENT, FACE_BULK_MAX_QUEUED, FACE_BULK_MAX_WAIT_S),
+        ("liveness", LIVENESS_MAX_CONCURRENT, LIVENESS_MAX_QUEUED, LIVENESS_MAX_WAIT_S),
+    )
+    if concurrent > 0
+}
+# Request path -> endpoint group
+ADMISSION_PATHS = {
+    "/face/verify": "face",
+    "/face/identify": "face",
+    "/face/enroll": "face",
+    "/face/enroll/bulk": "face_bulk",
+    "/attendance/group": "face_bulk",
+    "/ocr/extract": "ocr",
+    "/attendance/verify": "attendance",
+    "/liveness/blink": "liveness",
+}
+
+
+def _face_queue_depth() -> int:
+    """Face work waiting: in admission queues, as queued jobs or for an embedding."""
+    depth = face_verifier.pending + (brownout_verifier.pending if brownout_verifier is not None else 0)
+    for group in ("face", "face_bulk", "attendance"):
+        if group in admission_controllers:
+            depth += admission_controllers[group].depth()
+    if attendance_jobs is not None:
+        depth += attendance_jobs.depth()
+    return depth
+
+
+brownout = BrownoutController(
+    face_tiers,
+    depth_fn=_face_queue_depth,
+    enter_depth=BROWNOUT_ENTER_DEPTH,
+    exit_depth=BROWNOUT_EXIT_DEPTH,
+    enter_p95_ms=BROWNOUT_ENTER_P95_MS,
+    exit_p95_ms=BROWNOUT_EXIT_P95_MS,
+    hold_s=BROWNOUT_HOLD_S
+) if BROWNOUT and len(face_tiers) > 1 else None
+request_profiler = RequestProfiler(
+    ADMIN_TOKEN,
+    output_dir=PROFILE_DIR,
+    interval_ms=PROFILE_SAMPLE_INTERVAL_MS,
+    keep=PROFILE_KEEP
+) if ADMIN_TOKEN else None
+liveness_detector = LivenessDetector(
+    pool_size=LIVENESS_MESH_POOL_SIZE,
+    max_frames=LIVENESS_MAX_FRAMES,
+    max_side=LIVENESS_FRAME_MAX_SIDE
+)
+
+
+def _collect_metrics() -> List[Metric]:
+    """Gauges and counters for /metrics, read from the services' own counters at scrape time."""
+    cache = embedding_cache.stats()
+    lookups = Metric("ml_embedding_cache_lookups_total", "counter", "Profile embedding cache lookups by result.")
+    lookups.add(cache["hits"], result="hit").add(cache["disk_hits"], result="disk_hit").add(cache["misses"], result="miss")
+    families = [
+        lookups,
+        Metric("ml_embedding_cache_hit_ratio", "gauge", "Share of cache lookups served from memory or disk.")
+        .add(cache["hit_rate"]),
+        Metric("ml_embedding_cache_entries", "gauge", "Embeddings held in the memory tier.").add(cache["size"]),
+    ]
+    
+    verifiers = {face_verifier.model_name: face_verifier}
+    for verifier in (cascade_verifier.stages if cascade_verifier else []) + [brownout_verifier]:
+        if verifier is not None:
+            verifiers.setdefault(verifier.model_name, verifier)
+    loaded = Metric("ml_model_loaded", "gauge", "Whether the face model is built and warmed up.")
+    warmup = Metric("ml_model_warmup_seconds", "gauge", "Time the face model warm-up took.")
+    pending = Metric("ml_face_embeddings_pending", "gauge", "Face embeddings running or waiting.")
+    batch_queue = Metric("ml_face_batch_queue_depth", "gauge", "Images waiting for an embedding batch.")
+    for model, verifier in verifiers.items():
+        loaded.add(verifier.model_loaded, model=model)
+        warmup.add(verifier.warmup_seconds, model=model)
+        pending.add(verifier.pending, model=model)
+        if verifier.batcher is not None:
+            batch_queue.add(verifier.batcher.queue_depth, model=model)
+    backends = Metric("ml_backend_loaded", "gauge", "Whether a lazily imported backend (DeepFace, MediaPipe, Groq) loaded.")
+    for backend, entry in import_report().items():
+        backends.add(entry["loaded"], backend=backend)
+    families += [loaded, warmup, pending, batch_queue, backends]
+    
+    if admission_controllers:
+        in_flight = Metric("ml_admission_in_flight", "gauge", "Requests running per endpoint group.")
+        queued = Metric("ml_admission_queued", "gauge", "Requests waiting for a slot per endpoint group.")
+        rejected = Metric("ml_admission_rejected_total", "counter", "Requests shed per endpoint group and reason.")
+        for group, controller in admission_controllers.items():
+            stats = controller.stats()
+            in_flight.add(stats["in_flight"], group=group)
+            queued.add(stats["queued"], group=group)
+            for reason, count in stats["rejected"].items():
+                rejected.add(count, group=group, reason=reason)
+        families += [in_flight, queued, rejected]
+    
+    if attendance_jobs is not None:
+        jobs = attendance_jobs.stats()
+        families += [
+            Metric("ml_attendance_jobs_queued", "gauge", "Attendance jobs waiting for a worker.").add(jobs["queued"]),
+            Metric("ml_attendance_jobs_running", "gauge", "Attendance jobs running.").add(jobs["running"]),
+        ]
+    if inference_pool is not None:
+        pool = inference_pool.stats()
+        families += [
+            Metric("ml_inference_pool_ready_workers", "gauge", "Inference workers that have loaded the model.")
+            .add(pool["ready_workers"]),
+            Metric("ml_inference_pool_in_flight", "gauge", "Tasks running in the inference pool.").add(pool["in_flight"]),
+        ]
+    if brownout is not None:
+        families.append(Metric("ml_brownout_level", "gauge", "Current brownout tier (0 = full quality).")
+                        .add(brownout.level))
+    
+    dropped = Metric("ml_deadline_dropped_total", "counter", "Work dropped because its request deadline passed.")
+    for stage, count in deadline_stats()["dropped"].items():
+        dropped.add(count, stage=stage)
+    families.append(dropped)
+    return families
+
+
+metrics.register_collector(_collect_metrics)
+
+STARTUP_TIMINGS["service_init"] = round(time.perf_counter() - _STARTUP_T0 - sum(STARTUP_TIMINGS.values()), 3)
 
 
 # ============================================================================
@@ -166,14 +598,69 @@ async def lifespan(app: FastAPI):
     logger.info("Services initialized:")
     logger.info("  - GPSManager: Ready")
     logger.info("  - FaceVerifier: Ready (Model: %s)", face_verifier.model_name)
+    logger.info("  - FaceGallery: %d enrolled students", len(face_gallery))
+    
+    # Memory-map the saved search index; rebuild it if it was built for another
+    # model or its contents no longer match the gallery
+    face_index = FaceIndex.load(FACE_INDEX_DIR)
+    gallery_ids, gallery_templates = face_gallery.embeddings_for(face_verifier.model_name)
+    if face_index is not None and (
+            face_index.model_name != face_verifier.model_name
+            or (gallery_ids and face_index.stats()["dim"] != gallery_templates.shape[1])
+            or face_index.saved_fingerprint != face_index_fingerprint(gallery_ids, gallery_templates)):
+        logger.info("  - FaceIndex: saved index is stale, rebuilding from the gallery")
+        face_index = None
+    if face_index is None:
+        face_index = FaceIndex(ivf_min_size=FACE_INDEX_IVF_MIN_SIZE, n_probe=FACE_INDEX_NPROBE,
+                               model_name=face_verifier.model_name)
+    else:
+        face_index.configure(ivf_min_size=FACE_INDEX_IVF_MIN_SIZE, n_probe=FACE_INDEX_NPROBE)
+    face_verifier.use_face_index(face_index)
+    logger.info("  - FaceIndex: %s", face_index.stats())
     logger.info("  - IDCardExtractor: %s", 
                 "Ready" if ocr_extractor.is_configured() else "API key not configured")
     logger.info("=" * 50)
     
+    # Heavy backends (TensorFlow/DeepFace, MediaPipe, Groq) load on first use;
+    # the warm-up loads them ahead of the first request. With an inference
+    # pool, warm-up starts the workers.
+    loaders = []
+    if FACE_WARMUP or inference_pool is not None:
+        loaders.append(face_engine.warm_up)
+    if FACE_WARMUP and brownout is not None and brownout_verifier is not None \
+            and brownout_verifier not in getattr(face_engine, "stages", []):
+        # A switch to the cheap model must not pay for loading it
+        loaders.append(brownout_verifier.warm_up)
+    if FACE_WARMUP:
+        loaders.append(load_mediapipe)
+        if ocr_extractor.is_configured():
+            loaders.append(ocr_extractor.get_client)
+    if FACE_WARMUP_BACKGROUND:
+        preload(loaders, name="warm-up")
+    else:
+        for loader in loaders:
+            await run_in_threadpool(loader)
+    
+    if attendance_jobs is not None:
+        await attendance_jobs.start()
+    
+    STARTUP_TIMINGS["serving_after"] = round(time.perf_counter() - _STARTUP_T0, 3)
+    logger.info("Serving %.2fs after startup began (%s)", STARTUP_TIMINGS["serving_after"], STARTUP_TIMINGS)
+    
     yield
     
     # Shutdown
     logger.info("🛑 Shutting down Smart Attendance System...")
+    if attendance_jobs is not None:
+        await attendance_jobs.close()
+    for verifier in (cascade_verifier.stages if cascade_verifier else [face_verifier]):
+        if verifier.batcher is not None:
+            verifier.batcher.close()
+        if verifier.inference_pool is not None:
+            verifier.inference_pool.shutdown()
+    if face_verifier.face_index is not None:
+        face_verifier.face_index.save(FACE_INDEX_DIR)
+    liveness_detector.pool.close()
     # Cleanup temp files
     face_verifier.cleanup_temp_files()
     logger.info("Cleanup complete. Goodbye!")
@@ -198,10 +685,34 @@ app = FastAPI(
     | Endpoint | Method | Description |
     |----------|--------|-------------|
     | `/` | GET | Health check and service status |
+    | `/ready` | GET | Readiness (model loaded, warm-up time, queue depth) |
+    | `/startup` | GET | Startup time report (import phases, lazy backend loads) |
+    | `/admission/stats` | GET | Per-endpoint concurrency, queue depth and rejections |
+    | `/deadline/stats` | GET | Work dropped because its request deadline passed |
+    | `/metrics` | GET | Prometheus metrics (stage latency histograms, queues, caches) |
+    | `/admin/profile` | GET/POST/DELETE | Profile the next N or a sample of requests (admin) |
     | `/teacher/gps` | GET | Get teacher's approximate location via IP |
     | `/attendance/verify` | POST | **Main** - Complete attendance verification |
+    | `/attendance/jobs` | POST | Queue an attendance verification, returns a job ID |
+    | `/attendance/jobs/{job_id}` | GET | Status and result of a queued verification |
+    | `/attendance/jobs/{job_id}/ws` | WS | Push updates of a queued verification |
+    | `/attendance/jobs/stats` | GET | Attendance job queue counters |
+    | `/attendance/group` | POST | Classroom photo attendance against a roster |
     | `/gps/validate` | POST | Standalone GPS proximity check |
     | `/face/verify` | POST | Standalone face verification |
+    | `/liveness/blink` | POST | Blink liveness check from a burst of frames |
+    | `/liveness/stream` | WS | Blink liveness check over a WebSocket frame stream |
+    | `/face/enroll` | POST | Enroll a student's face template |
+    | `/face/enroll/bulk` | POST | Enroll many students in one request |
+    | `/face/enrolled` | GET | List enrolled students |
+    | `/face/identify` | POST | Identify a selfie among all enrolled students |
+    | `/face/index/stats` | GET | Face search index state |
+    | `/face/cascade/stats` | GET | Cascaded verification early-exit counters |
+    | `/face/brownout/stats` | GET | Current brownout tier, load and tier switches |
+    | `/face/quality/stats` | GET | Face quality pre-gate counters |
+    | `/face/cache/stats` | GET | Profile embedding cache counters |
+    | `/face/batcher/stats` | GET | Embedding batch size and queueing latency |
+    | `/face/pool/stats` | GET | Inference worker pool state |
     | `/ocr/extract` | POST | Standalone OCR extraction |
     
     ### Quick Start
@@ -214,12 +725,30 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Added before CORS so that CORS wraps them and 413/429/503/504 responses
+# carry CORS headers. Outermost first: the request trace starts (so the
+# admission wait is in Server-Timing), the deadline is set, then admission
+# runs (shed requests are not even read), then admitted requests are picked
+# for profiling, then the body size is capped
+app.add_middleware(UploadLimitMiddleware, paths=UPLOAD_LIMITED_PATHS, max_bytes=UPLOAD_MAX_REQUEST_BYTES)
+app.add_middleware(UploadLimitMiddleware, paths=UPLOAD_GROUP_PATHS, max_bytes=UPLOAD_GROUP_MAX_REQUEST_BYTES)
+app.add_middleware(UploadLimitMiddleware, paths=UPLOAD_BULK_PATHS, max_bytes=UPLOAD_BULK_MAX_REQUEST_BYTES)
+app.add_middleware(UploadLimitMiddleware, paths=("/liveness/blink",), max_bytes=LIVENESS_MAX_REQUEST_BYTES)
+if request_profiler is not None:
+    app.add_middleware(ProfilingMiddleware, profiler=request_profiler, paths=SERVER_TIMING_PATHS)
+app.add_middleware(AdmissionMiddleware, controllers={
+    path: admission_controllers[group] for path, group in ADMISSION_PATHS.items() if group in admission_controllers
+})
+app.add_middleware(DeadlineMiddleware, default_timeout_s=REQUEST_DEFAULT_TIMEOUT_S)
+app.add_middleware(ServerTimingMiddleware, paths=SERVER_TIMING_PATHS)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # Configure appropriately for production
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Profile-Id"],  # Readable by the admin dashboard
 )
 
 
@@ -227,45 +756,118 @@ app.add_middleware(
 # Utility Functions
 # ============================================================================
 
-def save_upload_file(upload_file: UploadFile, filename: str) -> str:
+async def read_image_upload(upload: UploadFile, max_bytes: int = UPLOAD_MAX_BYTES) -> memoryview:
     """
-    Saves an uploaded file to the temp directory.
+    Reads an image upload into memory, enforcing a size limit.
+    
+    Non-images are rejected after the first chunk and oversized uploads as
+    soon as they pass the limit, before the rest is copied.
     
     Args:
-        upload_file: The FastAPI UploadFile object
-        filename: Desired filename (will be prefixed with UUID)
+        upload: The FastAPI UploadFile object
+        max_bytes: Size limit in bytes (default UPLOAD_MAX_BYTES, 0 = no limit)
     
     Returns:
-        str: Full path to the saved file (normalized for OS)
+        memoryview: The encoded image, decoded by the services without a copy
+    
+    Raises:
+        HTTPException: 413 if the image is too large, 415 if it is not an image
     """
-    # Generate unique filename to avoid collisions
-    unique_name = f"{uuid.uuid4().hex[:8]}_{filename}"
-    file_path = os.path.normpath(os.path.join(TEMP_DIR, unique_name))
+    try:
+        with metrics.timed("upload_read"):
+            data = await read_image(upload, max_bytes=max_bytes)
+    except UploadRejectedError as e:
+        logger.warning("Rejected upload: %s", str(e))
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    finally:
+        # Releases the multipart parser's spool file, if the part spilled to disk
+        with metrics.timed("cleanup"):
+            await upload.close()
     
-    # Ensure temp directory exists
-    os.makedirs(TEMP_DIR, exist_ok=True)
+    logger.info("Upload received: %s (%d bytes)", upload.filename, len(data))
+    return data
+
+
+def _attach_trace(body: dict, debug: bool) -> dict:
+    """Adds the request's full timing trace to a response body when `debug` is set."""
+    trace = current_trace()
+    if debug and trace is not None:
+        body["trace"] = trace.to_dict()
+    return body
+
+
+def _predecode_selfie(data: memoryview, max_side: Optional[int] = FACE_DECODE_MAX_SIDE):
+    """
+    Decodes the selfie ahead of face verification, at most at `max_side`.
     
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(upload_file.file, buffer)
+    Returns the upload unchanged when it cannot be decoded, so the face
+    engine reports the error in its usual format.
+    """
+    try:
+        image = decode_image(data, max_side)
+    except ValueError:
+        return data
+    return data if image is None else image
+
+
+def _select_face_tier(student_id: Optional[str] = None) -> BrownoutTier:
+    """
+    Picks the brownout tier that verifies a face right now.
     
-    logger.info("Saved upload: %s -> %s", upload_file.filename, file_path)
-    return file_path
+    Enrolled students are only served at tiers whose model they have a
+    template for; otherwise the nearest higher tier serves them.
+    """
+    if brownout is None:
+        return face_tiers[0]
+    if not student_id:
+        return brownout.select()
+    return brownout.select(lambda tier: face_gallery.get_embedding(
+        student_id, getattr(tier.engine, "final", tier.engine).model_name
+    ) is not None)
 
 
-def cleanup_files(*file_paths: str) -> None:
+def _bluetooth_check(session_id: Optional[str], rssi_readings: Optional[str]) -> tuple:
     """
-    Removes temporary files.
+    Runs the Bluetooth proximity check of /attendance/verify.
     
     Args:
-        *file_paths: Variable number of file paths to remove
+        session_id: Session whose beacon the student must be near (None = no check)
+        rssi_readings: JSON string of RSSI readings
+    
+    Returns:
+        tuple: (passed, bluetooth_check response section)
     """
-    for path in file_paths:
-        if path and os.path.exists(path):
-            try:
-                os.remove(path)
-                logger.debug("Cleaned up: %s", path)
-            except Exception as e:
-                logger.warning("Failed to cleanup %s: %s", path, str(e))
+    if not session_id:
+        return True, {"status": "skipped", "reason": "Not provided"}
+    
+    beacon_info = get_beacon(session_id)
+    if not beacon_info or not beacon_info.get("is_active"):
+        return True, {"status": "skipped", "reason": "No active beacon for session"}
+    
+    logger.info("Bluetooth proximity check required for session %s...", session_id)
+    if not rssi_readings:
+        return False, {
+            "status": "failed", 
+            "reason": "Bluetooth verification required but RSSI readings not provided"
+        }
+    
+    try:
+        # Parse RSSI readings if they come as a JSON string
+        readings = json.loads(rssi_readings) if isinstance(rssi_readings, str) else rssi_readings
+        
+        bt_result = bluetooth_service.validate_proximity(
+            rssi_readings=readings,
+            threshold=beacon_info.get("threshold", -65)
+        )
+    except Exception as e:
+        logger.error("Error parsing/validating Bluetooth data: %s", str(e))
+        return False, {"status": "error", "reason": str(e)}
+    
+    if not bt_result.present:
+        logger.warning("Bluetooth proximity check failed: %s", bt_result.message)
+    else:
+        logger.info("Bluetooth check passed. Quality: %s", bt_result.signal_quality)
+    return bt_result.present, bt_result.to_dict()
 
 
 # ============================================================================
@@ -294,6 +896,198 @@ async def health_check():
     }
 
 
+@app.get("/ready", response_model=ReadinessResponse, tags=["System"])
+async def readiness_check():
+    """
+    Readiness endpoint.
+    
+    Unlike `/`, this reports whether the face model has actually been built
+    and warmed up. Returns **503** until the model is loaded, so load
+    balancers and deploy scripts can hold traffic until then.
+    
+    **Response:**
+    - `model_loaded`: Whether the model graph and weights are in memory
+    - `warmup_seconds`: Time the startup warm-up took (or, without a
+      warm-up, building the model for the first request)
+    - `queue_depth`: Face embeddings currently running or waiting
+    """
+    body = {
+        "ready": face_verifier.model_loaded,
+        "timestamp": datetime.now().isoformat(),
+        "model": face_verifier.model_name,
+        "model_loaded": face_verifier.model_loaded,
+        "warmup_seconds": face_verifier.warmup_seconds,
+        "warmup_error": face_verifier.warmup_error,
+        "queue_depth": face_verifier.pending
+    }
+    return JSONResponse(status_code=200 if body["ready"] else 503, content=body)
+
+
+@app.get("/startup", tags=["System"])
+async def startup_report():
+    """
+    Startup time report.
+    
+    Shows where process startup time went, to keep worker starts fast.
+    
+    **Response:**
+    - `phases`: Seconds spent in main's framework imports, service imports
+      and service initialization, and when the server started serving
+    - `lazy_imports`: Per heavy backend (DeepFace, MediaPipe, Groq): load
+      time, outcome and the thread that loaded it (`warm-up` = background)
+    - `warmup`: Face model warm-up state
+    
+    For a per-module breakdown of the eager imports, run
+    `python -X importtime -c "import main"`.
+    """
+    return {
+        "phases": STARTUP_TIMINGS,
+        "lazy_imports": import_report(),
+        "warmup": {
+            "model": face_verifier.model_name,
+            "model_loaded": face_verifier.model_loaded,
+            "seconds": face_verifier.warmup_seconds,
+            "error": face_verifier.warmup_error
+        }
+    }
+
+
+@app.get("/admission/stats", tags=["System"])
+async def get_admission_stats():
+    """
+    Get admission control state per endpoint group (face, face_bulk, ocr,
+    attendance).
+    
+    Clients should honour `Retry-After` on 429/503 instead of retrying at
+    once; these counters show how often that happens.
+    
+    **Response:**
+    - `enabled`: Whether any endpoint group is limited
+    - `endpoints`: Per group: limits, `in_flight`, `queued`, `admitted`,
+      `rejected` by reason (`queue_full`, `wait_budget`, `wait_timeout`),
+      mean service time and current `expected_wait_s`
+    - `paths`: Request path -> endpoint group
+    """
+    if not admission_controllers:
+        return {"enabled": False}
+    return {
+        "enabled": True,
+        "endpoints": {name: controller.stats() for name, controller in admission_controllers.items()},
+        "paths": {path: group for path, group in ADMISSION_PATHS.items() if group in admission_controllers}
+    }
+
+
+@app.get("/deadline/stats", tags=["System"])
+async def get_deadline_stats():
+    """
+    Get request deadline counters.
+    
+    Clients set a deadline with `X-Request-Timeout-Ms` (budget in ms) or
+    `X-Request-Deadline` (absolute Unix time in ms). Work whose deadline has
+    passed is dropped instead of computed for nobody.
+    
+    **Response:**
+    - `default_timeout_s`: Deadline of requests without the header (0 = none)
+    - `requests_with_deadline`: Requests that sent a deadline header
+    - `dropped`: Work dropped per stage - `arrival` (already expired),
+      `<group>_admission` (waiting for a slot), `embeddings-<model>_queue`
+      (waiting for a batch), `face_embedding`, `inference_pool` (before or
+      while waiting for a worker), `inference_worker` (queued for a worker),
+      `attendance_face`, `attendance_jobs` (queued jobs), and `ocr`
+      (skipped, not enough budget left)
+    - `dropped_total`: Sum of the above
+    """
+    return {"default_timeout_s": REQUEST_DEFAULT_TIMEOUT_S, **deadline_stats()}
+
+
+@app.get("/metrics", tags=["System"])
+async def get_metrics():
+    """
+    Prometheus metrics, in the text exposition format.
+    
+    - `ml_stage_duration_seconds{stage=...}`: Histogram per pipeline stage -
+      `admission_wait`, `upload_read`, `decode`, `gps_geodesic`, `bluetooth_mode`,
+      `face_detection`, `embedding` (batch wait and forward pass),
+      `distance`, `groq_round_trip` and `cleanup`
+    - Embedding cache lookups and hit ratio
+    - Queue depths and in-flight counts: pending embeddings, batch queue,
+      admission per endpoint group, attendance jobs, inference pool
+    - Model load state: `ml_model_loaded`, warm-up time, lazily imported
+      backends
+    - Brownout tier and deadline drops
+    """
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+def _require_admin(token: Optional[str]) -> RequestProfiler:
+    """Returns the profiler if profiling is enabled and `token` is the admin token."""
+    if request_profiler is None:
+        raise HTTPException(status_code=404, detail="Profiling is disabled. Set ADMIN_TOKEN to enable it.")
+    if not request_profiler.check_token(token):
+        raise HTTPException(status_code=403, detail="Invalid or missing X-Admin-Token")
+    return request_profiler
+
+
+@app.get("/admin/profile", tags=["System"])
+async def get_profile_status(x_admin_token: Optional[str] = Header(None)):
+    """
+    Get on-demand profiling state (admin only, `X-Admin-Token` header).
+
+    **Response:**
+    - `enabled`: Whether profiling is available (`ADMIN_TOKEN` is set)
+    - `mode`, `remaining`, `sample_rate`: What armed profiling will profile
+    - `profiled`, `failed`: Profiles written / not written
+    - `sample_errors`: Stack samples that failed (profiling carries on)
+    - `output_dir`: Where profiles are written
+    - `recent`: Newest profiles with their files
+    """
+    if request_profiler is None:
+        return {"enabled": False}
+    return {"enabled": True, **_require_admin(x_admin_token).status()}
+
+
+@app.post("/admin/profile", tags=["System"])
+async def arm_profiler(
+    requests: int = Query(0, ge=0, description="Profile the next N requests"),
+    sample_rate: float = Query(0.0, ge=0.0, le=1.0, description="Then profile this fraction of requests"),
+    mode: str = Query("sampler", description="'sampler' (collapsed stacks) or 'cprofile' (pstats)"),
+    x_admin_token: Optional[str] = Header(None)
+):
+    """
+    Profile the next `requests` requests to `/attendance/verify`,
+    `/face/verify` and `/ocr/extract`, then a `sample_rate` fraction of them
+    until disarmed (admin only, `X-Admin-Token` header).
+
+    A single request can also profile itself by sending `X-Profile: 1` (or
+    `X-Profile: cprofile`) with `X-Admin-Token`. Profiled responses carry
+    an `X-Profile-Id` header naming their files.
+
+    Face verification, document pre-processing and the Groq call are
+    profiled in the threads that run them, and so are the embedding
+    micro-batches (forward passes) holding a profiled
+    request's faces; with `FACE_WORKERS`, time in the worker processes
+    shows only as the wait for them. Per request, `PROFILE_DIR` gets
+    `<time>_<path>_<id>.collapsed` (sampler; flamegraph.pl / speedscope) or
+    `.pstats` (cprofile; `python -m pstats`), and `.json` with the request's
+    stage timings and profiled calls.
+
+    **Response:** The profiler state (see `GET /admin/profile`)
+    """
+    profiler = _require_admin(x_admin_token)
+    if mode not in PROFILE_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of: {', '.join(PROFILE_MODES)}")
+    return {"enabled": True, **profiler.arm(requests, sample_rate, mode)}
+
+
+@app.delete("/admin/profile", tags=["System"])
+async def disarm_profiler(x_admin_token: Optional[str] = Header(None)):
+    """
+    Stop armed profiling (admin only, `X-Admin-Token` header). Requests
+    sending `X-Profile` are still profiled.
+    """
+    return {"enabled": True, **_require_admin(x_admin_token).disarm()}
+
+
 # --- Teacher GPS Location ---
 
 @app.get("/teacher/gps", tags=["GPS"])
@@ -451,22 +1245,26 @@ async def verify_bluetooth_proximity(request: BluetoothProximityRequest):
 @app.post("/face/verify", tags=["Face Recognition"])
 async def verify_face(
     selfie: UploadFile = File(..., description="Live selfie image"),
-    id_card: UploadFile = File(..., description="User profile photo (legacy name for compatibility)"),
-    preprocess: bool = Query(False, description="Document preprocessing (always disabled for profiles)")
+    id_card: Optional[UploadFile] = File(None, description="User profile photo (legacy name for compatibility)"),
+    student_id: Optional[str] = Form(None, description="Enrolled student ID (replaces the profile photo)"),
+    preprocess: bool = Query(False, description="Document preprocessing (always disabled for profiles)"),
+    debug: bool = Query(False, description="Attach the full timing trace to the response")
 ):
     """
     Verify face match between live selfie and stored profile photo.
     
     **IMPORTANT:** This endpoint compares:
     - Live selfie (captured at runtime)
-    - User profile photo (from database)
+    - User profile photo (from database), or the student's enrolled template
     
     Profile photos are NOT documents and should NEVER be preprocessed.
     Document preprocessing is disabled by default and forced off if detected.
     
     **Request:**
     - `selfie`: Live camera capture
-    - `id_card`: User profile photo (field name kept for API compatibility)
+    - `student_id`: Enrolled student ID - only the selfie is uploaded and embedded
+    - `id_card`: User profile photo (field name kept for API compatibility),
+      used when `student_id` is not given
     - `preprocess`: Ignored for profile images (always False)
     
     **Response:**
@@ -477,48 +1275,424 @@ async def verify_face(
     - `distance`: Face embedding distance
     - `threshold`: Threshold used
     - `model`: DeepFace model name
+    - `detection`: Detector backend, its latency and the downscale factor used
+    - `service_tier`: Brownout tier that served the request ("full",
+      "reduced_resolution" or "cheap_model", see `/face/brownout/stats`)
+    - `trace`: With `debug=true`, every timed stage with its start offset,
+      duration and thread
+    
+    The `Server-Timing` header carries the time spent per stage.
     """
-    selfie_path = None
-    profile_image_path = None
+    if not student_id and id_card is None:
+        raise HTTPException(status_code=400, detail="Provide either student_id or a profile photo (id_card)")
 
     try:
-        # Save selfie image
-        selfie_path = save_upload_file(selfie, "selfie.jpg")
+        # Read uploads straight into memory - they are decoded once by
+        # the verifier and never written to disk
+        selfie_bytes = await read_image_upload(selfie)
         
-        # Save profile image (second image is always a user profile photo, never a document)
-        profile_image_path = save_upload_file(id_card, "profile.jpg")
+        tier = _select_face_tier(student_id)
+        start = time.perf_counter()
+        if tier.decode_max_side != FACE_DECODE_MAX_SIDE:
+            # Brownout: decode the selfie at the tier's lower resolution
+            selfie_bytes = await run_in_threadpool(_predecode_selfie, selfie_bytes, tier.decode_max_side)
         
-        # Force preprocessing OFF - profile photos must never be preprocessed
-        preprocess = False
+        if student_id:
+            logger.info("Starting face verification: selfie=%s, enrolled student=%s (tier %s)",
+                        selfie.filename, student_id, tier.name)
+            result = await run_in_threadpool(
+                tier.engine.verify_enrolled, selfie=selfie_bytes, student_id=student_id
+            )
+        else:
+            # Second image is always a user profile photo, never a document
+            profile_bytes = await read_image_upload(id_card)
+            
+            # Force preprocessing OFF - profile photos must never be preprocessed
+            preprocess = False
+            
+            logger.info(
+                "Starting face verification: selfie=%s, profile=%s (tier %s)",
+                selfie.filename,
+                id_card.filename,
+                tier.name
+            )
+            
+            # Perform face verification off the event loop, so concurrent
+            # requests can share a batched forward pass
+            result = await run_in_threadpool(
+                tier.engine.verify_identity,
+                selfie=selfie_bytes,
+                profile_image=profile_bytes,
+                preprocess=preprocess
+            )
         
-        logger.info(
-            "Starting face verification: selfie=%s, profile=%s",
-            selfie.filename,
-            id_card.filename
-        )
-
-        # Perform face verification
-        result = face_verifier.verify_identity(
-            selfie_path=selfie_path,
-            profile_image_path=profile_image_path,
-            preprocess=preprocess
-        )
+        if brownout is not None:
+            brownout.record(tier, (time.perf_counter() - start) * 1000)
+        result["service_tier"] = tier.name
+        return _attach_trace(result, debug)
 
-        return result
+    except HTTPException:
+        raise
 
     except Exception as e:
         logger.error("Face verification error: %s", str(e))
         raise HTTPException(status_code=500, detail=str(e))
 
+
+@app.post("/face/enroll", tags=["Face Recognition"])
+async def enroll_face(
+    student_id: str = Form(..., description="Student identifier"),
+    image: UploadFile = File(..., description="Enrollment photo (clear, front-facing)"),
+    name: Optional[str] = Form(None, description="Student's name"),
+    roll_number: Optional[str] = Form(None, description="Student's roll number")
+):
+    """
+    Enroll a student's face template.
+    
+    The face embedding is computed once and stored in the gallery, keyed by
+    student ID. Later verifications only need the live selfie plus the
+    `student_id`. Re-enrolling a student replaces their template.
+    
+    **Response:**
+    - `success`: Whether the template was stored
+    - `student_id`: The enrolled student
+    - `model`: Model the template was computed with
+    """
+    image_bytes = await read_image_upload(image)
+    result = await run_in_threadpool(
+        face_engine.enroll_student,
+        student_id=student_id,
+        image=image_bytes,
+        metadata={"name": name, "roll_number": roll_number}
+    )
+    
+    if not result.get("success"):
+        raise HTTPException(status_code=422, detail=result.get("error"))
+    
+    return result
+
+
+@app.post("/face/enroll/bulk", tags=["Face Recognition"])
+async def enroll_faces_bulk(
+    student_ids: str = Form(..., description="JSON array of student IDs, in the same order as images"),
+    images: List[UploadFile] = File(..., description="Enrollment photos")
+):
+    """
+    Enroll many students in one request.
+    
+    `student_ids[i]` is enrolled with `images[i]`. Failures are reported per
+    student and do not stop the rest of the batch.
+    
+    **Response:**
+    - `enrolled`: Number of students enrolled
+    - `failed`: Number of failures
+    - `results`: Per-student enrollment results
+    """
+    try:
+        ids = json.loads(student_ids)
+    except json.JSONDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"student_ids must be a JSON array: {e}")
+    
+    if not isinstance(ids, list) or len(ids) != len(images):
+        raise HTTPException(status_code=400, detail="student_ids must be a JSON array with one ID per image")
+    
+    # Enroll concurrently so the micro-batcher can embed the photos together
+    image_bytes = [await read_image_upload(upload) for upload in images]
+    results = await asyncio.gather(*[
+        run_in_threadpool(face_engine.enroll_student, student_id=str(sid), image=data)
+        for sid, data in zip(ids, image_bytes)
+    ])
+    
+    enrolled = sum(1 for r in results if r.get("success"))
+    logger.info("Bulk enrollment: %d/%d students enrolled", enrolled, len(results))
+    
+    return {
+        "enrolled": enrolled,
+        "failed": len(results) - enrolled,
+        "results": results
+    }
+
+
+@app.get("/face/enrolled", tags=["Face Recognition"])
+async def list_enrolled_faces():
+    """
+    List all enrolled students and the models they have templates for.
+    """
+    return {"count": len(face_gallery), "students": face_gallery.list_students()}
+
+
+@app.delete("/face/enroll/{student_id}", tags=["Face Recognition"])
+async def remove_enrolled_face(student_id: str):
+    """
+    Remove a student's templates from the gallery.
+    """
+    if not face_gallery.remove(student_id):
+        raise HTTPException(status_code=404, detail=f"Student {student_id} is not enrolled")
+    if face_verifier.face_index is not None:
+        face_verifier.face_index.remove([student_id])
+    
+    return {"success": True, "student_id": student_id}
+
+
+@app.post("/face/identify", tags=["Face Recognition"])
+async def identify_face(
+    selfie: UploadFile = File(..., description="Live selfie image"),
+    top_k: int = Form(5, ge=1, le=50, description="Number of candidates to return")
+):
+    """
+    Identify who a selfie belongs to, without a student ID (kiosk mode).
+    
+    The selfie is embedded once and searched against every enrolled
+    template through the face index: exact search for small galleries,
+    partitioned (IVF) search for campus-scale ones.
+    
+    **Response:**
+    - `identified`: Whether the closest student is within the threshold
+    - `student_id`: The identified student (null if no match)
+    - `candidates`: Closest students with distance, confidence and `matched`
+    """
+    selfie_bytes = await read_image_upload(selfie)
+    return await run_in_threadpool(face_verifier.identify, selfie=selfie_bytes, top_k=top_k)
+
+
+@app.get("/face/index/stats", tags=["Face Recognition"])
+async def get_face_index_stats():
+    """
+    Get face search index state.
+    
+    **Response:**
+    - `size`: Indexed students
+    - `type`: `flat` (exact) or `ivf` (partitioned)
+    - `n_lists`, `n_probe`: IVF partitions and partitions searched per query
+    - `memory_mapped`: Whether vectors are served from the on-disk file
+    """
+    if face_verifier.face_index is None:
+        return {"enabled": False}
+    return {"enabled": True, **face_verifier.face_index.stats()}
+
+
+@app.get("/face/cascade/stats", tags=["Face Recognition"])
+async def get_face_cascade_stats():
+    """
+    Get cascaded verification counters.
+    
+    Enable with `FACE_CASCADE_MODELS` (cheap models tried before the main
+    model). Cheap stages accept within their "strict" threshold, reject
+    beyond "very_lenient" and escalate everything in between.
+    
+    **Response:**
+    - `stages`: Models in cascade order
+    - `decided_by`: Verifications decided by each model
+    - `final_inferences_avoided`, `early_exit_rate`: Main-model runs saved
+    """
+    if cascade_verifier is None:
+        return {"enabled": False}
+    return {"enabled": True, **cascade_verifier.stats()}
+
+
+@app.get("/face/brownout/stats", tags=["Face Recognition"])
+async def get_face_brownout_stats():
+    """
+    Get brownout state.
+    
+    Under load, 1:1 face verification (`/face/verify`, `/attendance/verify`
+    and attendance jobs) steps down one tier at a time - first decoding
+    selfies at `BROWNOUT_DECODE_MAX_SIDE`, then verifying with the cheaper
+    `BROWNOUT_MODEL` - and steps back up once the load has dropped. Every
+    response carries the `service_tier` that served it.
+    
+    **Response:**
+    - `tiers`: Tiers in order, with their model and decode resolution
+    - `current`: Tier new requests are served at
+    - `thresholds`: Enter / exit queue depth and p95 latency, and the
+      minimum time between switches (`hold_s`)
+    - `depth`, `p95_ms`: Current face queue depth and p95 verification
+      latency at the current tier
+    - `served`: Requests served per tier
+    - `switches`: Recent tier switches with their reason
+    """
+    if brownout is None:
+        return {"enabled": False}
+    return {"enabled": True, **brownout.stats()}
+
+
+@app.get("/face/quality/stats", tags=["Face Recognition"])
+async def get_face_quality_stats():
+    """
+    Get face quality pre-gate counters.
+    
+    The gate rejects dark, overexposed, blurry, tiny, tilted or turned faces
+    before the embedding network runs. Configure with `FACE_QUALITY_GATE`
+    and the `FACE_QUALITY_*` thresholds.
+    
+    **Response:**
+    - `checked`, `passed`, `rejected`: Gated live selfies
+    - `rejected_by_reason`: Rejections per reason
+    - `inferences_saved`: Embedding forward passes avoided
+    """
+    if face_quality_gate is None:
+        return {"enabled": False}
+    return {"enabled": True, **face_quality_gate.stats()}
+
+
+@app.get("/face/cache/stats", tags=["Face Recognition"])
+async def get_face_cache_stats():
+    """
+    Get profile embedding cache counters.
+    
+    Use the hit rate and eviction count to size `FACE_CACHE_SIZE`.
+    
+    **Response:**
+    - `size`, `max_entries`: Current and maximum in-memory entries
+    - `hits`, `disk_hits`, `misses`: Lookup counters
+    - `evictions`: Entries dropped from the memory tier
+    - `hit_rate`: Fraction of lookups served from cache
+    """
+    return embedding_cache.stats()
+
+
+@app.get("/face/batcher/stats", tags=["Face Recognition"])
+async def get_face_batcher_stats():
+    """
+    Get micro-batching statistics for face embeddings.
+    
+    Use these to tune `FACE_BATCH_MAX_SIZE` and `FACE_BATCH_MAX_WAIT_MS`:
+    larger batches raise throughput, while `queue_wait_ms` shows the
+    latency each request pays waiting for its batch to fill.
+    
+    **Response:**
+    - `enabled`: Whether batching is active
+    - `avg_batch_size`, `batch_size_histogram`: Achieved batch sizes
+    - `queue_wait_ms`: Added queueing latency (mean/p50/p95/max)
+    """
+    if face_verifier.batcher is None:
+        return {"enabled": False}
+    return {"enabled": True, **face_verifier.batcher.stats()}
+
+
+@app.get("/face/pool/stats", tags=["Face Recognition"])
+async def get_face_pool_stats():
+    """
+    Get inference worker pool state.
+    
+    Configure with `FACE_WORKERS` (0 = in-process inference) and
+    `FACE_WORKER_THREADS` (TensorFlow threads per worker).
+    
+    **Response:**
+    - `workers`, `ready_workers`: Configured and warmed-up worker processes
+    - `threads_per_worker`: Pinned thread budget
+    - `in_flight`: Tasks currently running in workers
+    - `tasks_dropped`: Tasks abandoned because their request deadline passed
+    """
+    if inference_pool is None:
+        return {"enabled": False}
+    return {"enabled": True, **inference_pool.stats()}
+
+
+# --- Blink Liveness ---
+
+@app.post("/liveness/blink", tags=["Liveness"])
+async def check_blink_liveness(
+    frames: List[UploadFile] = File(..., description="Video frames (JPEG/PNG) in capture order")
+):
+    """
+    Check liveness from a short burst of frames by detecting an eye blink.
+    
+    Frames are analysed in order with MediaPipe FaceMesh. The check stops
+    as soon as a blink is confirmed (eyes closed for `EYE_AR_CONSEC_FRAMES`
+    frames below `EYE_AR_THRESH`, then reopened); later frames are never
+    decoded. Requests with more than `LIVENESS_MAX_FRAMES` frames, or a
+    frame over `LIVENESS_FRAME_MAX_BYTES`, are rejected with 413.
+    
+    **Response:**
+    - `live`: Whether a blink was confirmed
+    - `reason`: Why the check ended
+    - `frames_processed`, `frames_dropped`: Frames analysed / skipped after the decision
+    - `min_ear`: Lowest eye aspect ratio seen
+    """
+    if not liveness_detector.available:
+        raise HTTPException(status_code=503, detail="Liveness detection unavailable: MediaPipe is not installed")
+    
+    if len(frames) > LIVENESS_MAX_FRAMES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many frames: {len(frames)} (max {LIVENESS_MAX_FRAMES})"
+        )
+    
+    # Frames are read (and sniffed) up front; decoding stays lazy in the check
+    frame_bytes = [await read_image_upload(upload, max_bytes=LIVENESS_FRAME_MAX_BYTES) for upload in frames]
+    try:
+        return await run_in_threadpool(liveness_detector.check, iter(frame_bytes), total=len(frames))
+    except queue.Empty:
+        raise HTTPException(status_code=503, detail="Liveness detector busy, retry shortly")
+
+
+@app.websocket("/liveness/stream")
+async def stream_blink_liveness(websocket: WebSocket):
+    """
+    Stream frames for blink liveness over a WebSocket.
+    
+    Send each frame as a binary message (encoded JPEG/PNG), or the text
+    message "end" to finish early. The server replies with a single JSON
+    result (see `/liveness/blink`) as soon as the stream is decided, then
+    closes the connection.
+    
+    A stream with no frame for `LIVENESS_FRAME_TIMEOUT_S`, or still
+    undecided after `LIVENESS_STREAM_TIMEOUT_S`, is rejected as not live.
+    """
+    await websocket.accept()
+    if not liveness_detector.available:
+        await websocket.send_json({"success": False, "live": False,
+                                   "error": "MediaPipe is not installed. Please install with: pip install mediapipe"})
+        await websocket.close()
+        return
+    
+    try:
+        mesh = await run_in_threadpool(liveness_detector.pool.checkout, liveness_detector.acquire_timeout)
+    except queue.Empty:
+        await websocket.send_json({"success": False, "live": False, "error": "Liveness detector busy, retry shortly"})
+        await websocket.close(code=1013)
+        return
+    
+    session = liveness_detector.new_session(mesh)
+    loop = asyncio.get_running_loop()
+    stream_deadline = loop.time() + LIVENESS_STREAM_TIMEOUT_S
+    try:
+        while not session.decided:
+            # An idle or endless stream must not hold its FaceMesh forever
+            remaining = stream_deadline - loop.time()
+            if remaining <= 0:
+                session.finish(f"not decided within {LIVENESS_STREAM_TIMEOUT_S:g}s")
+                break
+            try:
+                message = await asyncio.wait_for(websocket.receive(), timeout=min(LIVENESS_FRAME_TIMEOUT_S, remaining))
+            except asyncio.TimeoutError:
+                if remaining <= LIVENESS_FRAME_TIMEOUT_S:
+                    session.finish(f"not decided within {LIVENESS_STREAM_TIMEOUT_S:g}s")
+                else:
+                    session.finish(f"no frame for {LIVENESS_FRAME_TIMEOUT_S:g}s")
+                break
+            if message["type"] == "websocket.disconnect":
+                return
+            if message.get("bytes"):
+                await run_in_threadpool(session.add_frame, message["bytes"])
+            elif message.get("text") == "end":
+                session.finish()
+        
+        await websocket.send_json(session.result())
+        await websocket.close()
+    except WebSocketDisconnect:
+        logger.info("Liveness stream disconnected after %d frames", session.frames)
     finally:
-        cleanup_files(selfie_path, profile_image_path)
+        liveness_detector.pool.checkin(mesh)
 
 
 # --- OCR Extraction ---
 
 @app.post("/ocr/extract", tags=["OCR"])
 async def extract_id_card(
-    id_card: UploadFile = File(..., description="College student ID card image")
+    id_card: UploadFile = File(..., description="College student ID card image"),
+    debug: bool = Query(False, description="Attach the full timing trace to the response")
 ):
     """
     Extract text information from a college student ID card.
@@ -535,6 +1709,10 @@ async def extract_id_card(
     - `name`: Student's full name
     - `branch`: Branch/Department
     - `success`: Whether extraction succeeded
+    - `trace`: With `debug=true`, the full timing trace
+    
+    The `Server-Timing` header carries the time spent per stage (upload
+    read, decode, Groq round trip).
     
     **Requires:** `GROQ_API_KEY` in `.env` file
     """
@@ -544,100 +1722,76 @@ async def extract_id_card(
             detail="OCR service not configured. Please set GROQ_API_KEY in .env file."
         )
     
-    id_card_path = None
+    # Read the upload into memory - the extractor decodes it from there
+    id_card_bytes = await read_image_upload(id_card)
     
     try:
-        # Save uploaded file temporarily
-        id_card_path = save_upload_file(id_card, "id_card_ocr.jpg")
-        
-        # Normalize path for Windows compatibility
-        id_card_path = os.path.normpath(id_card_path)
-        
-        logger.info("Extracting text from ID card: %s (saved to: %s)", id_card.filename, id_card_path)
-        
-        # Verify file exists before OCR
-        if not os.path.exists(id_card_path):
-            raise HTTPException(status_code=500, detail=f"Failed to save uploaded file")
+        logger.info("Extracting text from ID card: %s", id_card.filename)
         
         # Perform OCR extraction
-        result = ocr_extractor.extract_details(id_card_path)
-        
-        # Cleanup after successful extraction
-        cleanup_files(id_card_path)
-        
-        return result
-        
-    except HTTPException:
-        # Re-raise HTTP exceptions
-        cleanup_files(id_card_path)
-        raise
+        # Decode, re-encode and the Groq round trip block - keep them off the event loop
+        result = await run_in_threadpool(ocr_extractor.extract_details, id_card_bytes)
+        return _attach_trace(result, debug)
         
     except Exception as e:
         logger.error("OCR extraction error: %s", str(e))
-        cleanup_files(id_card_path)
         raise HTTPException(status_code=500, detail=str(e))
 
 
 # --- Main Attendance Verification (Complete Workflow) ---
 
-@app.post("/attendance/verify", response_model=AttendanceVerifyResponse, tags=["Attendance"])
-async def verify_attendance(
-    teacher_lat: float = Form(..., description="Teacher's latitude"),
-    teacher_lon: float = Form(..., description="Teacher's longitude"),
-    student_lat: float = Form(..., description="Student's latitude"),
-    student_lon: float = Form(..., description="Student's longitude"),
-    radius: float = Form(default=50.0, description="Allowed radius in meters"),
-    session_id: Optional[str] = Form(None, description="MongoDB session ID for Bluetooth check"),
-    beacon_uuid: Optional[str] = Form(None, description="Scanned beacon UUID"),
-    rssi_readings: Optional[str] = Form(None, description="JSON string of RSSI readings (e.g. '[-45, -48, -45]')"),
-    live_image: UploadFile = File(..., description="Live selfie image"),
-    profile_image: UploadFile = File(..., description="User profile photo")
-):
+async def read_attendance_images(
+    live_image: UploadFile,
+    profile_image: Optional[UploadFile],
+    id_card: Optional[UploadFile]
+) -> dict:
     """
-    🎯 **Main Attendance Verification Endpoint**
-    
-    Performs complete attendance verification in one request:
-    
-    1. **GPS Check** - Verifies student is within radius of teacher
-       - If FAIL: Returns immediately without processing images
-    
-    2. **Face Verification** - Compares selfie with profile photo
-       - Uses DeepFace VGG-Face model
-       - Profile photos are NEVER preprocessed
-    
-    3. **OCR Extraction** - Extracts name/branch from the college ID
-       - Requires Groq API key
-       - Uses LLaMA-4-Scout Vision model
+    Reads the image uploads of an attendance request into memory.
     
-    4. **Cleanup** - Removes all temporary files
-    
-    5. **Response** - Returns comprehensive verification result
-    
-    ---
-    
-    **Form Data Required:**
-    - `teacher_lat`, `teacher_lon`: Teacher's GPS coordinates
-    - `student_lat`, `student_lon`: Student's GPS coordinates
-    - `radius`: Maximum distance in meters (default: 50)
-    - `session_id`: (Optional) The session being marked
-    - `beacon_uuid`: (Optional) The scanned BLE UUID
-    - `rssi_readings`: (Optional) JSON array of RSSI values
+    Returns:
+        dict: live_image_bytes, profile_image_bytes and id_card_bytes
+              (None for uploads not given)
+    """
+    return {
+        "live_image_bytes": await read_image_upload(live_image),
+        "profile_image_bytes": await read_image_upload(profile_image) if profile_image is not None else None,
+        "id_card_bytes": await read_image_upload(id_card) if id_card is not None else None
+    }
+
+
+async def run_attendance_pipeline(
+    teacher_lat: float,
+    teacher_lon: float,
+    student_lat: float,
+    student_lon: float,
+    radius: float,
+    session_id: Optional[str],
+    rssi_readings: Optional[str],
+    student_id: Optional[str],
+    live_image_bytes: memoryview,
+    profile_image_bytes: Optional[memoryview],
+    id_card_bytes: Optional[memoryview],
+    timer: Optional[StageTimer] = None
+) -> dict:
+    """
+    Runs the attendance verification stages on uploads already in memory.
     
-    **Files Required:**
-    - `live_image`: Live selfie photo
-    - `profile_image`: User profile photo from database
+    Shared by `/attendance/verify` and the attendance job queue.
     
-    ---
+    Args:
+        teacher_lat, teacher_lon, student_lat, student_lon, radius: GPS check
+        session_id, rssi_readings: Bluetooth check
+        student_id: Enrolled student to verify against (None = use profile_image_bytes)
+        live_image_bytes: Selfie
+        profile_image_bytes: Profile photo (when not enrolled)
+        id_card_bytes: ID card photo for OCR (optional)
+        timer: Stage timer already holding earlier stages (None = start one)
     
-    **Response:**
-    - `overall_verified`: Final pass/fail status
-    - `gps_check`: GPS validation result
-    - `face_verification`: Face match result
-    - `ocr_extraction`: Extracted document data
+    Returns:
+        dict: The AttendanceVerifyResponse body
     """
+    timer = timer or StageTimer()
     timestamp = datetime.now().isoformat()
-    live_image_path = None
-    profile_image_path = None
     
     # Initialize response structure
     response = {
@@ -647,183 +1801,453 @@ async def verify_attendance(
         "bluetooth_check": {"status": "skipped", "reason": "Not provided"},
         "face_verification": {},
         "ocr_extraction": {},
-        "overall_verified": False
+        "overall_verified": False,
+        "service_tier": None,
+        "timings": {}
     }
     
+    # Stage started in the background when an ID card is sent
+    ocr_task = None
+    
     try:
         # ================================================================
-        # STEP 1: GPS PROXIMITY CHECK (Fail-fast)
+        # STEP 1: START DECODING (overlaps with step 2)
         # ================================================================
-        logger.info("Step 1: GPS proximity check...")
+        # The brownout tier decides the decode resolution and the face model
+        tier = _select_face_tier(student_id)
+        response["service_tier"] = tier.name
+        decode_task = timer.start("decode", run_in_threadpool, _predecode_selfie, live_image_bytes, tier.decode_max_side)
         
-        gps_result = gps_manager.validate_proximity(
-            teacher_lat=teacher_lat,
-            teacher_lon=teacher_lon,
-            student_lat=student_lat,
-            student_lon=student_lon,
-            radius=radius
-        )
+        # ================================================================
+        # STEP 2: GPS + BLUETOOTH PROXIMITY CHECKS (cheap, fail-fast)
+        # ================================================================
+        # Run in the thread pool: awaiting them lets the decode task start
+        # its thread, which synchronous checks on the event loop would hold back
+        logger.info("Step 2: GPS proximity check...")
+        
+        with timer.stage("gps"):
+            gps_result = await run_in_threadpool(
+                gps_manager.validate_proximity,
+                teacher_lat=teacher_lat,
+                teacher_lon=teacher_lon,
+                student_lat=student_lat,
+                student_lon=student_lon,
+                radius=radius
+            )
         
         response["gps_check"] = gps_result
         
         # If GPS check fails, return immediately without processing images
         if not gps_result.get("allowed"):
+            timer.cancel()
             response["status"] = "failed"
             response["bluetooth_check"] = {"skipped": True, "reason": "GPS check failed"}
             response["face_verification"] = {"skipped": True, "reason": "GPS check failed"}
             response["ocr_extraction"] = {"skipped": True, "reason": "GPS check failed"}
+            response["timings"] = timer.summary()
             logger.warning("GPS check failed. Skipping further processing.")
             return response
         
         logger.info("GPS check passed. Distance: %sm", gps_result.get("distance"))
         
-        # ================================================================
-        # STEP 1.5: BLUETOOTH PROXIMITY CHECK (Optional/Dynamic)
-        # ================================================================
-        bluetooth_passed = True # Default if not used
-        
-        if session_id:
-            beacon_info = get_beacon(session_id)
-            if beacon_info and beacon_info.get("is_active"):
-                logger.info("Step 1.5: Bluetooth proximity check required for session %s...", session_id)
-                
-                if not rssi_readings:
-                    bluetooth_passed = False
-                    response["bluetooth_check"] = {
-                        "status": "failed", 
-                        "reason": "Bluetooth verification required but RSSI readings not provided"
-                    }
-                else:
-                    try:
-                        # Parse RSSI readings if they come as a JSON string
-                        readings = json.loads(rssi_readings) if isinstance(rssi_readings, str) else rssi_readings
-                        
-                        bt_result = bluetooth_service.validate_proximity(
-                            rssi_readings=readings,
-                            threshold=beacon_info.get("threshold", -65)
-                        )
-                        
-                        response["bluetooth_check"] = bt_result.to_dict()
-                        bluetooth_passed = bt_result.present
-                        
-                        if not bluetooth_passed:
-                            logger.warning("Bluetooth proximity check failed: %s", bt_result.message)
-                        else:
-                            logger.info("Bluetooth check passed. Quality: %s", bt_result.signal_quality)
-                            
-                    except Exception as e:
-                        logger.error("Error parsing/validating Bluetooth data: %s", str(e))
-                        bluetooth_passed = False
-                        response["bluetooth_check"] = {"status": "error", "reason": str(e)}
-            else:
-                response["bluetooth_check"] = {"status": "skipped", "reason": "No active beacon for session"}
+        with timer.stage("bluetooth"):
+            bluetooth_passed, response["bluetooth_check"] = await run_in_threadpool(
+                _bluetooth_check, session_id, rssi_readings
+            )
         
         # If Bluetooth check was required and failed, fail-fast
         if not bluetooth_passed:
+            timer.cancel()
             response["status"] = "failed"
             response["face_verification"] = {"skipped": True, "reason": "Bluetooth check failed"}
             response["ocr_extraction"] = {"skipped": True, "reason": "Bluetooth check failed"}
+            response["timings"] = timer.summary()
             return response
-
+        
         # ================================================================
-        # STEP 2: FILE HANDLING - Save uploaded images
+        # STEP 3: FACE VERIFICATION + OCR EXTRACTION (in parallel)
         # ================================================================
-        logger.info("Step 2: Saving uploaded images...")
-        
-        live_image_path = save_upload_file(live_image, "selfie.jpg")
-        profile_image_path = save_upload_file(profile_image, "profile.jpg")
+        logger.info("Step 3: Face verification%s...", " and OCR extraction" if id_card_bytes is not None else "")
         
-        logger.info("Images saved: selfie=%s, profile=%s", 
-                   live_image.filename, profile_image.filename)
+        # Mandatory work left - drop it if nobody is waiting any more
+        check_deadline("attendance_face")
         
-        # ================================================================
-        # STEP 3: FACE VERIFICATION
-        # ================================================================
-        logger.info("Step 3: Face verification...")
+        budget = remaining_budget()
+        if id_card_bytes is None:
+            response["ocr_extraction"] = {"skipped": True, "reason": "No ID card image provided"}
+        elif not ocr_extractor.is_configured():
+            response["ocr_extraction"] = {"skipped": True, "reason": "OCR service not configured"}
+        elif budget is not None and budget < OCR_MIN_BUDGET_S:
+            record_drop("ocr")
+            response["ocr_extraction"] = {"skipped": True, "reason": f"Only {budget:.1f}s left before the request deadline"}
+        else:
+            ocr_task = timer.start("ocr", run_in_threadpool, ocr_extractor.extract_details, id_card_bytes)
         
-        face_result = face_verifier.verify_identity(
-            selfie_path=live_image_path,
-            profile_image_path=profile_image_path,
-            preprocess=False  # Profile photos are never preprocessed
-        )
+        selfie = await decode_task
+        if student_id:
+            # Enrolled students: only the selfie is embedded
+            face_task = timer.start(
+                "face", run_in_threadpool, tier.engine.verify_enrolled, selfie=selfie, student_id=student_id
+            )
+        else:
+            face_task = timer.start(
+                "face", run_in_threadpool, tier.engine.verify_identity,
+                selfie=selfie,
+                profile_image=profile_image_bytes,
+                preprocess=False  # Profile photos are never preprocessed
+            )
+        face_result = await face_task
+        if brownout is not None:
+            brownout.record(tier, timer.stages["face"])
         
         response["face_verification"] = face_result
+        face_passed = face_result.get("verified", False)
         
-        if not face_result.get("verified", False):
+        if not face_passed:
             logger.warning("Face verification failed: %s", 
                           face_result.get("error", "Faces don't match"))
+            if ocr_task is not None and not ocr_task.done():
+                timer.cancel("ocr")
+                ocr_task = None
+                response["ocr_extraction"] = {"skipped": True, "reason": "Face verification failed"}
         else:
             logger.info("Face verification passed. Distance: %s", 
                        face_result.get("distance"))
         
-        # ================================================================
-        # STEP 4: OCR EXTRACTION (Optional - requires actual ID card)
-        # ================================================================
-        logger.info("Step 4: OCR extraction (skipped for profile-based verification)...")
-        
-        # Note: In profile-based verification, we don't have an ID card image
-        # OCR extraction is only available when using the full attendance/verify endpoint
-        # with a separate ID card image
-        response["ocr_extraction"] = {
-            "skipped": True,
-            "reason": "Profile-based verification does not include ID card"
-        }
-        logger.info("OCR extraction skipped (no ID card in profile verification)")
+        if ocr_task is not None:
+            # OCR is informational - it does not decide overall_verified
+            response["ocr_extraction"] = await ocr_task
         
         # ================================================================
-        # STEP 5: DETERMINE OVERALL STATUS
+        # STEP 4: DETERMINE OVERALL STATUS
         # ================================================================
-        gps_passed = gps_result.get("allowed", False)
-        face_passed = face_result.get("verified", False)
-        # bluetooth_passed is already calculated above
-        
-        if gps_passed and bluetooth_passed and face_passed:
+        if face_passed:
             response["status"] = "verified"
             response["overall_verified"] = True
             logger.info("✅ Attendance verification PASSED")
+        elif deadline_expired():
+            # The face stage was dropped (or finished) after the deadline
+            response["status"] = "expired"
+            logger.warning("⏱️ Attendance verification EXPIRED")
         else:
             response["status"] = "failed"
             response["overall_verified"] = False
             logger.warning("❌ Attendance verification FAILED")
         
+        response["timings"] = timer.summary()
+        return response
+        
+    except DeadlineExceeded as e:
+        logger.warning("Attendance verification dropped: %s", str(e))
+        response["status"] = "expired"
+        response["error"] = str(e)
+        response["timings"] = timer.summary()
         return response
         
     except Exception as e:
         logger.error("Attendance verification error: %s", str(e))
         response["status"] = "error"
         response["error"] = str(e)
+        response["timings"] = timer.summary()
         return response
         
     finally:
-        # ================================================================
-        # STEP 6: CLEANUP - Remove temporary files
-        # ================================================================
-        logger.info("Step 6: Cleaning up temporary files...")
-        cleanup_files(live_image_path, profile_image_path)
+        # Nothing outlives the request (no-op for finished stages)
+        timer.cancel()
 
 
-# --- Dummy Data Endpoints (For Testing) ---
 
-@app.get("/dummy/teachers", tags=["Testing"])
-async def get_dummy_teachers():
+@app.post("/attendance/verify", response_model=AttendanceVerifyResponse, tags=["Attendance"])
+async def verify_attendance(
+    teacher_lat: float = Form(..., description="Teacher's latitude"),
+    teacher_lon: float = Form(..., description="Teacher's longitude"),
+    student_lat: float = Form(..., description="Student's latitude"),
+    student_lon: float = Form(..., description="Student's longitude"),
+    radius: float = Form(default=50.0, description="Allowed radius in meters"),
+    session_id: Optional[str] = Form(None, description="MongoDB session ID for Bluetooth check"),
+    beacon_uuid: Optional[str] = Form(None, description="Scanned beacon UUID"),
+    rssi_readings: Optional[str] = Form(None, description="JSON string of RSSI readings (e.g. '[-45, -48, -45]')"),
+    student_id: Optional[str] = Form(None, description="Enrolled student ID (replaces profile_image)"),
+    live_image: UploadFile = File(..., description="Live selfie image"),
+    profile_image: Optional[UploadFile] = File(None, description="User profile photo (legacy, when not enrolled)"),
+    id_card: Optional[UploadFile] = File(None, description="College ID card image for OCR (optional)"),
+    debug: bool = Query(False, description="Attach the full timing trace to the response")
+):
     """
-    Get all dummy teacher data for testing.
+    🎯 **Main Attendance Verification Endpoint**
     
-    This endpoint is for development/testing purposes only.
-    Will be replaced with MongoDB integration later.
+    Performs complete attendance verification in one request. Stages overlap
+    where they can; outstanding work is cancelled as soon as a mandatory
+    check (GPS, Bluetooth, face) fails:
+    
+    1. **GPS + Bluetooth Checks** - Verifies student is within radius of
+       teacher (and of the session beacon), while the selfie is decoded
+       in the background
+       - If FAIL: Returns immediately, decoding is cancelled
+    
+    2. **Face Verification** - Compares selfie with the enrolled template
+       (or with an uploaded profile photo for students not yet enrolled)
+       - Uses DeepFace VGG-Face model
+       - Profile photos are NEVER preprocessed
+    
+    3. **OCR Extraction** - Extracts name/branch from the college ID,
+       in parallel with face verification (only when `id_card` is sent)
+       - Requires Groq API key
+       - Uses LLaMA-4-Scout Vision model
+       - Informational: does not decide `overall_verified`
+    
+    4. **Response** - Returns comprehensive verification result
+    
+    ---
+    
+    **Form Data Required:**
+    - `teacher_lat`, `teacher_lon`: Teacher's GPS coordinates
+    - `student_lat`, `student_lon`: Student's GPS coordinates
+    - `radius`: Maximum distance in meters (default: 50)
+    - `session_id`: (Optional) The session being marked
+    - `beacon_uuid`: (Optional) The scanned BLE UUID
+    - `rssi_readings`: (Optional) JSON array of RSSI values
+    - `student_id`: Enrolled student ID (preferred over `profile_image`)
+    
+    **Files:**
+    - `live_image`: Live selfie photo
+    - `profile_image`: User profile photo from database - only needed when
+      the student is not enrolled
+    - `id_card`: (Optional) College ID card photo for OCR
+    
+    ---
+    
+    **Response:**
+    - `overall_verified`: Final pass/fail status
+    - `status`: "verified", "failed", "expired" (dropped at the deadline
+      sent in `X-Request-Timeout-Ms` / `X-Request-Deadline`) or "error"
+    - `gps_check`: GPS validation result
+    - `face_verification`: Face match result
+    - `ocr_extraction`: Extracted document data
+    - `service_tier`: Brownout tier that verified the face ("full",
+      "reduced_resolution" or "cheap_model", see `/face/brownout/stats`)
+    - `timings`: Duration of each stage (`stages_ms`), `total_ms` and the
+      stages that were `cancelled`
+    - `trace`: With `debug=true`, every timed step (admission wait, upload
+      read, decode, geodesic, face detection, embedding, Groq round trip,
+      ...) with its start offset, duration and thread
+    
+    The `Server-Timing` header carries the time spent per step.
     """
-    return {"teachers": DUMMY_TEACHERS}
+    timer = StageTimer()
+    
+    use_gallery = bool(student_id) and student_id in face_gallery
+    if not use_gallery and profile_image is None:
+        raise HTTPException(
+            status_code=400,
+            detail="Student is not enrolled - provide an enrolled student_id or a profile_image"
+        )
+    
+    with timer.stage("upload_read"):
+        images = await read_attendance_images(live_image, None if use_gallery else profile_image, id_card)
+    
+    response = await run_attendance_pipeline(
+        teacher_lat=teacher_lat,
+        teacher_lon=teacher_lon,
+        student_lat=student_lat,
+        student_lon=student_lon,
+        radius=radius,
+        session_id=session_id,
+        rssi_readings=rssi_readings,
+        student_id=student_id if use_gallery else None,
+        timer=timer,
+        **images
+    )
+    return _attach_trace(response, debug)
+
 
+# --- Asynchronous Attendance Jobs ---
 
-@app.get("/dummy/students", tags=["Testing"])
-async def get_dummy_students():
+@app.post("/attendance/jobs", status_code=202, tags=["Attendance"])
+async def submit_attendance_job(
+    teacher_lat: float = Form(..., description="Teacher's latitude"),
+    teacher_lon: float = Form(..., description="Teacher's longitude"),
+    student_lat: float = Form(..., description="Student's latitude"),
+    student_lon: float = Form(..., description="Student's longitude"),
+    radius: float = Form(default=50.0, description="Allowed radius in meters"),
+    session_id: Optional[str] = Form(None, description="MongoDB session ID for Bluetooth check"),
+    beacon_uuid: Optional[str] = Form(None, description="Scanned beacon UUID"),
+    rssi_readings: Optional[str] = Form(None, description="JSON string of RSSI readings (e.g. '[-45, -48, -45]')"),
+    student_id: Optional[str] = Form(None, description="Enrolled student ID (replaces profile_image)"),
+    live_image: UploadFile = File(..., description="Live selfie image"),
+    profile_image: Optional[UploadFile] = File(None, description="User profile photo (legacy, when not enrolled)"),
+    id_card: Optional[UploadFile] = File(None, description="College ID card image for OCR (optional)")
+):
+    """
+    Queue an attendance verification and return at once.
+    
+    Takes the same form as `/attendance/verify`. The uploads are read and
+    validated immediately; the verification itself runs when one of the
+    `ATTENDANCE_JOB_WORKERS` workers is free. Poll
+    `/attendance/jobs/{job_id}` or open the WebSocket
+    `/attendance/jobs/{job_id}/ws` for the result, which is kept for
+    `ATTENDANCE_JOB_RESULT_TTL` seconds after the job finishes.
+    
+    **Response (202):**
+    - `job_id`: ID to poll
+    - `status`: "queued"
+    - `position`, `expected_wait_s`: Jobs ahead and the estimated wait
+    
+    **Errors:**
+    - `503` with `Retry-After` when the queue is full or disabled
     """
-    Get all dummy student data for testing.
+    if attendance_jobs is None:
+        raise HTTPException(status_code=503, detail="Attendance job queue is disabled (ATTENDANCE_JOB_WORKERS=0)")
+    
+    use_gallery = bool(student_id) and student_id in face_gallery
+    if not use_gallery and profile_image is None:
+        raise HTTPException(
+            status_code=400,
+            detail="Student is not enrolled - provide an enrolled student_id or a profile_image"
+        )
+    
+    images = await read_attendance_images(live_image, None if use_gallery else profile_image, id_card)
+    
+    try:
+        job = attendance_jobs.submit(
+            run_attendance_pipeline,
+            teacher_lat=teacher_lat,
+            teacher_lon=teacher_lon,
+            student_lat=student_lat,
+            student_lon=student_lon,
+            radius=radius,
+            session_id=session_id,
+            rssi_readings=rssi_readings,
+            student_id=student_id if use_gallery else None,
+            **images
+        )
+    except QueueFullError as e:
+        logger.warning("Attendance job rejected: %s", str(e))
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    
+    logger.info("Attendance job %s queued at position %d", job["job_id"], job["position"])
+    return job
+
+
+@app.get("/attendance/jobs/stats", tags=["Attendance"])
+async def get_attendance_job_stats():
+    """
+    Get attendance job queue statistics.
+    
+    **Response:**
+    - `enabled`: Whether the job queue is active
+    - `queued`, `running`, `retained_results`: Current job counts
+    - `submitted`, `done`, `failed`, `rejected`, `expired`: Counters
+    - `avg_job_ms`, `expected_wait_s`: Drain rate and current wait estimate
+    """
+    if attendance_jobs is None:
+        return {"enabled": False}
+    return {"enabled": True, **attendance_jobs.stats()}
+
+
+@app.get("/attendance/jobs/{job_id}", tags=["Attendance"])
+async def get_attendance_job(job_id: str):
+    """
+    Get the status of a queued attendance verification.
+    
+    **Response:**
+    - `status`: "queued", "running", "done", "failed" or "dropped" (the
+      deadline sent with the submission passed while the job was queued)
+    - `position`, `expected_wait_s`: While queued
+    - `queue_ms`, `run_ms`: Time spent waiting and running
+    - `result`: The `/attendance/verify` response, once done
+    - `error`: Error message, if failed
+    
+    Unknown job IDs and results older than `ATTENDANCE_JOB_RESULT_TTL`
+    return 404.
+    """
+    job = attendance_jobs.get(job_id) if attendance_jobs is not None else None
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown or expired job: {job_id}")
+    return job
+
+
+@app.websocket("/attendance/jobs/{job_id}/ws")
+async def watch_attendance_job(websocket: WebSocket, job_id: str):
+    """
+    Push the status of a queued attendance verification.
+    
+    The server sends the job's status as JSON (see `/attendance/jobs/{job_id}`)
+    right away and after every change, then closes the connection once the
+    job is done or failed.
+    """
+    await websocket.accept()
+    if attendance_jobs is None or attendance_jobs.get(job_id) is None:
+        await websocket.send_json({"job_id": job_id, "status": "unknown",
+                                   "error": f"Unknown or expired job: {job_id}"})
+        await websocket.close(code=1008)
+        return
+    
+    try:
+        async for status in attendance_jobs.watch(job_id):
+            await websocket.send_json(status)
+        await websocket.close()
+    except WebSocketDisconnect:
+        logger.info("Job watcher for %s disconnected", job_id)
+
+
+# --- Group Photo Attendance ---
+
+@app.post("/attendance/group", tags=["Attendance"])
+async def verify_group_attendance(
+    roster: str = Form(..., description="JSON array of enrolled student IDs for the session"),
+    photo: UploadFile = File(..., description="Classroom photo"),
+    session_id: Optional[str] = Form(None, description="MongoDB session ID (echoed back)"),
+    threshold_mode: Optional[str] = Form(None, description="strict / normal / lenient / very_lenient")
+):
+    """
+    Mark attendance for a whole class from one photo.
+    
+    Every face in the photo is detected and embedded in a single batch, then
+    matched against the roster's enrolled templates with one vectorized
+    distance matrix, using the `MODEL_THRESHOLDS` of the active model.
+    
+    **Response:**
+    - `present`: Matched students (distance, confidence, face location)
+    - `absent`: Enrolled roster students not found in the photo
+    - `not_enrolled`: Roster students without a face template
+    - `faces_detected`, `unmatched_faces`: Face counts
+    """
+    try:
+        student_ids = json.loads(roster)
+    except json.JSONDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"roster must be a JSON array: {e}")
+    
+    if not isinstance(student_ids, list) or not student_ids:
+        raise HTTPException(status_code=400, detail="roster must be a non-empty JSON array of student IDs")
+    
+    if threshold_mode and threshold_mode not in FaceVerifier.MODEL_THRESHOLDS.get(face_verifier.model_name, {}):
+        raise HTTPException(status_code=400, detail=f"Unknown threshold_mode: {threshold_mode}")
+    
+    photo_bytes = await read_image_upload(photo, max_bytes=UPLOAD_GROUP_MAX_BYTES)
+    logger.info("Group attendance: session=%s, roster=%d students", session_id, len(student_ids))
+    
+    result = await run_in_threadpool(
+        face_verifier.identify_group,
+        image=photo_bytes,
+        roster=[str(sid) for sid in student_ids],
+        threshold_mode=threshold_mode
+    )
+    result["session_id"] = session_id
+    return result
+
+
+# --- Dummy Data Endpoints (For Testing) ---
+
+@app.get("/dummy/teachers", tags=["Testing"])
+async def get_dummy_teachers():
+    """
+    Get all dummy teacher data for testing.
     
     This endpoint is for development/testing purposes only.
     Will be replaced with MongoDB integration later.
     """
-    return {"students": DUMMY_STUDENTS}
+    return {"teachers": DUMMY_TEACHERS}
 
 
 @app.get("/dummy/ocr/{student_id}", tags=["Testing"])
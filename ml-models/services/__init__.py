@@ -1,8 +1,31 @@
 # Services Package
-# Export all service classes for easy importing
+# Export all service classes for easy importing.
+# Submodules are imported when a class is first accessed, so importing one
+# service (e.g. services.gps_service) does not load the face/OCR stacks.
 
-from .gps_service import GPSManager
-from .face_service import FaceVerifier
-from .ocr_service import IDCardExtractor
+import importlib
 
-__all__ = ["GPSManager", "FaceVerifier", "IDCardExtractor"]
+_EXPORTS = {
+    "GPSManager": ".gps_service",
+    "FaceVerifier": ".face_service",
+    "EmbeddingCache": ".embedding_cache",
+    "FaceGallery": ".face_gallery",
+    "FaceIndex": ".face_index",
+    "CascadeVerifier": ".face_cascade",
+    "LivenessDetector": ".liveness_service",
+    "IDCardExtractor": ".ocr_service",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
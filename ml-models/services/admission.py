@@ -0,0 +1,267 @@
+"""
+Admission Control Module
+=========================
+Per-endpoint concurrency limits and load shedding.
+
+Without a limit, an overload makes every request slow: hundreds of face
+verifications share the CPU and all of them miss the client's timeout.
+With admission control a fixed number run at once, a bounded number wait
+for a slot, and the rest fail fast so the mobile app can back off. This
+module provides:
+- AdmissionController, a concurrency limit with a bounded FIFO wait queue
+  and a wait budget, estimating the wait from recent service times
+- AdmissionMiddleware, applying controllers by request path before the
+  request body is read, so shed requests never buffer their uploads; time
+  spent receiving the body is left out of the service time estimate, so
+  slow uploads do not make the controller shed more
+- 429 (queue full) and 503 (expected wait over budget, or budget
+  exhausted while waiting) responses with Retry-After
+- 504 for requests whose deadline (see deadline.py) passes, or would pass,
+  before they get a slot - they are dropped from the queue
+- Live in-flight / queue-depth / rejection counters, and the time each
+  admitted request waited for its slot (admission_wait stage metric)
+"""
+
+import json
+import math
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Mapping
+
+from .deadline import record_drop, remaining_budget
+from .metrics import observe
+
+# Configure module-level logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class AdmissionRejected(RuntimeError):
+    """
+    Raised when a request is shed.
+
+    Attributes:
+        status_code (int): 429 (queue full), 503 (wait over budget) or
+                           504 (request deadline)
+        retry_after (int): Seconds the client should wait before retrying
+        reason (str): "queue_full", "wait_budget", "wait_timeout" or "deadline"
+    """
+
+    def __init__(self, message: str, status_code: int, retry_after: int, reason: str):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class AdmissionSlot:
+    """
+    A held slot, yielded by AdmissionController.admit().
+
+    Attributes:
+        upload_s (float): Time the request spent receiving its body, which
+                          is excluded from the service time estimate
+    """
+
+    def __init__(self):
+        self.upload_s = 0.0
+
+
+class AdmissionController:
+    """
+    Lets at most max_concurrent requests run and max_queued wait.
+
+    A request is rejected immediately when the queue is full (429) or when
+    the expected wait - queue position times the mean service time, spread
+    over the slots - exceeds max_wait_s (503). A queued request that has
+    not got a slot after max_wait_s is rejected too (503). Requests with a
+    deadline wait at most until it, and are dropped (504) if the expected
+    wait already exceeds it.
+
+    The service time is measured from admission to completion, minus any
+    time the block reports in AdmissionSlot.upload_s.
+
+    Attributes:
+        name (str): Name used in logs and statistics
+        max_concurrent (int): Requests that run at the same time
+        max_queued (int): Requests that may wait for a slot
+        max_wait_s (float): Longest time a request may wait for a slot
+    """
+
+    # Weight of the newest sample in the service time moving average
+    EWMA_ALPHA = 0.1
+
+    def __init__(self, name: str, max_concurrent: int, max_queued: int, max_wait_s: float):
+        """
+        Initialize the AdmissionController.
+
+        Args:
+            name: Name used in logs and statistics
+            max_concurrent: Requests that run at the same time
+            max_queued: Requests that may wait for a slot
+            max_wait_s: Longest time a request may wait for a slot
+        """
+        self.name = name
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queued = max(0, max_queued)
+        self.max_wait_s = max_wait_s
+
+        self._slots = asyncio.Semaphore(self.max_concurrent)
+        self._in_flight = 0
+        self._queued = 0
+        self._service_s = None
+        self._admitted = 0
+        self._rejected = {"queue_full": 0, "wait_budget": 0, "wait_timeout": 0, "deadline": 0}
+
+    def expected_wait(self, position: int = None) -> float:
+        """Seconds a request queued at `position` (default: the back) would wait."""
+        if position is None:
+            position = self._queued
+        if self._in_flight < self.max_concurrent and position == 0:
+            return 0.0
+        return (position + 1) * (self._service_s or 0.0) / self.max_concurrent
+
+    def depth(self) -> int:
+        """Requests currently waiting for a slot."""
+        return self._queued
+
+    def _reject(self, reason: str, status_code: int, message: str) -> AdmissionRejected:
+        """Counts a rejection and builds its exception."""
+        self._rejected[reason] += 1
+        if reason == "deadline":
+            record_drop(f"{self.name}_admission")
+        retry_after = max(1, math.ceil(self.expected_wait()))
+        logger.warning("Admission '%s' rejected a request (%s): %s", self.name, reason, message)
+        return AdmissionRejected(message, status_code, retry_after, reason)
+
+    @asynccontextmanager
+    async def admit(self):
+        """
+        Holds a slot for the enclosed block.
+
+        Yields:
+            AdmissionSlot: The slot (add body receive time to upload_s)
+
+        Raises:
+            AdmissionRejected: If the request is shed
+        """
+        must_wait = self._slots.locked() or self._queued > 0
+        if must_wait and self._queued >= self.max_queued:
+            raise self._reject("queue_full", 429,
+                               f"{self.name}: {self._queued} requests already waiting")
+        expected = self.expected_wait()
+        if expected > self.max_wait_s:
+            raise self._reject("wait_budget", 503,
+                               f"{self.name}: expected wait {expected:.1f}s exceeds {self.max_wait_s:.1f}s")
+        budget = remaining_budget()
+        if budget is not None and (budget <= 0 or expected > budget):
+            raise self._reject("deadline", 504,
+                               f"{self.name}: expected wait {expected:.1f}s exceeds the request deadline")
+
+        queued_at = time.perf_counter()
+        if not must_wait:
+            # A free slot is taken without yielding, so simultaneous arrivals
+            # never see this request as queued
+            await self._slots.acquire()
+        else:
+            timeout = self.max_wait_s if budget is None else min(self.max_wait_s, budget)
+            self._queued += 1
+            try:
+                await asyncio.wait_for(self._slots.acquire(), timeout=timeout)
+            except asyncio.TimeoutError:
+                if timeout < self.max_wait_s:
+                    raise self._reject("deadline", 504,
+                                       f"{self.name}: request deadline passed while waiting for a slot")
+                raise self._reject("wait_timeout", 503,
+                                   f"{self.name}: no free slot within {self.max_wait_s:.1f}s")
+            finally:
+                self._queued -= 1
+
+        self._in_flight += 1
+        self._admitted += 1
+        start = time.perf_counter()
+        observe("admission_wait", start - queued_at, queued_at)
+        slot = AdmissionSlot()
+        try:
+            yield slot
+        finally:
+            self._in_flight -= 1
+            self._slots.release()
+            elapsed = max(0.0, time.perf_counter() - start - slot.upload_s)
+            self._service_s = elapsed if self._service_s is None else \
+                self.EWMA_ALPHA * elapsed + (1 - self.EWMA_ALPHA) * self._service_s
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns admission statistics.
+
+        Returns:
+            dict: limits, in_flight, queued, admitted, rejected (by reason),
+                  mean service time and the current expected wait
+        """
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_queued": self.max_queued,
+            "max_wait_s": self.max_wait_s,
+            "in_flight": self._in_flight,
+            "queued": self._queued,
+            "admitted": self._admitted,
+            "rejected": dict(self._rejected),
+            "rejected_total": sum(self._rejected.values()),
+            "avg_service_ms": round(self._service_s * 1000, 1) if self._service_s is not None else None,
+            "expected_wait_s": round(self.expected_wait(), 2),
+        }
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware running each request to a controlled path inside its
+    controller's admit(), before the request body is read. Time spent
+    waiting for body chunks is reported as the slot's upload time.
+
+    Attributes:
+        controllers (dict): Request path -> AdmissionController
+    """
+
+    def __init__(self, app, controllers: Mapping[str, AdmissionController]):
+        """
+        Initialize the AdmissionMiddleware.
+
+        Args:
+            app: The wrapped ASGI application
+            controllers: Request path -> AdmissionController (paths may
+                         share a controller)
+        """
+        self.app = app
+        self.controllers = dict(controllers)
+
+    async def __call__(self, scope, receive, send):
+        controller = self.controllers.get(scope["path"]) if scope["type"] == "http" else None
+        if controller is None or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            async with controller.admit() as slot:
+                async def timed_receive():
+                    start = time.perf_counter()
+                    message = await receive()
+                    if message["type"] == "http.request":
+                        slot.upload_s += time.perf_counter() - start
+                    return message
+
+                await self.app(scope, timed_receive, send)
+        except AdmissionRejected as e:
+            body = json.dumps({"detail": str(e), "reason": e.reason}).encode()
+            await send({
+                "type": "http.response.start",
+                "status": e.status_code,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", str(e.retry_after).encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
@@ -2,6 +2,8 @@ import logging
 from typing import List, Dict, Optional
 from datetime import datetime
 
+from .metrics import timed
+
 logger = logging.getLogger(__name__)
 
 # In-memory storage for active beacons (mock database)
@@ -76,11 +78,12 @@ class BluetoothProximityService:
 
         # Calculate mode (most frequent RSSI value) or average
         # Using average for simplicity if mode is ambiguous, but mode is better for stability
-        try:
-            from statistics import mode
-            rssi_mode = mode(rssi_readings)
-        except:
-            rssi_mode = int(sum(rssi_readings) / len(rssi_readings))
+        with timed("bluetooth_mode"):
+            try:
+                from statistics import mode
+                rssi_mode = mode(rssi_readings)
+            except:
+                rssi_mode = int(sum(rssi_readings) / len(rssi_readings))
 
         present = rssi_mode >= threshold
         
@@ -0,0 +1,231 @@
+"""
+Brownout Module
+================
+Graceful degradation of face verification under load.
+
+Admission control sheds requests once the queues are full; brownout keeps
+them from filling in the first place. During an exam-hall spike a slightly
+less accurate answer in one second beats a timeout after fifteen. This
+module provides:
+- BrownoutTier, a service level: the engine that verifies faces and the
+  resolution selfies are decoded at
+- BrownoutController, stepping down one tier at a time when the queue
+  depth or the p95 verification latency crosses its "enter" threshold, and
+  back up once both are below their lower "exit" thresholds
+- A minimum dwell time per tier, so the service does not flap between
+  tiers while latencies settle
+- Per-tier request counters and a log of recent switches
+"""
+
+import time
+import logging
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+# Configure module-level logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class BrownoutTier:
+    """
+    One service level of face verification.
+
+    Attributes:
+        name (str): Reported in responses (e.g. "full", "reduced_resolution")
+        engine: FaceVerifier or CascadeVerifier verifying at this tier
+        decode_max_side (int|None): Longest side selfies are decoded at
+                                    (None = full resolution)
+    """
+
+    def __init__(self, name: str, engine: Any, decode_max_side: Optional[int] = None):
+        self.name = name
+        self.engine = engine
+        self.decode_max_side = decode_max_side
+
+    def describe(self) -> Dict[str, Any]:
+        """The tier's name, model and decode resolution."""
+        final = getattr(self.engine, "final", self.engine)
+        return {"name": self.name, "model": final.model_name, "decode_max_side": self.decode_max_side}
+
+
+class BrownoutController:
+    """
+    Picks the tier that serves each request from the current load.
+
+    Tiers are ordered from full quality to cheapest. Load is checked at most
+    once per EVALUATE_INTERVAL_S, when a request asks for its tier:
+    - Step down when depth >= enter_depth or p95 >= enter_p95_ms
+    - Step up when depth <= exit_depth and p95 <= exit_p95_ms (or when too
+      few requests finished at this tier to tell)
+    - Never switch within hold_s of the previous switch
+
+    Latency samples are kept per tier: they are cleared on every switch, so
+    a tier is judged only by requests it served.
+
+    Attributes:
+        tiers (list): BrownoutTiers, full quality first
+        level (int): Index of the current tier
+        enter_depth (int), exit_depth (int): Queue depth thresholds
+        enter_p95_ms (float), exit_p95_ms (float): Latency thresholds
+        hold_s (float): Minimum time between two switches
+    """
+
+    # Seconds between two load evaluations
+    EVALUATE_INTERVAL_S = 1.0
+
+    # Latency samples needed before the p95 is trusted
+    MIN_SAMPLES = 20
+
+    # Switches kept for stats()
+    HISTORY = 20
+
+    def __init__(
+        self,
+        tiers: List[BrownoutTier],
+        depth_fn: Callable[[], int],
+        enter_depth: int = 16,
+        exit_depth: int = 4,
+        enter_p95_ms: float = 3000.0,
+        exit_p95_ms: float = 1000.0,
+        hold_s: float = 15.0,
+        window: int = 100
+    ):
+        """
+        Initialize the BrownoutController.
+
+        Args:
+            tiers: BrownoutTiers, full quality first (at least one)
+            depth_fn: Returns the current number of waiting face verifications
+            enter_depth: Queue depth at which to step down
+            exit_depth: Queue depth at or below which to step back up
+            enter_p95_ms: p95 latency at which to step down
+            exit_p95_ms: p95 latency at or below which to step back up
+            hold_s: Minimum time between two switches
+            window: Latency samples the p95 is computed over
+        """
+        if not tiers:
+            raise ValueError("Brownout needs at least one tier")
+        if exit_depth > enter_depth or exit_p95_ms > enter_p95_ms:
+            raise ValueError("Brownout exit thresholds must not exceed the enter thresholds")
+
+        self.tiers = tiers
+        self.depth_fn = depth_fn
+        self.enter_depth = enter_depth
+        self.exit_depth = exit_depth
+        self.enter_p95_ms = enter_p95_ms
+        self.exit_p95_ms = exit_p95_ms
+        self.hold_s = hold_s
+
+        self.level = 0
+        self._lock = threading.Lock()
+        self._latencies: deque = deque(maxlen=window)
+        self._switched_at: Optional[float] = None
+        self._evaluated_at = float("-inf")
+        self._served = {tier.name: 0 for tier in tiers}
+        self._history: deque = deque(maxlen=self.HISTORY)
+
+        logger.info("Brownout tiers: %s", " -> ".join(tier.name for tier in tiers))
+
+    @property
+    def current(self) -> BrownoutTier:
+        """The tier requests are served at right now."""
+        return self.tiers[self.level]
+
+    def _p95(self) -> Optional[float]:
+        """p95 of the current tier's latency samples (None if too few)."""
+        if len(self._latencies) < self.MIN_SAMPLES:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+
+    def _switch(self, level: int, reason: str, now: float) -> None:
+        previous = self.tiers[self.level].name
+        self.level = level
+        self._switched_at = now
+        self._latencies.clear()
+        self._history.append({"at": time.time(), "from": previous, "to": self.tiers[level].name, "reason": reason})
+        log = logger.warning if level > 0 else logger.info
+        log("Brownout: %s -> %s (%s)", previous, self.tiers[level].name, reason)
+
+    def _evaluate(self, now: float) -> None:
+        """Steps one tier down or up if the load calls for it."""
+        self._evaluated_at = now
+        if self._switched_at is not None and now - self._switched_at < self.hold_s:
+            return
+
+        depth = self.depth_fn()
+        p95 = self._p95()
+        p95_text = "n/a" if p95 is None else f"{p95:.0f}ms"
+        if self.level < len(self.tiers) - 1 and (
+                depth >= self.enter_depth or (p95 is not None and p95 >= self.enter_p95_ms)):
+            self._switch(self.level + 1, f"overloaded: depth {depth}, p95 {p95_text}", now)
+        elif self.level > 0 and depth <= self.exit_depth and (p95 is None or p95 <= self.exit_p95_ms):
+            self._switch(self.level - 1, f"recovered: depth {depth}, p95 {p95_text}", now)
+
+    def select(self, usable: Optional[Callable[[BrownoutTier], bool]] = None) -> BrownoutTier:
+        """
+        Returns the tier to serve a request at.
+
+        Args:
+            usable: Optional check of whether a tier can serve this request
+                    (e.g. the student has a template for its model); if the
+                    current tier cannot, the nearest higher tier that can is
+                    used
+
+        Returns:
+            BrownoutTier: The tier (the full tier if no other is usable)
+        """
+        now = time.monotonic()
+        with self._lock:
+            if now - self._evaluated_at >= self.EVALUATE_INTERVAL_S:
+                self._evaluate(now)
+            level = self.level
+        tier = self.tiers[level]
+        while level > 0 and usable is not None and not usable(tier):
+            level -= 1
+            tier = self.tiers[level]
+        with self._lock:
+            self._served[tier.name] += 1
+        return tier
+
+    def record(self, tier: BrownoutTier, latency_ms: float) -> None:
+        """
+        Adds the latency of a verification served at `tier`.
+
+        Samples of tiers other than the current one are ignored.
+        """
+        with self._lock:
+            if tier is self.tiers[self.level]:
+                self._latencies.append(latency_ms)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns brownout state and counters.
+
+        Returns:
+            dict: tiers, current tier, thresholds, current depth and p95,
+                  seconds in the current tier, requests served per tier and
+                  recent switches
+        """
+        depth = self.depth_fn()
+        with self._lock:
+            p95 = self._p95()
+            return {
+                "tiers": [tier.describe() for tier in self.tiers],
+                "current": self.tiers[self.level].name,
+                "thresholds": {
+                    "enter_depth": self.enter_depth,
+                    "exit_depth": self.exit_depth,
+                    "enter_p95_ms": self.enter_p95_ms,
+                    "exit_p95_ms": self.exit_p95_ms,
+                    "hold_s": self.hold_s,
+                },
+                "depth": depth,
+                "p95_ms": round(p95, 1) if p95 is not None else None,
+                "samples": len(self._latencies),
+                "in_tier_s": round(time.monotonic() - self._switched_at, 1) if self._switched_at is not None else None,
+                "served": dict(self._served),
+                "switches": list(self._history),
+            }
@@ -0,0 +1,209 @@
+"""
+Deadline Module
+================
+Request deadlines carried through the inference pipeline.
+
+The mobile client gives up after about 15 seconds, but without a deadline
+the server keeps computing embeddings nobody is waiting for, and during a
+burst that work delays the requests that could still make it. This module
+provides:
+- Deadline headers: X-Request-Timeout-Ms (budget relative to arrival,
+  preferred - immune to phone clock skew) or X-Request-Deadline (absolute
+  Unix time in milliseconds)
+- The current request's deadline in a context variable, so it follows the
+  request into asyncio tasks and thread-pool calls without being passed
+  through every function
+- check_deadline() / remaining_budget() for stages to drop expired work
+  or skip optional work that no longer fits the budget
+- Counters of dropped work per stage
+- DeadlineMiddleware, reading the headers and answering requests that
+  arrive already expired with 504
+"""
+
+import json
+import time
+import logging
+import threading
+from collections import Counter
+from contextvars import ContextVar
+from typing import Any, Dict, Mapping, Optional
+
+# Configure module-level logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+TIMEOUT_HEADER = "x-request-timeout-ms"
+DEADLINE_HEADER = "x-request-deadline"
+
+# Deadline of the current request on the time.monotonic() clock (None = none)
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+_stats_lock = threading.Lock()
+_dropped: Counter = Counter()
+_requests_with_deadline = 0
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when work is dropped because its request's deadline has passed."""
+
+    def __init__(self, stage: str):
+        super().__init__(f"Request deadline exceeded before {stage}")
+        self.stage = stage
+
+    def __reduce__(self):
+        # Rebuild from the stage, not the message, when crossing a process boundary
+        return type(self), (self.stage,)
+
+
+def parse_headers(headers: Mapping[str, str]) -> Optional[float]:
+    """
+    Reads a deadline from request headers.
+
+    Args:
+        headers: Request headers with lower-case names
+
+    Returns:
+        float: The deadline on the time.monotonic() clock, or None if no
+               (valid) deadline header was sent
+    """
+    try:
+        if TIMEOUT_HEADER in headers:
+            return time.monotonic() + float(headers[TIMEOUT_HEADER]) / 1000.0
+        if DEADLINE_HEADER in headers:
+            return time.monotonic() + float(headers[DEADLINE_HEADER]) / 1000.0 - time.time()
+    except ValueError:
+        logger.warning("Ignoring malformed deadline header")
+    return None
+
+
+def current_deadline() -> Optional[float]:
+    """The current request's deadline (time.monotonic() clock), or None."""
+    return _deadline.get()
+
+
+def set_deadline(deadline: Optional[float]):
+    """
+    Sets the deadline for the current context (request, task or job).
+
+    Returns:
+        Token: Pass to reset() to restore the previous deadline
+    """
+    return _deadline.set(deadline)
+
+
+def reset(token) -> None:
+    """Restores the deadline that was current before set_deadline()."""
+    _deadline.reset(token)
+
+
+def remaining_budget(deadline: Optional[float] = None) -> Optional[float]:
+    """
+    Seconds left until the deadline (negative once passed).
+
+    Args:
+        deadline: Deadline to check (None = the current request's)
+
+    Returns:
+        float: Remaining seconds, or None if there is no deadline
+    """
+    deadline = current_deadline() if deadline is None else deadline
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def deadline_expired(deadline: Optional[float] = None) -> bool:
+    """Whether the deadline (default: the current request's) has passed."""
+    left = remaining_budget(deadline)
+    return left is not None and left <= 0
+
+
+def record_drop(stage: str) -> None:
+    """Counts one piece of work dropped (or skipped) at `stage`."""
+    with _stats_lock:
+        _dropped[stage] += 1
+
+
+def check_deadline(stage: str, deadline: Optional[float] = None) -> None:
+    """
+    Drops the work about to run at `stage` if its deadline has passed.
+
+    Args:
+        stage: Name of the stage, used in the counters
+        deadline: Deadline to check (None = the current request's)
+
+    Raises:
+        DeadlineExceeded: If the deadline has passed
+    """
+    if deadline_expired(deadline):
+        record_drop(stage)
+        raise DeadlineExceeded(stage)
+
+
+def deadline_stats() -> Dict[str, Any]:
+    """
+    Returns deadline statistics.
+
+    Returns:
+        dict: requests_with_deadline, dropped work per stage and in total
+    """
+    with _stats_lock:
+        return {
+            "requests_with_deadline": _requests_with_deadline,
+            "dropped": dict(_dropped),
+            "dropped_total": sum(_dropped.values()),
+        }
+
+
+class DeadlineMiddleware:
+    """
+    ASGI middleware setting the request deadline from its headers.
+
+    Attributes:
+        default_timeout_s (float): Budget of requests without a deadline
+                                   header (0 = no deadline)
+    """
+
+    def __init__(self, app, default_timeout_s: float = 0.0):
+        """
+        Initialize the DeadlineMiddleware.
+
+        Args:
+            app: The wrapped ASGI application
+            default_timeout_s: Budget of requests without a deadline header
+                               (0 = no deadline)
+        """
+        self.app = app
+        self.default_timeout_s = default_timeout_s
+
+    async def __call__(self, scope, receive, send):
+        global _requests_with_deadline
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = {name.decode("latin-1"): value.decode("latin-1") for name, value in scope["headers"]}
+        deadline = parse_headers(headers)
+        if deadline is not None:
+            with _stats_lock:
+                _requests_with_deadline += 1
+        elif self.default_timeout_s:
+            deadline = time.monotonic() + self.default_timeout_s
+
+        if deadline is not None and deadline_expired(deadline):
+            record_drop("arrival")
+            body = json.dumps({"detail": "Request deadline already passed on arrival"}).encode()
+            await send({
+                "type": "http.response.start",
+                "status": 504,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        token = set_deadline(deadline)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            reset(token)
@@ -0,0 +1,182 @@
+"""
+Embedding Cache Module
+=======================
+Content-addressed cache for face embeddings.
+
+Every attendance request re-uploads the same student profile photo, so its
+embedding only has to be computed once. This module provides:
+- Cache keys derived from a SHA-256 of the image content, the model name and
+  the settings the embedding depends on (backend, precision, detector, ...)
+- A bounded in-memory LRU tier
+- An optional on-disk tier (one .npy file per key) that survives restarts
+- Hit/miss counters for sizing the cache
+"""
+
+import os
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Union
+
+import numpy as np
+
+# Configure module-level logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCache:
+    """
+    Thread-safe two-tier (memory LRU + optional disk) embedding cache.
+
+    Attributes:
+        max_entries (int): Maximum number of embeddings kept in memory
+        disk_dir (str|None): Directory for the persistent tier (None = memory only)
+    """
+
+    def __init__(self, max_entries: int = 512, disk_dir: Optional[str] = None):
+        """
+        Initialize the EmbeddingCache.
+
+        Args:
+            max_entries: Size of the in-memory LRU tier
+            disk_dir: Directory for persisted embeddings (disabled if None)
+        """
+        self.max_entries = max(1, max_entries)
+        self.disk_dir = disk_dir
+
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+        logger.info("EmbeddingCache initialized: max_entries=%d, disk_dir=%s",
+                    self.max_entries, disk_dir or "disabled")
+
+    @staticmethod
+    def make_key(content: Union[bytes, bytearray, memoryview, np.ndarray], model_name: str, **settings: Any) -> str:
+        """
+        Builds a cache key from image content, the embedding model name and
+        the settings the embedding was computed with.
+
+        Args:
+            content: Encoded image bytes, or a decoded image array
+            model_name: Model the embedding is computed with
+            **settings: Anything else the embedding depends on (backend,
+                        precision, detector, decode size, ...); verifiers
+                        that differ in any of them get different keys
+
+        Returns:
+            str: Hex digest identifying (content, model, settings)
+        """
+        digest = hashlib.sha256(model_name.encode("utf-8"))
+        for name in sorted(settings):
+            digest.update(f"\0{name}={settings[name]!r}".encode("utf-8"))
+        if isinstance(content, np.ndarray):
+            # Arrays with identical bytes but different shapes are different images
+            digest.update(str(content.shape).encode("utf-8"))
+            content = np.ascontiguousarray(content)
+        digest.update(memoryview(content))
+        return digest.hexdigest()
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.npy")
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """
+        Looks up an embedding, promoting disk hits into the memory tier.
+
+        Args:
+            key: Key from make_key()
+
+        Returns:
+            np.ndarray: The cached embedding, or None on a miss
+        """
+        with self._lock:
+            embedding = self._entries.get(key)
+            if embedding is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return embedding
+
+        if self.disk_dir:
+            path = self._disk_path(key)
+            if os.path.exists(path):
+                try:
+                    embedding = np.load(path)
+                except Exception as e:
+                    logger.warning("Discarding unreadable cached embedding %s: %s", path, str(e))
+                else:
+                    with self._lock:
+                        self.disk_hits += 1
+                        self._store(key, embedding)
+                    return embedding
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, embedding: np.ndarray) -> None:
+        """
+        Stores an embedding in memory and, if enabled, on disk.
+
+        Args:
+            key: Key from make_key()
+            embedding: The embedding vector
+        """
+        embedding = np.asarray(embedding, dtype=np.float32)
+        with self._lock:
+            self._store(key, embedding)
+
+        if self.disk_dir:
+            path = self._disk_path(key)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            try:
+                # Write-then-rename so readers never see a partial file
+                with open(tmp_path, "wb") as f:
+                    np.save(f, embedding)
+                os.replace(tmp_path, path)
+            except Exception as e:
+                logger.warning("Could not persist embedding %s: %s", key[:12], str(e))
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+    def _store(self, key: str, embedding: np.ndarray) -> None:
+        """Inserts into the LRU tier. Caller must hold the lock."""
+        self._entries[key] = embedding
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """Empties the in-memory tier (the disk tier is left intact)."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns cache counters.
+
+        Returns:
+            dict: size, capacity, hits, disk_hits, misses, evictions and hit_rate
+        """
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "disk_dir": self.disk_dir,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0
+            }
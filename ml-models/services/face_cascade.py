@@ -0,0 +1,329 @@
+"""
+Face Cascade Module
+====================
+Multi-model face verification with early exit.
+
+Face models differ in cost by an order of magnitude. Most selfies are
+either clearly the same person or clearly not, and a cheap model (SFace,
+OpenFace) can decide those on its own. This module provides:
+- A cascade of FaceVerifiers, cheapest first
+- Early accept when a cheap stage's distance is within its "strict" band
+- Early reject when it is beyond its "very_lenient" band
+- Escalation of borderline cases to the expensive final model
+- One face detection per selfie, whose crop every stage embeds
+- Escalation past a cheap stage that fails (e.g. its model cannot be built)
+- Per-request stage reports and counters of avoided expensive inferences
+"""
+
+import time
+import logging
+import threading
+from typing import Dict, Any, List, Optional
+
+from .face_service import FaceVerifier, ImageInput, decode_image
+from .deadline import DeadlineExceeded
+from .profiler import profiled
+
+# Configure module-level logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class CascadeVerifier:
+    """
+    Verifies faces with a cascade of models, escalating only borderline cases.
+
+    Every stage but the last may decide early using its model's
+    MODEL_THRESHOLDS: accept at or below "strict", reject above
+    "very_lenient". The last stage always decides, with its own threshold.
+    The selfie's face is detected once, with the final stage's detector,
+    and each stage embeds that crop. The stages must therefore share the
+    final stage's detector settings.
+
+    Attributes:
+        stages (list): FaceVerifiers, cheapest first; the last one is authoritative
+        accept_mode (str): Threshold mode below which a cheap stage accepts
+        reject_mode (str): Threshold mode above which a cheap stage rejects
+    """
+
+    def __init__(
+        self,
+        stages: List[FaceVerifier],
+        accept_mode: str = "strict",
+        reject_mode: str = "very_lenient"
+    ):
+        """
+        Initialize the CascadeVerifier.
+
+        Args:
+            stages: FaceVerifiers, cheapest first (at least one)
+            accept_mode: Threshold mode used for early accepts
+            reject_mode: Threshold mode used for early rejects
+        """
+        if not stages:
+            raise ValueError("A cascade needs at least one stage")
+
+        self.stages = stages
+        self.accept_mode = accept_mode
+        self.reject_mode = reject_mode
+
+        self._stats_lock = threading.Lock()
+        self.requests = 0
+        self.decided_by: Dict[str, int] = {stage.model_name: 0 for stage in stages}
+        self.early_accepts = 0
+        self.early_rejects = 0
+
+        logger.info("CascadeVerifier initialized: %s", " -> ".join(s.model_name for s in stages))
+
+    @property
+    def final(self) -> FaceVerifier:
+        """The authoritative (most expensive) stage."""
+        return self.stages[-1]
+
+    def _bands(self, stage: FaceVerifier) -> tuple:
+        thresholds = FaceVerifier.MODEL_THRESHOLDS.get(stage.model_name, {})
+        return (thresholds.get(self.accept_mode, stage.threshold),
+                thresholds.get(self.reject_mode, stage.threshold))
+
+    def warm_up(self) -> Dict[str, Any]:
+        """
+        Warms up every stage's model.
+
+        Returns:
+            dict: Warm-up result of the final stage, plus per-stage results
+        """
+        results = [stage.warm_up() for stage in self.stages]
+        return {**results[-1], "stages": results}
+
+    @profiled("verify_identity")
+    def verify_identity(
+        self,
+        selfie: ImageInput,
+        profile_image: ImageInput,
+        preprocess: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Cascaded version of FaceVerifier.verify_identity.
+
+        Args:
+            selfie: Live selfie image (path, encoded bytes or BGR array)
+            profile_image: User profile photo (path, encoded bytes or BGR array)
+            preprocess: Ignored - profile photos are never preprocessed
+
+        Returns:
+            dict: Verification result of the deciding stage (see
+                  FaceVerifier.verify_identity), plus a "cascade" report
+        """
+        def reference(stage: FaceVerifier):
+            embedding, cached = stage._profile_embedding(profile_image)
+            if embedding is None:
+                raise _UnreadableImage("Could not read profile image. The file may be corrupted.")
+            return embedding, {"profile_embedding_cached": cached}
+
+        return self._run(selfie, reference)
+
+    @profiled("verify_enrolled")
+    def verify_enrolled(self, selfie: ImageInput, student_id: str) -> Dict[str, Any]:
+        """
+        Cascaded version of FaceVerifier.verify_enrolled.
+
+        Stages without a template for the student are skipped, so students
+        enrolled before the cascade was enabled still verify on the final model.
+
+        Args:
+            selfie: Live selfie image (path, encoded bytes or BGR array)
+            student_id: The enrolled student's identifier
+
+        Returns:
+            dict: Verification result of the deciding stage, plus a "cascade" report
+        """
+        if self.final.gallery is None or self.final.gallery.get_embedding(student_id, self.final.model_name) is None:
+            return self.final.verify_enrolled(selfie, student_id)
+
+        def reference(stage: FaceVerifier):
+            embedding = stage.gallery.get_embedding(student_id, stage.model_name) if stage.gallery else None
+            return embedding, {"student_id": student_id}
+
+        return self._run(selfie, reference)
+
+    def _run(self, selfie: ImageInput, reference) -> Dict[str, Any]:
+        """
+        Runs the stages on a decoded selfie until one decides.
+
+        A cheap stage that fails with anything but a detection error (say,
+        its model cannot be loaded) is reported as skipped and the request
+        escalates; only the final stage's failures fail the verification.
+
+        Args:
+            selfie: Live selfie image
+            reference: Callable(stage) -> (reference embedding or None, extra result fields)
+        """
+        if not self.final.backend_available() and self.final.inference_pool is None:
+            return {
+                "success": False,
+                "verified": False,
+                "error": "DeepFace is not installed. Please install with: pip install deepface"
+            }
+
+        report = []
+        try:
+            selfie_img = decode_image(selfie, self.final.decode_max_side)
+            if selfie_img is None:
+                return {
+                    "success": False,
+                    "verified": False,
+                    "error": "Could not read selfie image. The file may be corrupted."
+                }
+
+            # Gate and detect the selfie once, before any reference is embedded
+            face, detection = self.final.detect_face(selfie_img, self.final.check_live_image(selfie_img))
+
+            for position, stage in enumerate(self.stages):
+                is_final = position == len(self.stages) - 1
+                start = time.perf_counter()
+
+                try:
+                    reference_embedding, extra = reference(stage)
+                    embedding = stage.embed_face(face) if reference_embedding is not None else None
+                except (ValueError, _UnreadableImage, DeadlineExceeded):
+                    raise
+                except Exception as e:
+                    if is_final:
+                        raise
+                    logger.warning("Cascade stage %s failed, escalating: %s", stage.model_name, str(e))
+                    report.append({"model": stage.model_name, "decision": "skipped",
+                                   "reason": f"stage failed: {e}"})
+                    continue
+                if reference_embedding is None:
+                    report.append({"model": stage.model_name, "decision": "skipped",
+                                   "reason": "no template for this model"})
+                    continue
+
+                distance = stage.cosine_distance(embedding, reference_embedding)
+                elapsed_ms = round((time.perf_counter() - start) * 1000.0, 2)
+                accept_below, reject_above = self._bands(stage)
+
+                if is_final:
+                    result = stage._build_result(distance, detection=detection, **extra)
+                    decision = "accept" if result["verified"] else "reject"
+                elif distance <= accept_below:
+                    decision = "accept"
+                elif distance > reject_above:
+                    decision = "reject"
+                else:
+                    report.append({"model": stage.model_name, "distance": round(distance, 4),
+                                   "decision": "escalate", "elapsed_ms": elapsed_ms})
+                    continue
+
+                report.append({"model": stage.model_name, "distance": round(distance, 4),
+                               "decision": decision, "elapsed_ms": elapsed_ms})
+                if not is_final:
+                    result = stage._build_result(distance, detection=detection, **extra)
+                    result["verified"] = decision == "accept"
+                    result["threshold"] = accept_below if decision == "accept" else reject_above
+                    result["threshold_mode"] = self.accept_mode if decision == "accept" else self.reject_mode
+
+                self._record(stage.model_name, decision, early=not is_final)
+                result["cascade"] = {
+                    "stages": report,
+                    "decided_by": stage.model_name,
+                    "early_exit": not is_final,
+                    "detection_ms": detection["latency_ms"]
+                }
+                return result
+
+            # Only reachable if the final stage had no reference template
+            return {
+                "success": False,
+                "verified": False,
+                "cascade": {"stages": report, "decided_by": None, "early_exit": False},
+                "error": f"No template for model {self.final.model_name}"
+            }
+
+        except _UnreadableImage as e:
+            return {"success": False, "verified": False, "error": str(e)}
+
+        except FileNotFoundError as e:
+            return {"success": False, "verified": False, "error": f"Image not found: {e}"}
+
+        except ValueError as e:
+            return {**FaceVerifier._detection_error(e), "cascade": {"stages": report}}
+
+        except Exception as e:
+            logger.error("Unexpected error during cascaded verification: %s", str(e))
+            return {"success": False, "verified": False, "error": f"Verification failed: {str(e)}"}
+
+    def enroll_student(
+        self,
+        student_id: str,
+        image: ImageInput,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Enrolls a student with every stage's model.
+
+        The photo is decoded once. Success is decided by the final stage;
+        cheap-stage failures only mean those stages are skipped later.
+
+        Args:
+            student_id: The student's unique identifier
+            image: Enrollment photo (path, encoded bytes or BGR array)
+            metadata: Optional student fields to store
+
+        Returns:
+            dict: Final stage's enrollment result, plus per-stage "models" results
+        """
+        try:
+            img = decode_image(image, self.final.decode_max_side)
+        except FileNotFoundError as e:
+            return {"success": False, "student_id": student_id, "error": f"Enrollment image not found: {e}"}
+        if img is None:
+            return {
+                "success": False,
+                "student_id": student_id,
+                "error": "Could not read enrollment image. The file may be corrupted."
+            }
+
+        final_result = self.final.enroll_student(student_id, img, metadata)
+        if not final_result.get("success"):
+            return final_result
+
+        models = {self.final.model_name: True}
+        for stage in self.stages[:-1]:
+            models[stage.model_name] = bool(stage.enroll_student(student_id, img, metadata).get("success"))
+        return {**final_result, "models": models}
+
+    def _record(self, model_name: str, decision: str, early: bool) -> None:
+        with self._stats_lock:
+            self.requests += 1
+            self.decided_by[model_name] += 1
+            if early and decision == "accept":
+                self.early_accepts += 1
+            elif early:
+                self.early_rejects += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns cascade counters.
+
+        Returns:
+            dict: Stage models, bands, decisions per stage and the number of
+                  final-model inferences avoided by early exits
+        """
+        with self._stats_lock:
+            early = self.early_accepts + self.early_rejects
+            return {
+                "stages": [stage.model_name for stage in self.stages],
+                "accept_mode": self.accept_mode,
+                "reject_mode": self.reject_mode,
+                "requests": self.requests,
+                "decided_by": dict(self.decided_by),
+                "early_accepts": self.early_accepts,
+                "early_rejects": self.early_rejects,
+                "final_inferences_avoided": early,
+                "early_exit_rate": round(early / self.requests, 4) if self.requests else 0.0
+            }
+
+
+class _UnreadableImage(Exception):
+    """Raised when a reference image cannot be decoded."""
@@ -0,0 +1,315 @@
+"""
+Face Detector Module
+=====================
+Pluggable face detector backends with a downscaled detection pass.
+
+Mobile selfies are often 12 MP, and running a detector at full resolution
+dominates verification latency. Detection does not need that resolution:
+this module finds faces on a downscaled copy and maps the boxes back, so
+only the face region of the original image is cropped for embedding. It
+provides:
+- OpenCV Haar cascade and OpenCV DNN (ResNet-10 SSD) detectors
+- MediaPipe face detection
+- Any DeepFace detector backend (opencv, ssd, mtcnn, retinaface, ...)
+- Crops aligned and scaled exactly as DeepFace crops them, so embeddings
+  keep the distances MODEL_THRESHOLDS were calibrated on
+"""
+
+import os
+import math
+import time
+import logging
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+# Configure module-level logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# A detection in image coordinates:
+# {"x", "y", "w", "h", "confidence", optional "left_eye"/"right_eye": (x, y)}
+Detection = Dict[str, Any]
+
+
+class FaceDetector:
+    """
+    Base class of detector backends.
+
+    Subclasses implement _detect() on the (already downscaled) BGR image.
+    Backends wrapping models that are not thread-safe set `thread_safe`
+    to False and are serialized with a lock.
+
+    Attributes:
+        name (str): Backend name reported in results
+    """
+
+    name = "base"
+    thread_safe = False
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def _detect(self, image: np.ndarray) -> List[Detection]:
+        raise NotImplementedError
+
+    def detect(self, image: np.ndarray) -> List[Detection]:
+        """
+        Detects faces in a BGR image.
+
+        Args:
+            image: Decoded BGR image
+
+        Returns:
+            list: Detections in the image's coordinates
+        """
+        if self.thread_safe:
+            return self._detect(image)
+        with self._lock:
+            return self._detect(image)
+
+
+class HaarDetector(FaceDetector):
+    """OpenCV Haar cascade (frontal face). Fastest, least robust to pose."""
+
+    name = "haar"
+
+    def __init__(self):
+        super().__init__()
+        if not hasattr(cv2, "CascadeClassifier"):
+            raise RuntimeError("This OpenCV build does not include Haar cascades")
+        self._cascade = cv2.CascadeClassifier(
+            os.path.join(cv2.data.haarcascades, "haarcascade_frontalface_default.xml"))
+        if self._cascade.empty():
+            raise RuntimeError("OpenCV Haar cascade file could not be loaded")
+
+    def _detect(self, image: np.ndarray) -> List[Detection]:
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        boxes = self._cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(24, 24))
+        return [{"x": int(x), "y": int(y), "w": int(w), "h": int(h), "confidence": 1.0}
+                for x, y, w, h in boxes]
+
+
+class OpenCVDNNDetector(FaceDetector):
+    """
+    OpenCV DNN ResNet-10 SSD face detector.
+
+    Needs deploy.prototxt and res10_300x300_ssd_iter_140000.caffemodel in
+    `model_dir` (FACE_DNN_MODEL_DIR, default ./models/face_detector).
+    """
+
+    name = "opencv-dnn"
+    PROTOTXT = "deploy.prototxt"
+    WEIGHTS = "res10_300x300_ssd_iter_140000.caffemodel"
+
+    def __init__(self, model_dir: Optional[str] = None, min_confidence: float = 0.5):
+        super().__init__()
+        model_dir = model_dir or os.getenv("FACE_DNN_MODEL_DIR", "./models/face_detector")
+        prototxt, weights = os.path.join(model_dir, self.PROTOTXT), os.path.join(model_dir, self.WEIGHTS)
+        if not (os.path.exists(prototxt) and os.path.exists(weights)):
+            raise RuntimeError(f"OpenCV DNN face detector files not found in {model_dir}")
+        self._net = cv2.dnn.readNetFromCaffe(prototxt, weights)
+        self.min_confidence = min_confidence
+
+    def _detect(self, image: np.ndarray) -> List[Detection]:
+        h, w = image.shape[:2]
+        blob = cv2.dnn.blobFromImage(cv2.resize(image, (300, 300)), 1.0, (300, 300), (104.0, 177.0, 123.0))
+        self._net.setInput(blob)
+        out = self._net.forward()[0, 0]
+        out = out[out[:, 2] >= self.min_confidence]
+        detections = []
+        for confidence, x1, y1, x2, y2 in zip(out[:, 2], out[:, 3] * w, out[:, 4] * h, out[:, 5] * w, out[:, 6] * h):
+            x1, y1 = max(0, int(x1)), max(0, int(y1))
+            x2, y2 = min(w, int(x2)), min(h, int(y2))
+            if x2 > x1 and y2 > y1:
+                detections.append({"x": x1, "y": y1, "w": x2 - x1, "h": y2 - y1, "confidence": float(confidence)})
+        return detections
+
+
+class MediaPipeDetector(FaceDetector):
+    """MediaPipe BlazeFace detector (full-range model). Reports eye positions."""
+
+    name = "mediapipe"
+
+    def __init__(self, min_confidence: float = 0.5):
+        super().__init__()
+        try:
+            import mediapipe as mp
+        except ImportError as e:
+            raise RuntimeError(f"MediaPipe is not installed: {e}")
+        self._detector = mp.solutions.face_detection.FaceDetection(
+            model_selection=1, min_detection_confidence=min_confidence)
+
+    def _detect(self, image: np.ndarray) -> List[Detection]:
+        h, w = image.shape[:2]
+        result = self._detector.process(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+        detections = []
+        for d in result.detections or []:
+            box = d.location_data.relative_bounding_box
+            x, y = max(0, int(box.xmin * w)), max(0, int(box.ymin * h))
+            detection = {
+                "x": x, "y": y,
+                "w": min(w - x, int(box.width * w)), "h": min(h - y, int(box.height * h)),
+                "confidence": float(d.score[0]) if d.score else 1.0
+            }
+            keypoints = d.location_data.relative_keypoints
+            if len(keypoints) >= 2:
+                # Keypoint 0 is the subject's right eye, 1 the left eye
+                detection["right_eye"] = (keypoints[0].x * w, keypoints[0].y * h)
+                detection["left_eye"] = (keypoints[1].x * w, keypoints[1].y * h)
+            detections.append(detection)
+        return detections
+
+
+class DeepFaceDetector(FaceDetector):
+    """Wraps a DeepFace detector backend (opencv, ssd, mtcnn, retinaface, ...)."""
+
+    thread_safe = True
+
+    def __init__(self, backend: str = "opencv"):
+        super().__init__()
+        from deepface import DeepFace
+        self._deepface = DeepFace
+        self.backend = backend
+        self.name = f"deepface-{backend}"
+
+    def _detect(self, image: np.ndarray) -> List[Detection]:
+        faces = self._deepface.extract_faces(
+            img_path=image,
+            detector_backend=self.backend,
+            enforce_detection=False,
+            align=False
+        )
+        detections = []
+        for face in faces:
+            # With enforce_detection=False, "no face" comes back as the whole
+            # frame with zero confidence
+            if not face.get("confidence", 1):
+                continue
+            area = face["facial_area"]
+            detection = {key: int(area[key]) for key in ("x", "y", "w", "h")}
+            detection["confidence"] = float(face.get("confidence", 1.0))
+            for eye in ("left_eye", "right_eye"):
+                if area.get(eye) is not None:
+                    detection[eye] = tuple(area[eye])
+            detections.append(detection)
+        return detections
+
+
+# Backends implemented directly on OpenCV / MediaPipe; any other name is
+# passed to DeepFace as its detector_backend
+NATIVE_DETECTORS = {
+    "haar": HaarDetector,
+    "opencv-dnn": OpenCVDNNDetector,
+    "mediapipe": MediaPipeDetector,
+}
+
+
+def get_detector(name: str) -> FaceDetector:
+    """
+    Builds a detector backend by name.
+
+    Args:
+        name: "haar", "opencv-dnn", "mediapipe", or a DeepFace detector
+              backend ("opencv", "ssd", "mtcnn", "retinaface", ...)
+
+    Returns:
+        FaceDetector: The backend instance
+    """
+    if name in NATIVE_DETECTORS:
+        return NATIVE_DETECTORS[name]()
+    return DeepFaceDetector(name)
+
+
+def detect_downscaled(
+    detector: FaceDetector,
+    image: np.ndarray,
+    max_side: Optional[int]
+) -> Tuple[List[Detection], Dict[str, Any]]:
+    """
+    Runs a detector on a copy of the image scaled to at most max_side pixels
+    on its longest side, and maps the detections back to full resolution.
+
+    Args:
+        detector: The detector backend
+        image: Decoded BGR image (full resolution)
+        max_side: Longest side of the detection copy (None = no downscaling)
+
+    Returns:
+        tuple: (detections in original coordinates,
+                info dict with backend, latency_ms, scale and faces)
+    """
+    start = time.perf_counter()
+    scale = 1.0
+    small = image
+    if max_side and max(image.shape[:2]) > max_side:
+        scale = max_side / max(image.shape[:2])
+        small = cv2.resize(image, (max(1, round(image.shape[1] * scale)), max(1, round(image.shape[0] * scale))),
+                           interpolation=cv2.INTER_AREA)
+
+    detections = detector.detect(small)
+    if scale != 1.0:
+        for d in detections:
+            for key in ("x", "y", "w", "h"):
+                d[key] = int(round(d[key] / scale))
+            for eye in ("left_eye", "right_eye"):
+                if eye in d:
+                    d[eye] = (d[eye][0] / scale, d[eye][1] / scale)
+
+    info = {
+        "backend": detector.name,
+        "latency_ms": round((time.perf_counter() - start) * 1000.0, 2),
+        "scale": round(scale, 4),
+        "faces": len(detections)
+    }
+    return detections, info
+
+
+def crop_face(image: np.ndarray, detection: Detection) -> np.ndarray:
+    """
+    Crops a detected face from the full-resolution image the way
+    DeepFace.extract_faces does (align=True, expand_percentage=0), as float
+    BGR in [0, 1] - the channel order DeepFace.represent feeds the model.
+
+    When eye positions are known the face is rotated so the eyes are level
+    (PIL bicubic, black outside the image) before the box is cut out.
+    DeepFace rotates the whole black-bordered image and projects the box;
+    rotating a black-padded region centred on the box gives the same face
+    at a fraction of the cost.
+
+    Args:
+        image: Decoded BGR image (full resolution)
+        detection: Detection in the image's coordinates
+
+    Returns:
+        np.ndarray: Face crop, shape (h, w, 3)
+    """
+    x, y, w, h = detection["x"], detection["y"], detection["w"], detection["h"]
+    left_eye, right_eye = detection.get("left_eye"), detection.get("right_eye")
+
+    angle = 0.0
+    if left_eye is not None and right_eye is not None:
+        # Same angle as DeepFace's align_img_wrt_eyes (eyes of the person, not the observer)
+        angle = math.degrees(math.atan2(left_eye[1] - right_eye[1], left_eye[0] - right_eye[0]))
+
+    if angle != 0.0 and w > 0 and h > 0:
+        pad = max(w, h)
+        region = _padded_region(image, x - pad, y - pad, w + 2 * pad, h + 2 * pad)
+        region = np.array(Image.fromarray(region).rotate(angle, resample=Image.BICUBIC))
+        face = region[pad:pad + h, pad:pad + w]
+    else:
+        face = image[max(0, y):y + h, max(0, x):x + w]
+    return face.astype(np.float32) / 255.0
+
+
+def _padded_region(image: np.ndarray, x: int, y: int, w: int, h: int) -> np.ndarray:
+    """Cuts the (x, y, w, h) box out of the image, black where it lies outside."""
+    region = np.zeros((h, w, image.shape[2]), dtype=image.dtype)
+    x1, y1 = max(0, x), max(0, y)
+    x2, y2 = min(image.shape[1], x + w), min(image.shape[0], y + h)
+    if x2 > x1 and y2 > y1:
+        region[y1 - y:y2 - y, x1 - x:x2 - x] = image[y1:y2, x1:x2]
+    return region
@@ -0,0 +1,238 @@
+"""
+Face Gallery Service Module
+============================
+Stores enrolled face templates (embeddings) keyed by student ID.
+
+Students are enrolled once; attendance verification then compares the live
+selfie against the stored template instead of re-uploading and re-embedding
+a profile photo on every request. This module provides:
+- Per-model embedding storage (one .npy file per student and model, named
+  after a hash of the student ID so that distinct IDs never share a file)
+- A JSON index with student metadata, persisted atomically; it is the only
+  place the real student IDs are stored
+- Bulk lookups returning stacked embedding matrices for 1:N matching
+"""
+
+import os
+import re
+import json
+import hashlib
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Any, Optional, List, Tuple
+
+import numpy as np
+
+# Configure module-level logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class FaceGallery:
+    """
+    Persistent gallery of enrolled face embeddings.
+
+    Layout on disk:
+        <storage_dir>/gallery.json                    - student metadata index
+        <storage_dir>/<model>/<sha256(student_id)>.npy - one embedding per student/model
+
+    Attributes:
+        storage_dir (str): Root directory of the gallery
+    """
+
+    INDEX_FILE = "gallery.json"
+
+    def __init__(self, storage_dir: str = "./face_gallery"):
+        """
+        Initialize the FaceGallery and load any existing enrollments.
+
+        Args:
+            storage_dir: Root directory of the gallery
+        """
+        self.storage_dir = storage_dir
+        self._lock = threading.RLock()
+        self._students: Dict[str, Dict[str, Any]] = {}
+        self._embeddings: Dict[str, Dict[str, np.ndarray]] = {}
+
+        os.makedirs(storage_dir, exist_ok=True)
+        self._load()
+
+        logger.info("FaceGallery initialized: %d enrolled students (%s)",
+                    len(self._students), storage_dir)
+
+    @staticmethod
+    def _safe_name(value: str) -> str:
+        """Makes a model name safe to use as a directory name."""
+        return re.sub(r"[^A-Za-z0-9_.-]", "_", value)
+
+    def _embedding_path(self, student_id: str, model_name: str) -> str:
+        # Hashed, not sanitized: "2021/CS/01" and "2021_CS_01" must not share a file
+        digest = hashlib.sha256(student_id.encode("utf-8")).hexdigest()
+        return os.path.join(self.storage_dir, self._safe_name(model_name), f"{digest}.npy")
+
+    def _load(self) -> None:
+        """Loads the metadata index and every stored embedding."""
+        index_path = os.path.join(self.storage_dir, self.INDEX_FILE)
+        if not os.path.exists(index_path):
+            return
+
+        try:
+            with open(index_path, "r", encoding="utf-8") as f:
+                self._students = json.load(f)
+        except Exception as e:
+            logger.error("Could not read gallery index %s: %s", index_path, str(e))
+            return
+
+        for student_id, record in self._students.items():
+            for model_name in record.get("models", []):
+                path = self._embedding_path(student_id, model_name)
+                try:
+                    self._embeddings.setdefault(model_name, {})[student_id] = np.load(path)
+                except Exception as e:
+                    logger.warning("Missing embedding for %s (%s): %s", student_id, model_name, str(e))
+
+    def _save_index(self) -> None:
+        """Writes the metadata index atomically. Caller must hold the lock."""
+        index_path = os.path.join(self.storage_dir, self.INDEX_FILE)
+        tmp_path = f"{index_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._students, f, indent=2)
+        os.replace(tmp_path, index_path)
+
+    def enroll(
+        self,
+        student_id: str,
+        model_name: str,
+        embedding: np.ndarray,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Stores (or replaces) a student's template for one model.
+
+        Args:
+            student_id: The student's unique identifier
+            model_name: Model the embedding was computed with
+            embedding: The face embedding vector
+            metadata: Optional extra fields (name, roll_number, ...)
+
+        Returns:
+            dict: The student's gallery record
+        """
+        embedding = np.asarray(embedding, dtype=np.float32)
+        path = self._embedding_path(student_id, model_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        with self._lock:
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "wb") as f:
+                np.save(f, embedding)
+            os.replace(tmp_path, path)
+
+            record = self._students.setdefault(student_id, {"models": []})
+            if metadata:
+                record.update({k: v for k, v in metadata.items() if v is not None})
+            if model_name not in record["models"]:
+                record["models"].append(model_name)
+            record["enrolled_at"] = datetime.now().isoformat()
+
+            self._embeddings.setdefault(model_name, {})[student_id] = embedding
+            self._save_index()
+
+        logger.info("Enrolled student %s (%s)", student_id, model_name)
+        return dict(record)
+
+    def remove(self, student_id: str) -> bool:
+        """
+        Removes a student and all of their templates.
+
+        Args:
+            student_id: The student's unique identifier
+
+        Returns:
+            bool: True if the student was enrolled
+        """
+        with self._lock:
+            record = self._students.pop(student_id, None)
+            if record is None:
+                return False
+
+            for model_name in record.get("models", []):
+                self._embeddings.get(model_name, {}).pop(student_id, None)
+                path = self._embedding_path(student_id, model_name)
+                if os.path.exists(path):
+                    os.remove(path)
+            self._save_index()
+
+        logger.info("Removed student %s from gallery", student_id)
+        return True
+
+    def get_embedding(self, student_id: str, model_name: str) -> Optional[np.ndarray]:
+        """
+        Returns a student's stored template for a model.
+
+        Args:
+            student_id: The student's unique identifier
+            model_name: Model the template was computed with
+
+        Returns:
+            np.ndarray: The embedding, or None if not enrolled for this model
+        """
+        with self._lock:
+            return self._embeddings.get(model_name, {}).get(student_id)
+
+    def get_student(self, student_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns a student's gallery record (metadata and enrolled models).
+
+        Args:
+            student_id: The student's unique identifier
+
+        Returns:
+            dict: The record, or None if not enrolled
+        """
+        with self._lock:
+            record = self._students.get(student_id)
+            return dict(record) if record else None
+
+    def list_students(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Returns all gallery records keyed by student ID.
+
+        Returns:
+            dict: {student_id: record}
+        """
+        with self._lock:
+            return {sid: dict(record) for sid, record in self._students.items()}
+
+    def embeddings_for(
+        self,
+        model_name: str,
+        student_ids: Optional[List[str]] = None
+    ) -> Tuple[List[str], np.ndarray]:
+        """
+        Returns stacked templates for one model, for vectorized matching.
+
+        Args:
+            model_name: Model the templates were computed with
+            student_ids: Restrict to these students (None = everyone enrolled)
+
+        Returns:
+            tuple: (student IDs found, embedding matrix of shape (N, D))
+        """
+        with self._lock:
+            model_embeddings = self._embeddings.get(model_name, {})
+            if student_ids is None:
+                student_ids = list(model_embeddings.keys())
+            found = [sid for sid in student_ids if sid in model_embeddings]
+            if not found:
+                return [], np.empty((0, 0), dtype=np.float32)
+            return found, np.stack([model_embeddings[sid] for sid in found])
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._students)
+
+    def __contains__(self, student_id: str) -> bool:
+        with self._lock:
+            return student_id in self._students
@@ -0,0 +1,484 @@
+"""
+Face Index Module
+==================
+Nearest-neighbour search over enrolled face embeddings (1:N identification).
+
+Answering "who is this selfie?" without a student ID means comparing one
+embedding against every enrolled student. This module provides:
+- Exact brute-force cosine search for small galleries
+- An inverted-file (IVF) index - k-means partitions, probing only the
+  closest few - for campus-scale galleries
+- Incremental add/remove without a full rebuild; the index promotes itself
+  to IVF as enrollments push it past the flat size
+- A memory-mapped on-disk format so large indexes load instantly, with a
+  fingerprint to detect an index that no longer matches the gallery
+"""
+
+import os
+import json
+import hashlib
+import time
+import logging
+import threading
+from typing import Dict, Any, List, Optional, Tuple, Sequence
+
+import numpy as np
+
+# Configure module-level logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalizes rows so a dot product equals cosine similarity."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-10)
+
+
+def fingerprint(ids: Sequence[str], embeddings: Optional[np.ndarray]) -> str:
+    """
+    Hashes (student ID, normalized embedding) pairs independently of order,
+    as stored by FaceIndex - comparable with a saved index's fingerprint.
+
+    Args:
+        ids: Student IDs, one per row
+        embeddings: Embedding matrix, shape (len(ids), D)
+
+    Returns:
+        str: Hex SHA-256 digest
+    """
+    return _fingerprint(ids, _normalize(np.atleast_2d(embeddings)) if len(ids) else None)
+
+
+def _fingerprint(ids: Sequence[str], vectors: Optional[np.ndarray]) -> str:
+    """fingerprint() over vectors that are already normalized."""
+    digest = hashlib.sha256()
+    if len(ids):
+        for row in sorted(range(len(ids)), key=lambda r: ids[r]):
+            digest.update(ids[row].encode("utf-8") + b"\0")
+            digest.update(vectors[row].tobytes())
+    return digest.hexdigest()
+
+
+def _reserve(buffer: Optional[np.ndarray], used: int, needed: int, shape: Tuple[int, ...], dtype) -> np.ndarray:
+    """
+    Returns a buffer holding at least `needed` rows, doubling the capacity
+    when it must grow so a stream of single-row appends copies O(N) in total.
+    A memory-mapped buffer is copied into memory on its first growth.
+    """
+    if buffer is not None and len(buffer) >= needed and not isinstance(buffer, np.memmap):
+        return buffer
+    capacity = max(needed, 2 * (len(buffer) if buffer is not None else 0), 64)
+    grown = np.zeros((capacity,) + shape, dtype=dtype)
+    if used:
+        grown[:used] = buffer[:used]
+    return grown
+
+
+def kmeans(vectors: np.ndarray, n_clusters: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """
+    Spherical k-means on normalized vectors.
+
+    Args:
+        vectors: Normalized vectors, shape (N, D)
+        n_clusters: Number of centroids
+        iterations: Lloyd iterations
+        seed: Random seed for the initial centroids
+
+    Returns:
+        np.ndarray: Normalized centroids, shape (n_clusters, D)
+    """
+    rng = np.random.default_rng(seed)
+    n_clusters = min(n_clusters, len(vectors))
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+
+    for _ in range(iterations):
+        assign = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, vectors)
+        counts = np.bincount(assign, minlength=n_clusters)
+        # Re-seed empty clusters with random points
+        empty = counts == 0
+        if empty.any():
+            sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()), replace=False)]
+        centroids = _normalize(sums)
+
+    return centroids
+
+
+class FaceIndex:
+    """
+    Cosine nearest-neighbour index over face embeddings.
+
+    Below `ivf_min_size` vectors every search is exact brute force. From that
+    size on, build() partitions the vectors with k-means and searches probe
+    only the `n_probe` closest partitions. add() calls build() itself when
+    the index crosses `ivf_min_size`, and again each time it has doubled
+    since the last build so the partitions keep up with the gallery.
+
+    The vector, liveness and assignment arrays are capacity buffers: only
+    the first len(self._ids) rows are in use.
+
+    Attributes:
+        ivf_min_size (int): Gallery size from which the IVF index is used
+        n_lists (int|None): Number of IVF partitions (None = ~sqrt(N))
+        n_probe (int): Partitions scanned per query
+        model_name (str|None): Model the embeddings come from
+        saved_fingerprint (str|None): fingerprint() of the contents when the
+            index was saved (set by load())
+    """
+
+    # Compact the vector matrix once this fraction of rows are deleted
+    COMPACT_RATIO = 0.25
+
+    def __init__(self, ivf_min_size: int = 5000, n_lists: Optional[int] = None, n_probe: int = 8,
+                 model_name: Optional[str] = None):
+        """
+        Initialize an empty FaceIndex.
+
+        Args:
+            ivf_min_size: Gallery size from which the IVF index is used
+            n_lists: Number of IVF partitions (None = ~sqrt(N) at build time)
+            n_probe: Partitions scanned per query
+            model_name: Model the embeddings come from (stored with the index)
+        """
+        self.ivf_min_size = ivf_min_size
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.model_name = model_name
+        self.saved_fingerprint: Optional[str] = None
+
+        self._lock = threading.RLock()
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._vectors: Optional[np.ndarray] = None
+        self._alive = np.zeros(0, dtype=bool)
+        # Size at the last IVF build (0 while flat)
+        self._built_size = 0
+
+        # IVF state (None while the index is flat)
+        self._centroids: Optional[np.ndarray] = None
+        self._assign = np.zeros(0, dtype=np.int32)
+        self._lists: Optional[List[np.ndarray]] = None
+
+    # ------------------------------------------------------------------
+    # Mutation
+    # ------------------------------------------------------------------
+
+    def add(self, ids: Sequence[str], embeddings: np.ndarray) -> None:
+        """
+        Adds (or replaces) embeddings. New vectors join their nearest IVF
+        partition immediately; no rebuild is needed.
+
+        Args:
+            ids: Student IDs, one per row
+            embeddings: Embedding matrix, shape (len(ids), D)
+        """
+        vectors = _normalize(np.atleast_2d(embeddings))
+        if len(ids) != len(vectors):
+            raise ValueError(f"{len(ids)} ids for {len(vectors)} embeddings")
+        if not len(ids):
+            return
+
+        with self._lock:
+            self.remove([i for i in ids if i in self._rows])
+
+            start = len(self._ids)
+            end = start + len(ids)
+            if self._vectors is not None and vectors.shape[1] != self._vectors.shape[1]:
+                raise ValueError(f"Embedding size {vectors.shape[1]} != index size {self._vectors.shape[1]}")
+
+            self._vectors = _reserve(self._vectors, start, end, vectors.shape[1:], np.float32)
+            self._vectors[start:end] = vectors
+            self._alive = _reserve(self._alive, start, end, (), bool)
+            self._alive[start:end] = True
+
+            for offset, student_id in enumerate(ids):
+                self._rows[student_id] = start + offset
+            self._ids.extend(ids)
+
+            if self._needs_build():
+                self.build()
+            elif self._centroids is not None:
+                assign = np.argmax(vectors @ self._centroids.T, axis=1).astype(np.int32)
+                self._assign = _reserve(self._assign, start, end, (), np.int32)
+                self._assign[start:end] = assign
+                for cluster in np.unique(assign):
+                    new_rows = start + np.flatnonzero(assign == cluster)
+                    self._lists[cluster] = np.concatenate([self._lists[cluster], new_rows])
+
+    def _needs_build(self) -> bool:
+        """Whether the current size calls for a (re)build. Caller holds the lock."""
+        size = len(self._rows)
+        if self._centroids is None:
+            return size >= self.ivf_min_size
+        return size >= 2 * self._built_size
+
+    def configure(self, ivf_min_size: Optional[int] = None, n_probe: Optional[int] = None) -> None:
+        """
+        Applies search settings, e.g. to an index loaded with the settings it
+        was saved with, and rebuilds if the structure no longer fits them.
+
+        Args:
+            ivf_min_size: Gallery size from which the IVF index is used
+            n_probe: Partitions scanned per query
+        """
+        with self._lock:
+            if n_probe is not None:
+                self.n_probe = n_probe
+            if ivf_min_size is not None:
+                self.ivf_min_size = ivf_min_size
+            is_ivf = self._centroids is not None
+            if is_ivf != (len(self._rows) >= self.ivf_min_size):
+                self.build()
+
+    def remove(self, ids: Sequence[str]) -> int:
+        """
+        Removes embeddings by student ID.
+
+        Args:
+            ids: Student IDs to remove (unknown IDs are ignored)
+
+        Returns:
+            int: Number of entries removed
+        """
+        with self._lock:
+            removed = 0
+            for student_id in ids:
+                row = self._rows.pop(student_id, None)
+                if row is not None:
+                    self._alive[row] = False
+                    removed += 1
+
+            dead = len(self._ids) - len(self._rows)
+            if dead and dead >= self.COMPACT_RATIO * len(self._ids):
+                self._compact()
+            return removed
+
+    def _compact(self) -> None:
+        """Drops deleted rows and renumbers the IVF lists. Caller holds the lock."""
+        keep = np.flatnonzero(self._alive[:len(self._ids)])
+        self._ids = [self._ids[row] for row in keep]
+        self._rows = {student_id: row for row, student_id in enumerate(self._ids)}
+        self._vectors = np.ascontiguousarray(self._vectors[keep]) if len(keep) else None
+        self._alive = np.ones(len(keep), dtype=bool)
+        if self._centroids is not None:
+            self._assign = self._assign[keep]
+            self._lists = self._build_lists(self._assign, len(self._centroids))
+
+    @staticmethod
+    def _build_lists(assign: np.ndarray, n_lists: int) -> List[np.ndarray]:
+        order = np.argsort(assign, kind="stable")
+        bounds = np.searchsorted(assign[order], np.arange(n_lists + 1))
+        return [order[bounds[i]:bounds[i + 1]] for i in range(n_lists)]
+
+    def build(self) -> None:
+        """
+        (Re)builds the search structure for the current size: flat below
+        ivf_min_size, otherwise k-means partitions (IVF).
+        """
+        with self._lock:
+            if len(self._rows) != len(self._ids):
+                self._compact()
+
+            size = len(self._ids)
+            if size < self.ivf_min_size:
+                self._centroids, self._lists = None, None
+                self._assign = np.zeros(0, dtype=np.int32)
+                self._built_size = 0
+                return
+
+            start = time.perf_counter()
+            n_lists = self.n_lists or max(1, int(np.sqrt(size)))
+            vectors = np.asarray(self._vectors[:size])
+            # Train on a sample - the centroids converge long before all rows are needed
+            sample = vectors if size <= 64 * n_lists else vectors[
+                np.random.default_rng(0).choice(size, 64 * n_lists, replace=False)]
+            self._centroids = kmeans(sample, n_lists)
+            self._assign = np.argmax(vectors @ self._centroids.T, axis=1).astype(np.int32)
+            self._lists = self._build_lists(self._assign, len(self._centroids))
+            self._built_size = size
+            logger.info("FaceIndex: built IVF with %d lists over %d vectors in %.2fs",
+                        len(self._centroids), size, time.perf_counter() - start)
+
+    # ------------------------------------------------------------------
+    # Search
+    # ------------------------------------------------------------------
+
+    def search(self, query: np.ndarray, k: int = 5, exact: bool = False) -> List[Tuple[str, float]]:
+        """
+        Finds the k nearest enrolled embeddings to a query.
+
+        Args:
+            query: Query embedding, shape (D,)
+            k: Number of neighbours
+            exact: Force brute-force search even when an IVF index exists
+
+        Returns:
+            list: (student_id, cosine distance) pairs, closest first
+        """
+        return self.search_batch(np.atleast_2d(query), k=k, exact=exact)[0]
+
+    def search_batch(self, queries: np.ndarray, k: int = 5, exact: bool = False) -> List[List[Tuple[str, float]]]:
+        """
+        Finds the k nearest enrolled embeddings for each query.
+
+        Args:
+            queries: Query embeddings, shape (Q, D)
+            k: Number of neighbours per query
+            exact: Force brute-force search even when an IVF index exists
+
+        Returns:
+            list: Per query, (student_id, cosine distance) pairs, closest first
+        """
+        queries = _normalize(np.atleast_2d(queries))
+        with self._lock:
+            if self._vectors is None or not self._rows:
+                return [[] for _ in queries]
+
+            if exact or self._centroids is None:
+                vectors = self._vectors[:len(self._ids)]
+                return [self._top_k(vectors @ q, None, k) for q in queries]
+
+            n_probe = min(self.n_probe, len(self._centroids))
+            probes = np.argpartition(-(queries @ self._centroids.T), n_probe - 1, axis=1)[:, :n_probe]
+            results = []
+            for q, clusters in zip(queries, probes):
+                rows = np.concatenate([self._lists[c] for c in clusters])
+                results.append(self._top_k(self._vectors[rows] @ q, rows, k))
+            return results
+
+    def _top_k(self, similarities: np.ndarray, rows: Optional[np.ndarray], k: int) -> List[Tuple[str, float]]:
+        """Selects the k most similar live rows. Caller holds the lock."""
+        if rows is None:
+            rows = np.arange(len(similarities))
+        alive = self._alive[rows]
+        similarities, rows = similarities[alive], rows[alive]
+        if not len(rows):
+            return []
+
+        k = min(k, len(rows))
+        top = np.argpartition(-similarities, k - 1)[:k]
+        top = top[np.argsort(-similarities[top])]
+        return [(self._ids[rows[i]], max(0.0, float(1.0 - similarities[i]))) for i in top]
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def save(self, directory: str) -> None:
+        """
+        Writes the index to a directory (vectors as .npy, IDs as JSON).
+
+        Args:
+            directory: Target directory (created if missing)
+        """
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            if len(self._rows) != len(self._ids):
+                self._compact()
+
+            size = len(self._ids)
+            vectors = self._vectors[:size] if self._vectors is not None else None
+            meta = {
+                "ids": self._ids,
+                "model": self.model_name,
+                "dim": int(vectors.shape[1]) if vectors is not None else None,
+                "fingerprint": _fingerprint(self._ids, vectors),
+                "ivf_min_size": self.ivf_min_size,
+                "n_lists": self.n_lists,
+                "n_probe": self.n_probe,
+                "ivf": self._centroids is not None
+            }
+            arrays = {"vectors": vectors}
+            if self._centroids is not None:
+                arrays.update(centroids=self._centroids, assign=self._assign[:size])
+
+            for name, array in arrays.items():
+                if array is None:
+                    continue
+                path = os.path.join(directory, f"{name}.npy")
+                with open(f"{path}.tmp", "wb") as f:
+                    np.save(f, np.asarray(array))
+                os.replace(f"{path}.tmp", path)
+
+            # The metadata file is written last: it marks the index as complete
+            meta_path = os.path.join(directory, "index.json")
+            with open(f"{meta_path}.tmp", "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            os.replace(f"{meta_path}.tmp", meta_path)
+
+        logger.info("FaceIndex: saved %d vectors to %s", len(self._ids), directory)
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> Optional["FaceIndex"]:
+        """
+        Loads an index written by save().
+
+        With mmap=True the vector matrix is memory-mapped, so startup does not
+        read it into memory; pages are faulted in as searches touch them.
+
+        Args:
+            directory: Directory written by save()
+            mmap: Memory-map the vector matrix instead of reading it
+
+        Returns:
+            FaceIndex: The loaded index, or None if no complete index exists
+        """
+        meta_path = os.path.join(directory, "index.json")
+        if not os.path.exists(meta_path):
+            return None
+
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+
+        index = cls(ivf_min_size=meta["ivf_min_size"], n_lists=meta["n_lists"], n_probe=meta["n_probe"],
+                    model_name=meta.get("model"))
+        index.saved_fingerprint = meta.get("fingerprint")
+        index._ids = list(meta["ids"])
+        index._rows = {student_id: row for row, student_id in enumerate(index._ids)}
+        index._alive = np.ones(len(index._ids), dtype=bool)
+
+        if index._ids:
+            index._vectors = np.load(os.path.join(directory, "vectors.npy"), mmap_mode="r" if mmap else None)
+        if meta["ivf"]:
+            index._centroids = np.load(os.path.join(directory, "centroids.npy"))
+            index._assign = np.load(os.path.join(directory, "assign.npy"))
+            index._lists = cls._build_lists(index._assign, len(index._centroids))
+            index._built_size = len(index._ids)
+
+        logger.info("FaceIndex: loaded %d vectors from %s (%s)", len(index._ids), directory,
+                    "IVF" if meta["ivf"] else "flat")
+        return index
+
+    # ------------------------------------------------------------------
+    # Introspection
+    # ------------------------------------------------------------------
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._rows)
+
+    def __contains__(self, student_id: str) -> bool:
+        with self._lock:
+            return student_id in self._rows
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns index state.
+
+        Returns:
+            dict: Size, index type, dimensionality and IVF parameters
+        """
+        with self._lock:
+            return {
+                "size": len(self._rows),
+                "type": "ivf" if self._centroids is not None else "flat",
+                "model": self.model_name,
+                "dim": int(self._vectors.shape[1]) if self._vectors is not None else None,
+                "memory_mapped": isinstance(self._vectors, np.memmap),
+                "n_lists": len(self._centroids) if self._centroids is not None else None,
+                "n_probe": self.n_probe,
+                "ivf_min_size": self.ivf_min_size
+            }
@@ -6,55 +6,281 @@ Handles face verification and liveness detection for attendance.
 This module provides:
 - Document image pre-processing (deskewing, perspective correction)
 - DeepFace-based face verification between selfie and ID card
+- Enrollment of student face templates and selfie-only verification
 - Graceful error handling for face detection failures
 """
 
 import cv2
 import numpy as np
-import math
 import os
+import sys
+import time
 import logging
-from typing import Dict, Any, Optional, Tuple
+import threading
+from typing import Dict, Any, Optional, Tuple, Union, List
 from PIL import Image
 
+from .embedding_cache import EmbeddingCache
+from .face_gallery import FaceGallery
+from .micro_batcher import MicroBatcher
+from .face_detectors import FaceDetector, NATIVE_DETECTORS, get_detector, detect_downscaled, crop_face
+from .onnx_embedder import OnnxEmbedder
+from .image_loader import load_image
+from .lazy_imports import optional_import, module_available
+from .deadline import check_deadline
+from .metrics import observe, timed
+from .profiler import profiled
+
 # Configure module-level logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# Try to import DeepFace (may fail if not installed with all dependencies)
-try:
-    from deepface import DeepFace
-    DEEPFACE_AVAILABLE = True
-    logger.info("✅ DeepFace loaded successfully")
-    
-    # Pre-cache DeepFace model to avoid repeated downloads
-    # This loads the model once at startup, significantly improving performance
+
+def _quiet_tensorflow(_deepface) -> None:
+    """Suppresses TensorFlow warnings once DeepFace has pulled it in."""
+    tf = sys.modules.get("tensorflow")
+    if tf is None:
+        return
     try:
-        import tensorflow as tf
-        # Suppress TensorFlow warnings
         tf.compat.v1.logging.set_verbosity(tf.compat.v1.logging.ERROR)
-        
-        # Build and cache the model by running a dummy verification
-        # This forces DeepFace to download and cache the VGG-Face weights
-        logger.info("Pre-loading DeepFace model weights...")
-        # Note: Model will be loaded on first actual verification call
-        # DeepFace internally caches models in ~/.deepface/weights/
-        logger.info("✅ DeepFace model cache initialized")
-    except Exception as cache_error:
-        logger.warning("⚠️ Could not pre-cache DeepFace model: %s", str(cache_error))
-        
-except ImportError as e:
-    DEEPFACE_AVAILABLE = False
-    logger.warning("⚠️ DeepFace not available: %s", str(e))
+    except Exception as tf_error:
+        logger.warning("⚠️ Could not configure TensorFlow logging: %s", str(tf_error))
+
+
+def load_deepface() -> Any:
+    """
+    Returns the DeepFace module, importing it (and TensorFlow) on first use.
+
+    Model weights are built and loaded by FaceVerifier.warm_up(), which the
+    server runs in a background thread at startup.
+
+    Returns:
+        The DeepFace module, or None if it is not installed
+    """
+    return optional_import("deepface", "DeepFace", on_load=_quiet_tensorflow)
+
+
+def deepface_available() -> bool:
+    """Whether DeepFace can be used (imports it on first call)."""
+    return load_deepface() is not None
+
+
+# Anything verify_identity can take as an image: a file path, raw encoded
+# bytes (e.g. an upload body) or an already-decoded BGR array
+ImageInput = Union[str, bytes, bytearray, memoryview, np.ndarray]
+
 
-# Try to import MediaPipe for liveness detection
-try:
-    import mediapipe as mp
-    MEDIAPIPE_AVAILABLE = True
-    logger.info("✅ MediaPipe loaded successfully")
-except ImportError as e:
-    MEDIAPIPE_AVAILABLE = False
-    logger.warning("⚠️ MediaPipe not available: %s", str(e))
+def decode_image(image: ImageInput, max_side: Optional[int] = None) -> Optional[np.ndarray]:
+    """
+    Decodes an image into an upright BGR NumPy array without touching the disk.
+    
+    Args:
+        image: File path, encoded image bytes, or an already-decoded array
+               (returned as-is, so callers can decode once and reuse it)
+        max_side: Longest side the caller needs; large JPEGs are decoded at
+                  a reduced scale that still covers it (None = full size)
+    
+    Returns:
+        np.ndarray: The decoded BGR image, or None if it could not be decoded
+    
+    Raises:
+        FileNotFoundError: If a path is given and the file does not exist
+        ImageTooLargeError: If the image exceeds the IMAGE_MAX_PIXELS limit
+    """
+    if isinstance(image, np.ndarray):
+        return image if image.size else None
+    return load_image(image, max_side=max_side)
+
+
+class FaceQualityError(ValueError):
+    """
+    Raised by FaceQualityGate when an image is rejected before embedding.
+    
+    Attributes:
+        reason (str): Machine-readable reason (too_dark, too_bright, blurry,
+                      face_too_small, face_tilted, face_turned)
+    """
+    
+    def __init__(self, reason: str, message: str):
+        super().__init__(message)
+        self.reason = reason
+    
+    def __reduce__(self):
+        # Keeps the reason when the error crosses a process boundary
+        return FaceQualityError, (self.reason, str(self))
+
+
+class FaceQualityGate:
+    """
+    Cheap image-quality checks that run on live captures (selfies) before
+    the embedding network. Stored photos (profile, ID card, enrollment) are
+    never gated: the student cannot retake them.
+    
+    Exposure is checked on a small grayscale copy before face detection;
+    face size, pose (from the detector's eye positions), sharpness
+    (variance of the Laplacian) and face exposure are checked on the
+    detected face before it is embedded. Each check takes well under a
+    millisecond on the downscaled data.
+    
+    Attributes:
+        min_brightness (float): Minimum mean gray level (0-255)
+        max_brightness (float): Maximum mean gray level (0-255)
+        min_sharpness (float): Minimum Laplacian variance of the face at 128 px width
+        min_face_fraction (float): Minimum face width relative to the image width
+        min_face_pixels (int): Minimum face width in original pixels
+        max_roll_degrees (float): Maximum in-plane head tilt
+        max_yaw_offset (float): Maximum horizontal offset of the eye midpoint
+                                from the face centre, relative to face width
+    """
+    
+    # Size of the copy used for image-level checks and of the face crop
+    # used for the sharpness measure (keeps the score resolution-independent)
+    IMAGE_CHECK_SIDE = 256
+    FACE_CHECK_WIDTH = 128
+    
+    def __init__(
+        self,
+        min_brightness: float = 40.0,
+        max_brightness: float = 220.0,
+        min_sharpness: float = 30.0,
+        min_face_fraction: float = 0.10,
+        min_face_pixels: int = 64,
+        max_roll_degrees: float = 25.0,
+        max_yaw_offset: float = 0.20
+    ):
+        """
+        Initialize the FaceQualityGate.
+        
+        Args:
+            min_brightness: Minimum mean gray level of the image and the face
+            max_brightness: Maximum mean gray level of the image and the face
+            min_sharpness: Minimum Laplacian variance of the face crop
+            min_face_fraction: Minimum face width / image width
+            min_face_pixels: Minimum face width in original pixels
+            max_roll_degrees: Maximum head tilt (needs eye positions)
+            max_yaw_offset: Maximum eye-midpoint offset (needs eye positions)
+        """
+        self.min_brightness = min_brightness
+        self.max_brightness = max_brightness
+        self.min_sharpness = min_sharpness
+        self.min_face_fraction = min_face_fraction
+        self.min_face_pixels = min_face_pixels
+        self.max_roll_degrees = max_roll_degrees
+        self.max_yaw_offset = max_yaw_offset
+        
+        self._stats_lock = threading.Lock()
+        self.passed = 0
+        self.rejected: Dict[str, int] = {}
+    
+    def config(self) -> Dict[str, Any]:
+        """Returns the constructor arguments (the gate's thresholds)."""
+        return {
+            "min_brightness": self.min_brightness,
+            "max_brightness": self.max_brightness,
+            "min_sharpness": self.min_sharpness,
+            "min_face_fraction": self.min_face_fraction,
+            "min_face_pixels": self.min_face_pixels,
+            "max_roll_degrees": self.max_roll_degrees,
+            "max_yaw_offset": self.max_yaw_offset
+        }
+    
+    def _check_exposure(self, gray: np.ndarray, subject: str) -> float:
+        brightness = float(gray.mean())
+        if brightness < self.min_brightness:
+            raise FaceQualityError("too_dark", f"The {subject} is too dark. Please move to better lighting.")
+        if brightness > self.max_brightness:
+            raise FaceQualityError("too_bright", f"The {subject} is overexposed. Please avoid direct light.")
+        return brightness
+    
+    def check_image(self, image: np.ndarray) -> Dict[str, float]:
+        """
+        Image-level checks, run before face detection.
+        
+        Args:
+            image: Decoded BGR image
+        
+        Returns:
+            dict: Scores (brightness)
+        
+        Raises:
+            FaceQualityError: If the image is too dark or too bright
+        """
+        step = max(1, max(image.shape[:2]) // self.IMAGE_CHECK_SIDE)
+        # Strided subsampling is enough for a mean and costs no resize
+        gray = cv2.cvtColor(np.ascontiguousarray(image[::step, ::step]), cv2.COLOR_BGR2GRAY)
+        return {"image_brightness": round(self._check_exposure(gray, "photo"), 1)}
+    
+    def check_face(self, image: np.ndarray, detection: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Face-level checks, run after detection and before embedding.
+        
+        Args:
+            image: Decoded BGR image (full resolution)
+            detection: The detected face (x, y, w, h, optional eye positions)
+        
+        Returns:
+            dict: Scores (face_fraction, brightness, sharpness, roll_degrees, yaw_offset)
+        
+        Raises:
+            FaceQualityError: With the first failed check's reason
+        """
+        x, y, w, h = detection["x"], detection["y"], detection["w"], detection["h"]
+        scores: Dict[str, Any] = {"face_fraction": round(w / image.shape[1], 3)}
+        if w < self.min_face_pixels or scores["face_fraction"] < self.min_face_fraction:
+            raise FaceQualityError("face_too_small", "The face is too small. Please hold the camera closer.")
+        
+        left_eye, right_eye = detection.get("left_eye"), detection.get("right_eye")
+        if left_eye is not None and right_eye is not None:
+            (x1, y1), (x2, y2) = sorted([left_eye, right_eye])
+            roll = float(np.degrees(np.arctan2(y2 - y1, x2 - x1)))
+            yaw_offset = abs((x1 + x2) / 2.0 - (x + w / 2.0)) / w
+            scores["roll_degrees"], scores["yaw_offset"] = round(roll, 1), round(float(yaw_offset), 3)
+            if abs(roll) > self.max_roll_degrees:
+                raise FaceQualityError("face_tilted", "The head is tilted. Please hold the camera level.")
+            if yaw_offset > self.max_yaw_offset:
+                raise FaceQualityError("face_turned", "The face is turned away. Please look straight at the camera.")
+        
+        # Strided subsampling first keeps the resize cheap on 12 MP photos
+        step = max(1, w // (2 * self.FACE_CHECK_WIDTH))
+        crop = image[max(0, y):y + h:step, max(0, x):x + w:step]
+        scale = self.FACE_CHECK_WIDTH / max(1, crop.shape[1])
+        crop = cv2.resize(crop, (self.FACE_CHECK_WIDTH, max(1, int(crop.shape[0] * scale))), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+        
+        scores["brightness"] = round(self._check_exposure(gray, "face"), 1)
+        scores["sharpness"] = round(float(cv2.Laplacian(gray, cv2.CV_64F).var()), 1)
+        if scores["sharpness"] < self.min_sharpness:
+            raise FaceQualityError("blurry", "The photo is blurry. Please hold the camera still.")
+        return scores
+    
+    def record(self, reason: Optional[str]) -> None:
+        """Counts one gated image (reason None = passed)."""
+        with self._stats_lock:
+            if reason is None:
+                self.passed += 1
+            else:
+                self.rejected[reason] = self.rejected.get(reason, 0) + 1
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns gate counters.
+        
+        Returns:
+            dict: Thresholds, passed/rejected counts, rejections per reason
+                  and the number of embedding inferences saved
+        """
+        with self._stats_lock:
+            rejected = sum(self.rejected.values())
+            checked = self.passed + rejected
+            return {
+                **self.config(),
+                "checked": checked,
+                "passed": self.passed,
+                "rejected": rejected,
+                "rejected_by_reason": dict(self.rejected),
+                "inferences_saved": rejected,
+                "rejection_rate": round(rejected / checked, 4) if checked else 0.0
+            }
 
 
 class FaceVerifier:
@@ -69,12 +295,19 @@ class FaceVerifier:
     Attributes:
         model_name (str): The DeepFace model to use for verification
         temp_dir (str): Directory for temporary processed images
+        embedding_cache (EmbeddingCache|None): Cache for profile photo embeddings
+        gallery (FaceGallery|None): Enrolled student templates
+        face_index (FaceIndex|None): Search index over the gallery for 1:N lookups
     """
     
     # Constants for blink detection
     EYE_AR_THRESH = 0.22
     EYE_AR_CONSEC_FRAMES = 3
     
+    # MediaPipe FaceMesh landmark indices (p1..p6) of each eye
+    LEFT_EYE_LANDMARKS = (362, 385, 387, 263, 373, 380)
+    RIGHT_EYE_LANDMARKS = (33, 160, 158, 133, 153, 144)
+    
     # Optimized model-specific thresholds based on research and testing
     # These are tuned for ID card vs selfie comparison (more lenient than standard)
     MODEL_THRESHOLDS = {
@@ -89,10 +322,43 @@ class FaceVerifier:
         "SFace": {"strict": 0.45, "normal": 0.55, "lenient": 0.65, "very_lenient": 0.85},
     }
     
+    # Longest side of the detection copy for group photos (small faces)
+    GROUP_DETECTION_MAX_SIDE = 1920
+    
+    # Longest side document photos are decoded at for pre-processing
+    DOCUMENT_MAX_SIDE = 2000
+    
     # Default threshold mode for MVP (very lenient to ensure most verifications pass)
     DEFAULT_THRESHOLD_MODE = "very_lenient"
     
-    def __init__(self, model_name: str = "VGG-Face", temp_dir: str = "./temp", threshold_mode: str = None):
+    # Embedding backends: DeepFace's Keras models, or the same models exported
+    # to ONNX (export_face_models.py) and run with ONNX Runtime or cv2.dnn
+    EMBEDDING_BACKENDS = ("deepface", "onnxruntime", "opencv-dnn")
+    
+    # DeepFace.verify / DeepFace.represent default, which MODEL_THRESHOLDS
+    # were calibrated with
+    NORMALIZATION = "base"
+    
+    # Part of the profile embedding cache key; bump when face cropping or
+    # preprocessing changes, so embeddings cached by older code are recomputed
+    PREPROCESSING_VERSION = 2
+    
+    def __init__(
+        self,
+        model_name: str = "VGG-Face",
+        temp_dir: str = "./temp",
+        threshold_mode: str = None,
+        embedding_cache: Optional[EmbeddingCache] = None,
+        gallery: Optional[FaceGallery] = None,
+        detector_backend: str = "opencv",
+        detection_max_side: Optional[int] = 640,
+        decode_max_side: Optional[int] = None,
+        quality_gate: Optional[FaceQualityGate] = None,
+        embedding_backend: str = "deepface",
+        onnx_model_dir: str = "./models/onnx",
+        onnx_int8: bool = False,
+        onnx_threads: Optional[int] = None
+    ):
         """
         Initialize the FaceVerifier.
         
@@ -102,10 +368,65 @@ class FaceVerifier:
             temp_dir: Directory for temporary files
             threshold_mode: Threshold strictness - "strict", "normal", "lenient", "very_lenient"
                            None = auto (uses "lenient" for ID card verification)
+            embedding_cache: Optional cache for profile photo embeddings
+            gallery: Optional gallery of enrolled student templates
+            detector_backend: Face detector - "haar", "opencv-dnn", "mediapipe" or a
+                             DeepFace detector backend (default: opencv, DeepFace's default)
+            detection_max_side: Longest side of the downscaled copy faces are
+                               detected on (None = detect at full resolution)
+            decode_max_side: Longest side uploads must keep when decoded; large
+                            JPEGs are decoded at 1/2, 1/4 or 1/8 scale down to
+                            it (None = always decode at full resolution)
+            quality_gate: Optional pre-embedding quality checks (None = disabled)
+            embedding_backend: "deepface" (Keras), or "onnxruntime" / "opencv-dnn"
+                              to run the model exported to onnx_model_dir
+            onnx_model_dir: Directory written by export_face_models.py
+            onnx_int8: Use the INT8-quantized export (onnxruntime backend only)
+            onnx_threads: Intra-op threads of the ONNX runtime (None = all cores)
         """
+        if embedding_backend not in self.EMBEDDING_BACKENDS:
+            raise ValueError(f"Unknown embedding backend {embedding_backend!r}; "
+                             f"choose from {', '.join(self.EMBEDDING_BACKENDS)}")
+        if onnx_int8 and embedding_backend != "onnxruntime":
+            # cv2.dnn cannot run the DynamicQuantizeLinear ops of INT8 exports
+            raise ValueError("INT8 models are only supported by the onnxruntime embedding backend")
+        
         self.model_name = model_name
         self.temp_dir = temp_dir
         self.threshold_mode = threshold_mode or self.DEFAULT_THRESHOLD_MODE
+        self.embedding_cache = embedding_cache
+        self.gallery = gallery
+        self.detector_backend = detector_backend
+        self.detection_max_side = detection_max_side
+        self.decode_max_side = decode_max_side
+        self.quality_gate = quality_gate
+        self.embedding_backend = embedding_backend
+        self.onnx_model_dir = onnx_model_dir
+        self.onnx_int8 = onnx_int8
+        self.onnx_threads = onnx_threads
+        
+        # Built model (lazily, see _get_model), optional micro-batcher and
+        # optional out-of-process inference pool
+        self._model = None
+        self._detector: Optional[FaceDetector] = None
+        # Requests may arrive while the background warm-up is still building
+        self._build_lock = threading.Lock()
+        self.batcher: Optional[MicroBatcher] = None
+        self.inference_pool = None
+        
+        # Optional nearest-neighbour index over the gallery (see use_face_index)
+        self.face_index = None
+        
+        # Model warm-up / readiness state. In-process, the model counts as
+        # loaded once network and detector are built, by warm-up or a request
+        self.model_loaded = False
+        self.warmup_seconds: Optional[float] = None
+        self.warmup_error: Optional[str] = None
+        self._build_seconds = 0.0
+        
+        # Number of embedding computations currently running or waiting
+        self.pending = 0
+        self._pending_lock = threading.Lock()
         
         # Get the optimized threshold for this model
         self.threshold = self._get_optimized_threshold()
@@ -113,8 +434,40 @@ class FaceVerifier:
         # Create temp directory if it doesn't exist
         os.makedirs(temp_dir, exist_ok=True)
         
-        logger.info("FaceVerifier initialized with model: %s, threshold: %.2f (%s mode)", 
-                   model_name, self.threshold, self.threshold_mode)
+        logger.info("FaceVerifier initialized with model: %s (%s%s), threshold: %.2f (%s mode)", 
+                   model_name, embedding_backend, " int8" if onnx_int8 else "", self.threshold, self.threshold_mode)
+    
+    def embedding_config(self) -> Dict[str, Any]:
+        """Embedding backend settings, as FaceVerifier keyword arguments (e.g. for InferencePool workers)."""
+        return {
+            "embedding_backend": self.embedding_backend,
+            "onnx_model_dir": self.onnx_model_dir,
+            "onnx_int8": self.onnx_int8
+        }
+    
+    def cache_settings(self) -> Dict[str, Any]:
+        """Settings besides the model that a profile embedding depends on, for EmbeddingCache.make_key()."""
+        return {
+            "embedding_backend": self.embedding_backend,
+            "onnx_int8": self.onnx_int8,
+            "detector_backend": self.detector_backend,
+            "detection_max_side": self.detection_max_side,
+            "decode_max_side": self.decode_max_side,
+            "normalization": self.NORMALIZATION,
+            "preprocessing": self.PREPROCESSING_VERSION
+        }
+    
+    def backend_available(self) -> bool:
+        """
+        Whether the libraries this verifier needs are installed.
+        
+        DeepFace is only needed by the "deepface" embedding backend and by
+        DeepFace detector backends; ONNX backends with a native detector
+        never import it.
+        """
+        if self.embedding_backend == "deepface" or self.detector_backend not in NATIVE_DETECTORS:
+            return deepface_available()
+        return True
     
     def _get_optimized_threshold(self) -> float:
         """
@@ -177,6 +530,785 @@ class FaceVerifier:
         else:
             return "No Match"
     
+    def warm_up(self) -> Dict[str, Any]:
+        """
+        Builds the model and runs a dummy inference so the first real
+        verification does not pay for graph construction and weight loading.
+        
+        Returns:
+            dict: Warm-up result containing:
+                - success (bool): Whether the model is loaded
+                - model (str): Model that was warmed up
+                - seconds (float|None): Time spent warming up
+                - error (str|None): Error message if warm-up failed
+        """
+        if self.inference_pool is not None:
+            # The model lives in the worker processes - wait for all of them
+            self.model_loaded = self.inference_pool.start()
+            self.warmup_seconds = self.inference_pool.startup_seconds
+            self.warmup_error = None if self.model_loaded else "Inference workers did not become ready"
+            if self.model_loaded:
+                # Single faces are still detected in this process
+                try:
+                    self._get_detector().detect(np.zeros((64, 64, 3), dtype=np.uint8))
+                except Exception as e:
+                    self.model_loaded = False
+                    self.warmup_error = f"Face detector could not be built: {e}"
+                    logger.error("❌ Detector warm-up failed: %s", str(e))
+            return {
+                "success": self.model_loaded,
+                "model": self.model_name,
+                "seconds": self.warmup_seconds,
+                "error": self.warmup_error
+            }
+        
+        if not self.backend_available():
+            self.warmup_error = "DeepFace is not installed"
+            return {"success": False, "model": self.model_name, "seconds": None, "error": self.warmup_error}
+        
+        start = time.perf_counter()
+        try:
+            logger.info("Warming up %s model...", self.model_name)
+            
+            # Downloads (first run only), builds and caches the model graph
+            height, width = self._model_input_size()
+            
+            # A blank frame exercises the detector without requiring a face,
+            # and a blank batch runs one forward pass through the network
+            self._get_detector().detect(np.zeros((height, width, 3), dtype=np.uint8))
+            self._forward(np.zeros((1, height, width, 3), dtype=np.float32))
+            
+            self.model_loaded = True
+            self.warmup_error = None
+            self.warmup_seconds = round(time.perf_counter() - start, 3)
+            logger.info("✅ %s model warmed up in %.2fs", self.model_name, self.warmup_seconds)
+            
+        except Exception as e:
+            self.warmup_error = str(e)
+            logger.error("❌ Model warm-up failed: %s", str(e))
+        
+        return {
+            "success": self.model_loaded,
+            "model": self.model_name,
+            "seconds": self.warmup_seconds,
+            "error": self.warmup_error
+        }
+    
+    def _get_model(self) -> Any:
+        """Returns the built embedding model (built once, then reused)."""
+        if self._model is None:
+            with self._build_lock:
+                if self._model is None:
+                    start = time.perf_counter()
+                    if self.embedding_backend == "deepface":
+                        self._model = load_deepface().build_model(self.model_name)
+                    else:
+                        self._model = OnnxEmbedder.for_model(self.model_name, self.onnx_model_dir,
+                                                             runtime=self.embedding_backend, int8=self.onnx_int8,
+                                                             threads=self.onnx_threads)
+                    self._record_build(time.perf_counter() - start)
+        return self._model
+    
+    def _get_detector(self) -> FaceDetector:
+        """Returns the face detector backend (built once, then reused)."""
+        if self._detector is None:
+            with self._build_lock:
+                if self._detector is None:
+                    start = time.perf_counter()
+                    self._detector = get_detector(self.detector_backend)
+                    self._record_build(time.perf_counter() - start)
+        return self._detector
+    
+    def _record_build(self, seconds: float) -> None:
+        """
+        Marks the in-process model loaded once both network and detector are
+        built, whether by warm_up() or by the first request. Caller holds
+        _build_lock.
+        """
+        self._build_seconds += seconds
+        if self.inference_pool is not None or self.model_loaded:
+            return
+        if self._model is not None and self._detector is not None:
+            self.model_loaded = True
+            self.warmup_error = None
+            if self.warmup_seconds is None:
+                self.warmup_seconds = round(self._build_seconds, 3)
+            logger.info("%s model loaded (built in %.2fs)", self.model_name, self._build_seconds)
+    
+    def _model_input_size(self) -> Tuple[int, int]:
+        """
+        Returns the (height, width) the embedding model expects.
+        
+        Older DeepFace versions return the Keras model itself, whose
+        input_shape is (None, h, w, c); newer versions wrap it and expose
+        input_shape as (w, h).
+        """
+        if self.inference_pool is not None:
+            # The model only exists in the worker processes
+            return self.inference_pool.input_size()
+        shape = tuple(self._get_model().input_shape)
+        if len(shape) == 4:
+            return int(shape[1]), int(shape[2])
+        return int(shape[1]), int(shape[0])
+    
+    def _forward(self, batch: np.ndarray) -> np.ndarray:
+        """
+        Runs one forward pass over a batch of preprocessed faces.
+        
+        Args:
+            batch: Preprocessed faces (see _prepare_face), shape (N, h, w, 3)
+        
+        Returns:
+            np.ndarray: Embeddings, shape (N, D)
+        """
+        model = self._get_model()
+        keras_model = getattr(model, "model", model)
+        if hasattr(keras_model, "predict"):
+            return np.asarray(keras_model.predict(batch, verbose=0), dtype=np.float32).reshape(len(batch), -1)
+        
+        # Non-Keras backends (e.g. SFace, Dlib) only take one face at a time
+        return np.stack([
+            np.asarray(model.forward(face[np.newaxis]), dtype=np.float32).reshape(-1)
+            for face in batch
+        ])
+    
+    def check_live_image(self, image: np.ndarray) -> Dict[str, Any]:
+        """
+        Runs the quality gate's image-level checks on a live capture (selfie).
+        
+        Cheap enough to run before anything else in the request, so a
+        rejected selfie costs no profile embedding either.
+        
+        Args:
+            image: Decoded BGR selfie
+        
+        Returns:
+            dict: Image-level scores (empty without a quality gate), to pass
+                  on as represent_with_info(image_quality=...)
+        
+        Raises:
+            FaceQualityError: If the image is too dark or too bright
+        """
+        if self.quality_gate is None:
+            return {}
+        try:
+            return self.quality_gate.check_image(image)
+        except FaceQualityError as e:
+            self.quality_gate.record(e.reason)
+            raise
+    
+    def _detect_face(
+        self,
+        image: np.ndarray,
+        image_quality: Optional[Dict[str, Any]] = None
+    ) -> Tuple[np.ndarray, Dict[str, Any]]:
+        """
+        Detects the most prominent face on a downscaled copy of the image and
+        crops it from the full-resolution original.
+        
+        Args:
+            image: Decoded BGR image
+            image_quality: check_live_image() scores of a live capture; the
+                           face-level quality checks run only when given
+        
+        Returns:
+            tuple: (aligned face crop, see crop_face; detection info with
+                    backend, latency_ms, scale, faces and, when gated, quality)
+        
+        Raises:
+            ValueError: If no face can be detected in the image
+            FaceQualityError: If the quality gate rejects the face
+        """
+        detections, info = detect_downscaled(self._get_detector(), image, self.detection_max_side)
+        if not detections:
+            raise ValueError("Face could not be detected in the image. Please confirm that the picture is a face photo.")
+        
+        # Keep the most prominent face
+        detection = max(detections, key=lambda d: d["w"] * d["h"])
+        if image_quality is not None and self.quality_gate is not None:
+            # Rejects blurry, dark, tiny or turned faces before the embedding network runs
+            try:
+                info["quality"] = {**image_quality, **self.quality_gate.check_face(image, detection)}
+            except FaceQualityError as e:
+                self.quality_gate.record(e.reason)
+                raise
+            self.quality_gate.record(None)
+        return crop_face(image, detection), info
+    
+    def _prepare_face(self, face: np.ndarray) -> np.ndarray:
+        """
+        Converts a face crop into model input exactly as DeepFace.represent
+        does, so distances stay comparable to MODEL_THRESHOLDS: scaled to fit
+        the model's input size, centred on black padding, then normalized
+        with normalize_input(NORMALIZATION).
+        
+        Args:
+            face: Float BGR face crop in [0, 1], as returned by crop_face
+        
+        Returns:
+            np.ndarray: Float BGR face of the model's input size
+        """
+        face = np.asarray(face, dtype=np.float32)
+        while face.ndim > 3:
+            face = face[0]
+        if face.max() > 1:
+            face = face / 255.0
+        
+        # DeepFace's preprocessing.resize_image
+        height, width = self._model_input_size()
+        scale = min(height / face.shape[0], width / face.shape[1])
+        resized = cv2.resize(face, (max(1, int(face.shape[1] * scale)), max(1, int(face.shape[0] * scale))))
+        pad_h, pad_w = height - resized.shape[0], width - resized.shape[1]
+        padded = np.pad(
+            resized,
+            ((pad_h // 2, pad_h - pad_h // 2), (pad_w // 2, pad_w - pad_w // 2), (0, 0)),
+            mode="constant"
+        )
+        if padded.shape[:2] != (height, width):
+            padded = cv2.resize(padded, (width, height))
+        return self._normalize_input(padded, self.NORMALIZATION)
+    
+    @staticmethod
+    def _normalize_input(face: np.ndarray, normalization: str = "base") -> np.ndarray:
+        """
+        DeepFace's preprocessing.normalize_input, for a face in [0, 1].
+        
+        Args:
+            face: Float BGR face in [0, 1]
+            normalization: "base" (unchanged), "raw", "Facenet", "Facenet2018",
+                           "VGGFace", "VGGFace2" or "ArcFace"
+        
+        Returns:
+            np.ndarray: The normalized face
+        """
+        if normalization == "base":
+            return face
+        face = face * 255
+        if normalization == "raw":
+            pass
+        elif normalization == "Facenet":
+            face = (face - face.mean()) / face.std()
+        elif normalization == "Facenet2018":
+            face = face / 127.5 - 1
+        elif normalization == "VGGFace":
+            face = face - np.array([93.5940, 104.7624, 129.1863], dtype=np.float32)
+        elif normalization == "VGGFace2":
+            face = face - np.array([91.4953, 103.8827, 131.0912], dtype=np.float32)
+        elif normalization == "ArcFace":
+            face = (face - 127.5) / 128
+        else:
+            raise ValueError(f"Unknown normalization {normalization!r}")
+        return face.astype(np.float32)
+    
+    def represent_batch(self, images: List[np.ndarray]) -> List[Union[np.ndarray, Exception]]:
+        """
+        Computes embeddings for several images with a single forward pass.
+        
+        Args:
+            images: Decoded BGR images
+        
+        Returns:
+            list: One embedding (float32 vector) or Exception per input image
+        """
+        return [r if isinstance(r, Exception) else r[0] for r in self.represent_batch_detailed(images)]
+    
+    def represent_batch_detailed(
+        self,
+        images: List[np.ndarray]
+    ) -> List[Union[Tuple[np.ndarray, Dict[str, Any]], Exception]]:
+        """
+        Computes embeddings for several images with a single forward pass,
+        keeping each image's detection info.
+        
+        Faces are detected per image in the calling thread; all detected
+        faces are then embedded in one forward pass. Images without a
+        detectable face get a ValueError in their slot instead of failing the
+        whole batch.
+        
+        Args:
+            images: Decoded BGR images
+        
+        Returns:
+            list: One (embedding, detection info) tuple or Exception per input image
+        """
+        results: List[Any] = [None] * len(images)
+        faces, infos, slots = [], [], []
+        for i, image in enumerate(images):
+            try:
+                face, info = self._detect_face(image)
+                faces.append(self._prepare_face(face))
+                infos.append(info)
+                slots.append(i)
+            except Exception as e:
+                results[i] = e
+        
+        if faces:
+            try:
+                embeddings = self._forward(np.stack(faces))
+                for slot, embedding, info in zip(slots, embeddings, infos):
+                    results[slot] = (embedding, info)
+            except Exception as e:
+                for slot in slots:
+                    results[slot] = e
+        
+        return results
+    
+    def represent_all_faces(self, image: np.ndarray) -> Tuple[np.ndarray, List[Dict[str, int]]]:
+        """
+        Detects every face in an image and embeds them all in one batch.
+        
+        Args:
+            image: Decoded BGR image (e.g. a classroom photo)
+        
+        Returns:
+            tuple: (embeddings of shape (N, D), facial area dict per face)
+        """
+        # Faces in a classroom photo are small, so detect on a larger copy
+        max_side = self.detection_max_side and max(self.detection_max_side, self.GROUP_DETECTION_MAX_SIDE)
+        detections, _ = detect_downscaled(self._get_detector(), image, max_side)
+        if not detections:
+            return np.empty((0, 0), dtype=np.float32), []
+        
+        batch = np.stack([self._prepare_face(crop_face(image, d)) for d in detections])
+        areas = [{key: d[key] for key in ("x", "y", "w", "h")} for d in detections]
+        return self._forward(batch), areas
+    
+    @staticmethod
+    def cosine_distance_matrix(embeddings_a: np.ndarray, embeddings_b: np.ndarray) -> np.ndarray:
+        """
+        Calculates all pairwise cosine distances between two sets of embeddings.
+        
+        Args:
+            embeddings_a: Matrix of shape (N, D)
+            embeddings_b: Matrix of shape (M, D)
+        
+        Returns:
+            np.ndarray: Distance matrix of shape (N, M)
+        """
+        a = embeddings_a / np.maximum(np.linalg.norm(embeddings_a, axis=1, keepdims=True), 1e-10)
+        b = embeddings_b / np.maximum(np.linalg.norm(embeddings_b, axis=1, keepdims=True), 1e-10)
+        return 1.0 - a @ b.T
+    
+    def identify_group(
+        self,
+        image: ImageInput,
+        roster: List[str],
+        threshold_mode: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Finds which students from a roster appear in a group (classroom) photo.
+        
+        Every detected face is embedded in one batch and compared against the
+        roster's enrolled templates with a single distance matrix. Faces and
+        students are then paired one-to-one, closest pairs first, as long as
+        the distance is within the model's threshold.
+        
+        Args:
+            image: Group photo (path, encoded bytes or BGR array)
+            roster: Student IDs expected in the session (duplicates are ignored)
+            threshold_mode: Override of the verifier's threshold mode
+                           ("strict", "normal", "lenient", "very_lenient")
+        
+        Returns:
+            dict: Identification result containing:
+                - success (bool): Whether identification completed
+                - faces_detected (int): Number of faces found in the photo
+                - present (list): Matched students with distance, confidence
+                  and the matching face's facial_area
+                - absent (list): Enrolled roster students not found
+                - not_enrolled (list): Roster students without a template
+                - unmatched_faces (int): Faces that matched nobody on the roster
+                - threshold (float): Distance threshold used
+                - model (str): Model used
+                - error (str|None): Error message if identification failed
+        """
+        if self.gallery is None:
+            return {"success": False, "error": "No face gallery configured"}
+        
+        if not self.backend_available() and self.inference_pool is None:
+            return {
+                "success": False,
+                "error": "DeepFace is not installed. Please install with: pip install deepface"
+            }
+        
+        model_thresholds = self.MODEL_THRESHOLDS.get(self.model_name, {})
+        mode = threshold_mode or self.threshold_mode
+        threshold = model_thresholds.get(mode, self.threshold)
+        
+        try:
+            # Full resolution: small faces in a classroom photo need every pixel
+            img = decode_image(image)
+            if img is None:
+                return {"success": False, "error": "Could not read group photo. The file may be corrupted."}
+            
+            # A student listed twice would otherwise be paired with two faces
+            roster = list(dict.fromkeys(roster))
+            student_ids, templates = self.gallery.embeddings_for(self.model_name, roster)
+            enrolled = set(student_ids)
+            not_enrolled = [sid for sid in roster if sid not in enrolled]
+            
+            if self.inference_pool is not None:
+                embeddings, areas = self.inference_pool.represent_all_faces(img)
+            else:
+                embeddings, areas = self.represent_all_faces(img)
+            logger.info("Group photo: %d faces detected, %d enrolled roster students",
+                       len(areas), len(student_ids))
+            
+            present = []
+            if len(areas) and len(student_ids):
+                distances = self.cosine_distance_matrix(embeddings, templates)
+                
+                # Greedy one-to-one assignment, closest (face, student) pairs first
+                face_taken = np.zeros(distances.shape[0], dtype=bool)
+                student_taken = np.zeros(distances.shape[1], dtype=bool)
+                for flat in np.argsort(distances, axis=None):
+                    face_idx, student_idx = np.unravel_index(flat, distances.shape)
+                    distance = max(0.0, float(distances[face_idx, student_idx]))
+                    if distance > threshold:
+                        break
+                    if face_taken[face_idx] or student_taken[student_idx]:
+                        continue
+                    face_taken[face_idx] = student_taken[student_idx] = True
+                    present.append({
+                        "student_id": student_ids[student_idx],
+                        "distance": round(distance, 4),
+                        "confidence": self.calculate_confidence(distance),
+                        "match_quality": self.get_match_quality(distance),
+                        "face_index": int(face_idx),
+                        "facial_area": areas[face_idx]
+                    })
+            
+            matched = {p["student_id"] for p in present}
+            result = {
+                "success": True,
+                "faces_detected": len(areas),
+                "present": present,
+                "absent": [sid for sid in student_ids if sid not in matched],
+                "not_enrolled": not_enrolled,
+                "unmatched_faces": len(areas) - len(present),
+                "threshold": threshold,
+                "threshold_mode": mode,
+                "model": self.model_name,
+                "error": None
+            }
+            logger.info("✅ Group identification: %d/%d roster students present",
+                       len(present), len(roster))
+            return result
+            
+        except FileNotFoundError as e:
+            return {"success": False, "error": f"Group photo not found: {e}"}
+        
+        except Exception as e:
+            logger.error("Unexpected error during group identification: %s", str(e))
+            return {"success": False, "error": f"Group identification failed: {str(e)}"}
+    
+    def use_face_index(self, index: Any) -> None:
+        """
+        Attaches a FaceIndex for 1:N identification. The index is filled from
+        the gallery if it is empty, and kept in sync by enroll_student(); it
+        switches to IVF search by itself once it grows past ivf_min_size.
+        
+        Args:
+            index: The FaceIndex (see services.face_index)
+        """
+        if len(index) == 0 and self.gallery is not None:
+            student_ids, templates = self.gallery.embeddings_for(self.model_name)
+            if student_ids:
+                index.add(student_ids, templates)
+        self.face_index = index
+    
+    def identify(self, selfie: ImageInput, top_k: int = 5) -> Dict[str, Any]:
+        """
+        Identifies who a selfie belongs to among all enrolled students.
+        
+        The selfie is embedded once and looked up in the face index, so a
+        kiosk needs no student ID. Candidates are returned closest first;
+        only candidates within the model's threshold count as a match.
+        
+        Args:
+            selfie: Live selfie image (path, encoded bytes or BGR array)
+            top_k: Number of candidates to return
+        
+        Returns:
+            dict: Identification result containing:
+                - success (bool): Whether the lookup completed
+                - identified (bool): Whether the best candidate is within threshold
+                - student_id (str|None): The best matching student, if identified
+                - candidates (list): student_id, distance, confidence, matched
+                - threshold (float): Distance threshold used
+                - model (str): Model used
+                - error (str|None): Error message if identification failed
+        """
+        if self.face_index is None:
+            return {"success": False, "identified": False, "error": "No face index configured"}
+        
+        if not self.backend_available() and self.inference_pool is None:
+            return {
+                "success": False,
+                "identified": False,
+                "error": "DeepFace is not installed. Please install with: pip install deepface"
+            }
+        
+        try:
+            selfie_img = decode_image(selfie, self.decode_max_side)
+            if selfie_img is None:
+                return {
+                    "success": False,
+                    "identified": False,
+                    "error": "Could not read selfie image. The file may be corrupted."
+                }
+            
+            embedding, detection = self.represent_with_info(selfie_img, self.check_live_image(selfie_img))
+            candidates = [
+                {
+                    "student_id": student_id,
+                    "distance": round(distance, 4),
+                    "confidence": self.calculate_confidence(distance),
+                    "matched": distance <= self.threshold
+                }
+                for student_id, distance in self.face_index.search(embedding, k=top_k)
+            ]
+            identified = bool(candidates) and candidates[0]["matched"]
+            
+            logger.info("Identification: best=%s (%s), %d candidates",
+                       candidates[0]["student_id"] if candidates else None,
+                       "match" if identified else "no match", len(candidates))
+            return {
+                "success": True,
+                "identified": identified,
+                "student_id": candidates[0]["student_id"] if identified else None,
+                "candidates": candidates,
+                "threshold": self.threshold,
+                "threshold_mode": self.threshold_mode,
+                "model": self.model_name,
+                "detection": detection,
+                "error": None
+            }
+            
+        except FileNotFoundError as e:
+            return {"success": False, "identified": False, "error": f"Selfie not found: {e}"}
+        
+        except ValueError as e:
+            return {"identified": False, **self._detection_error(e)}
+        
+        except Exception as e:
+            logger.error("Unexpected error during identification: %s", str(e))
+            return {"success": False, "identified": False, "error": f"Identification failed: {str(e)}"}
+    
+    def use_inference_pool(self, pool: Any) -> None:
+        """
+        Moves the embedding network into an InferencePool's worker processes:
+        forward passes over prepared faces, and whole group photos. Detection
+        of single faces, caching, gallery lookups and distances stay in-process.
+        
+        Call before enable_batching(), so batches are dispatched to the pool.
+        
+        Args:
+            pool: The InferencePool (see services.inference_pool)
+        """
+        self.inference_pool = pool
+    
+    def _embed_faces(self, faces: List[np.ndarray]) -> List[np.ndarray]:
+        """Runs one forward pass over prepared faces, in-process or in the inference pool."""
+        if self.inference_pool is not None:
+            return list(self.inference_pool.embed_faces(faces))
+        return list(self._forward(np.stack(faces)))
+    
+    def enable_batching(self, max_batch_size: int = 8, max_wait_ms: float = 5.0) -> MicroBatcher:
+        """
+        Routes the forward passes of concurrent callers through a
+        micro-batcher, so simultaneous requests share one forward pass.
+        
+        Callers detect and crop their face in their own thread and only queue
+        the prepared face, so detection is never serialized behind the batch.
+        
+        Args:
+            max_batch_size: Maximum number of faces per forward pass
+            max_wait_ms: Maximum time a face waits for others to join its batch
+        
+        Returns:
+            MicroBatcher: The batcher (exposes stats())
+        """
+        if self.batcher is not None:
+            self.batcher.close()
+        self.batcher = MicroBatcher(
+            self._embed_faces,
+            max_batch_size=max_batch_size,
+            max_wait_ms=max_wait_ms,
+            name=f"embeddings-{self.model_name}",
+            # One batch in flight per inference worker
+            max_concurrent_batches=self.inference_pool.workers if self.inference_pool else 1
+        )
+        return self.batcher
+    
+    def represent(self, image: np.ndarray) -> np.ndarray:
+        """
+        Detects the face in a decoded image and computes its embedding.
+        
+        Args:
+            image: Decoded BGR image
+        
+        Returns:
+            np.ndarray: The face embedding (float32 vector)
+        
+        Raises:
+            ValueError: If no face can be detected in the image
+        """
+        return self.represent_with_info(image)[0]
+    
+    def represent_with_info(
+        self,
+        image: np.ndarray,
+        image_quality: Optional[Dict[str, Any]] = None
+    ) -> Tuple[np.ndarray, Dict[str, Any]]:
+        """
+        Detects the face in a decoded image and computes its embedding,
+        returning the detection info (backend, latency_ms, scale, faces) too.
+        
+        Detection runs in the calling thread; the embedding goes through
+        embed_face(). Detection time goes to the face_detection stage metric.
+        
+        Args:
+            image: Decoded BGR image
+            image_quality: check_live_image() scores when the image is a live
+                           selfie; the face is then quality-gated as well
+                           (None = stored photo, never gated)
+        
+        Returns:
+            tuple: (face embedding, detection info)
+        
+        Raises:
+            ValueError: If no face can be detected in the image
+            FaceQualityError: If the quality gate rejects a live selfie's face
+            DeadlineExceeded: If the request's deadline has passed
+        """
+        face, info = self.detect_face(image, image_quality)
+        return self.embed_face(face), info
+    
+    def detect_face(
+        self,
+        image: np.ndarray,
+        image_quality: Optional[Dict[str, Any]] = None
+    ) -> Tuple[np.ndarray, Dict[str, Any]]:
+        """
+        Detects and crops the face in a decoded image, in the calling thread.
+        The crop can be embedded with embed_face() by any FaceVerifier that
+        shares this one's detector settings.
+        
+        Args:
+            image: Decoded BGR image
+            image_quality: check_live_image() scores for a live selfie (see
+                           represent_with_info)
+        
+        Returns:
+            tuple: (face crop, detection info)
+        
+        Raises:
+            ValueError: If no face can be detected in the image
+            FaceQualityError: If the quality gate rejects a live selfie's face
+            DeadlineExceeded: If the request's deadline has passed
+        """
+        check_deadline("face_detection")
+        start = time.perf_counter()
+        face, info = self._detect_face(image, image_quality)
+        observe("face_detection", time.perf_counter() - start, start)
+        return face, info
+    
+    def embed_face(self, face: np.ndarray) -> np.ndarray:
+        """
+        Computes the embedding of a detected face crop.
+        
+        Goes through the micro-batcher when batching is enabled, so only the
+        forward pass is shared with concurrent callers. Work for a request
+        whose deadline has passed is dropped, before it is queued or while
+        it waits for its batch. Preparation, batch wait and forward pass go
+        to the embedding stage metric.
+        
+        Args:
+            face: Face crop, as returned by crop_face
+        
+        Returns:
+            np.ndarray: The face embedding (float32 vector)
+        
+        Raises:
+            DeadlineExceeded: If the request's deadline has passed
+        """
+        check_deadline("face_embedding")
+        with self._pending_lock:
+            self.pending += 1
+        start = time.perf_counter()
+        try:
+            prepared = self._prepare_face(face)
+            if self.batcher is not None:
+                embedding = self.batcher.submit(prepared).result()
+            else:
+                embedding = self._embed_faces([prepared])[0]
+            observe("embedding", time.perf_counter() - start, start)
+            return embedding
+        finally:
+            with self._pending_lock:
+                self.pending -= 1
+    
+    @staticmethod
+    @timed("distance")
+    def cosine_distance(embedding_a: np.ndarray, embedding_b: np.ndarray) -> float:
+        """
+        Calculates the cosine distance between two embeddings.
+        
+        This is the same metric DeepFace.verify uses by default, so the
+        MODEL_THRESHOLDS values apply unchanged.
+        
+        Args:
+            embedding_a: First embedding vector
+            embedding_b: Second embedding vector
+        
+        Returns:
+            float: Cosine distance (0 = identical direction)
+        """
+        denom = np.linalg.norm(embedding_a) * np.linalg.norm(embedding_b)
+        if denom == 0:
+            return 1.0
+        return float(1.0 - np.dot(embedding_a, embedding_b) / denom)
+    
+    def _profile_embedding(self, profile_image: ImageInput) -> Tuple[Optional[np.ndarray], bool]:
+        """
+        Returns the profile photo embedding, using the embedding cache if configured.
+        
+        Args:
+            profile_image: Profile photo (path, encoded bytes or BGR array)
+        
+        Returns:
+            tuple: (embedding or None if the image could not be decoded, cache hit flag)
+        
+        Raises:
+            FileNotFoundError: If a path is given and the file does not exist
+            ValueError: If no face can be detected in the profile photo
+        """
+        if isinstance(profile_image, str):
+            # Read the file once so the same bytes are hashed and decoded
+            if not os.path.exists(profile_image):
+                raise FileNotFoundError(profile_image)
+            with open(profile_image, "rb") as f:
+                profile_image = f.read()
+        
+        cache_key = None
+        if self.embedding_cache is not None:
+            cache_key = EmbeddingCache.make_key(profile_image, self.model_name, **self.cache_settings())
+            cached = self.embedding_cache.get(cache_key)
+            if cached is not None:
+                logger.info("Profile embedding served from cache")
+                return cached, True
+        
+        profile_img = decode_image(profile_image, self.decode_max_side)
+        if profile_img is None:
+            return None, False
+        
+        embedding = self.represent(profile_img)
+        if cache_key is not None:
+            self.embedding_cache.put(cache_key, embedding)
+        return embedding, False
+    
+    @profiled("preprocess_document")
     def preprocess_document(self, image_path: str) -> str:
         """
         Pre-processes a document image by finding and correcting its perspective.
@@ -201,8 +1333,8 @@ class FaceVerifier:
         try:
             logger.info("Pre-processing document: %s", os.path.basename(image_path))
             
-            # Read the image
-            image = cv2.imread(image_path)
+            # Read the image (reduced JPEG decode, EXIF orientation applied)
+            image = load_image(image_path, max_side=self.DOCUMENT_MAX_SIDE)
             if image is None:
                 logger.error("Could not read document image: %s", image_path)
                 return image_path  # Return original path as fallback
@@ -284,16 +1416,28 @@ class FaceVerifier:
             logger.error("Error during document pre-processing: %s", str(e))
             return image_path  # Return original path as fallback
     
-    def verify_identity(self, selfie_path: str, profile_image_path: str, preprocess: bool = False) -> Dict[str, Any]:
+    @profiled("verify_identity")
+    def verify_identity(
+        self,
+        selfie: ImageInput,
+        profile_image: ImageInput,
+        preprocess: bool = False
+    ) -> Dict[str, Any]:
         """
         Verifies if the face in the selfie matches the face in the profile photo.
         
         This method compares a live selfie against a stored user profile photo.
         Profile photos are already face-aligned and should NEVER be preprocessed.
         
+        Both images may be given as file paths, raw encoded bytes (straight from
+        an upload) or already-decoded BGR arrays. Each image is decoded exactly
+        once and handed to DeepFace as an array - nothing is written to disk.
+        When an embedding cache is configured, a profile photo seen before is
+        not decoded or embedded again; only the selfie runs through the network.
+        
         Args:
-            selfie_path: Path to the live selfie image
-            profile_image_path: Path to the user profile photo (from database)
+            selfie: Live selfie image (path, encoded bytes or BGR array)
+            profile_image: User profile photo (path, encoded bytes or BGR array)
             preprocess: Document preprocessing flag (always False for profiles)
         
         Returns:
@@ -305,23 +1449,25 @@ class FaceVerifier:
                 - confidence (float): Match confidence percentage
                 - match_quality (str): Quality rating (Excellent/Good/Fair/Poor/No Match)
                 - model (str): Model used for verification
+                - profile_embedding_cached (bool): Whether the profile embedding came from cache
+                - detection (dict): Selfie face detection backend, latency_ms,
+                  downscale factor and number of faces found
                 - error (str|None): Error message if verification failed
         
         Example:
             >>> verifier = FaceVerifier()
-            >>> result = verifier.verify_identity("selfie.jpg", "profile.jpg")
+            >>> with open("selfie.jpg", "rb") as f:
+            ...     result = verifier.verify_identity(f.read(), "profile.jpg")
             >>> if result["verified"]:
             ...     print(f"Match! Confidence: {result['confidence']}%")
         """
-        if not DEEPFACE_AVAILABLE:
+        if not self.backend_available():
             return {
                 "success": False,
                 "verified": False,
                 "error": "DeepFace is not installed. Please install with: pip install deepface"
             }
         
-        processed_profile_path = None
-        
         try:
             # CRITICAL: Profile-based verification NEVER uses document preprocessing
             # Profile photos are already face-aligned from user registration
@@ -329,128 +1475,230 @@ class FaceVerifier:
                 logger.warning("⚠️ Preprocessing requested but DISABLED for profile-based verification")
             preprocess = False
             
-            # Validate input files exist
-            if not os.path.exists(selfie_path):
-                return {
-                    "success": False,
-                    "verified": False,
-                    "error": f"Selfie not found: {selfie_path}"
-                }
-            
-            if not os.path.exists(profile_image_path):
-                return {
-                    "success": False,
-                    "verified": False,
-                    "error": f"Profile image not found: {profile_image_path}"
-                }
-            
-            # Validate and re-encode selfie image (fixes potential format issues from mobile camera)
+            # Decode the selfie once (fixes potential format issues from mobile camera)
             try:
-                logger.info("Validating selfie image: %s", os.path.basename(selfie_path))
-                selfie_img = cv2.imread(selfie_path)
-                if selfie_img is None:
-                    return {
-                        "success": False,
-                        "verified": False,
-                        "error": "Could not read selfie image. The file may be corrupted."
-                    }
-                
-                # Re-encode the image to ensure it's in a proper format
-                # Use absolute path to ensure DeepFace can access it
-                temp_selfie_path = os.path.abspath(os.path.join(self.temp_dir, "validated_selfie.jpg"))
-                cv2.imwrite(temp_selfie_path, selfie_img, [cv2.IMWRITE_JPEG_QUALITY, 95])
-                selfie_path = temp_selfie_path
-                logger.info("Selfie validated and re-encoded successfully to: %s", selfie_path)
-            except Exception as e:
-                logger.error("Error validating selfie: %s", str(e))
+                selfie_img = decode_image(selfie, self.decode_max_side)
+            except FileNotFoundError as e:
+                return {"success": False, "verified": False, "error": f"Selfie not found: {e}"}
+            if selfie_img is None:
                 return {
                     "success": False,
                     "verified": False,
-                    "error": f"Failed to validate selfie image: {str(e)}"
+                    "error": "Could not read selfie image. The file may be corrupted."
                 }
             
-            # Validate and re-encode profile image
+            # A dark or overexposed selfie is rejected before the profile is embedded
+            image_quality = self.check_live_image(selfie_img)
+            
+            # The profile photo only reaches the network on a cache miss
             try:
-                logger.info("Validating profile image: %s", os.path.basename(profile_image_path))
-                profile_img = cv2.imread(profile_image_path)
-                if profile_img is None:
-                    return {
-                        "success": False,
-                        "verified": False,
-                        "error": "Could not read profile image. The file may be corrupted."
-                    }
-                
-                # Re-encode to ensure proper format
-                # Use absolute path to ensure DeepFace can access it
-                temp_profile_path = os.path.abspath(os.path.join(self.temp_dir, "validated_profile.jpg"))
-                cv2.imwrite(temp_profile_path, profile_img, [cv2.IMWRITE_JPEG_QUALITY, 95])
-                profile_image_path = temp_profile_path
-                logger.info("Profile image validated and re-encoded successfully to: %s", profile_image_path)
-            except Exception as e:
-                logger.error("Error validating profile image: %s", str(e))
+                profile_embedding, profile_cached = self._profile_embedding(profile_image)
+            except FileNotFoundError as e:
+                return {"success": False, "verified": False, "error": f"Profile image not found: {e}"}
+            if profile_embedding is None:
                 return {
                     "success": False,
                     "verified": False,
-                    "error": f"Failed to validate profile image: {str(e)}"
+                    "error": "Could not read profile image. The file may be corrupted."
                 }
             
-            # Use validated profile image directly (no preprocessing)
-            logger.info("Using original profile image (preprocessing disabled)")
-            processed_profile_path = profile_image_path
+            logger.info("Comparing faces: selfie %sx%s vs profile embedding (%s)",
+                       selfie_img.shape[1], selfie_img.shape[0],
+                       "cached" if profile_cached else "computed")
             
-            logger.info("Comparing faces: %s vs %s", 
-                       os.path.basename(selfie_path), 
-                       os.path.basename(processed_profile_path))
-            
-            # Perform face verification using DeepFace
             # Model weights are cached by DeepFace in ~/.deepface/weights/
-            result = DeepFace.verify(
-                img1_path=selfie_path,
-                img2_path=processed_profile_path,
-                model_name=self.model_name,
-                enforce_detection=True
-            )
-            
-            # Use our optimized auto-threshold instead of DeepFace default
-            distance = round(result["distance"], 4)
-            is_verified = distance <= self.threshold
-            confidence = self.calculate_confidence(distance)
-            match_quality = self.get_match_quality(distance)
-            
-            verification_result = {
-                "success": True,
-                "verified": is_verified,
-                "distance": distance,
-                "threshold": self.threshold,
-                "threshold_mode": self.threshold_mode,
-                "confidence": confidence,
-                "match_quality": match_quality,
-                "model": self.model_name,
-                "error": None
-            }
+            selfie_embedding, detection = self.represent_with_info(selfie_img, image_quality)
             
-            if verification_result["verified"]:
-                logger.info("✅ Face verification PASSED (distance: %.4f, confidence: %.2f%%)", 
-                           distance, confidence)
-            else:
-                logger.warning("❌ Face verification FAILED (distance: %.4f, confidence: %.2f%%)", 
-                              distance, confidence)
-            
-            return verification_result
+            distance = self.cosine_distance(selfie_embedding, profile_embedding)
+            return self._build_result(distance, profile_embedding_cached=profile_cached, detection=detection)
             
         except ValueError as e:
-            # This typically happens when a face cannot be detected
-            error_msg = str(e)
-            if "face" in error_msg.lower() and "detect" in error_msg.lower():
-                error_msg = "Could not detect a face in one or both images. Please use clearer photos."
+            return self._detection_error(e)
             
-            logger.error("Face verification error: %s", error_msg)
+        except Exception as e:
+            logger.error("Unexpected error during face verification: %s", str(e))
             return {
                 "success": False,
                 "verified": False,
+                "error": f"Verification failed: {str(e)}"
+            }
+    
+    def _build_result(self, distance: float, **extra: Any) -> Dict[str, Any]:
+        """
+        Turns an embedding distance into the standard verification result.
+        
+        Args:
+            distance: Cosine distance between the selfie and the reference face
+            **extra: Additional fields to include in the result
+        
+        Returns:
+            dict: Verification result (see verify_identity)
+        """
+        # Use our optimized auto-threshold instead of DeepFace default
+        distance = round(distance, 4)
+        is_verified = distance <= self.threshold
+        confidence = self.calculate_confidence(distance)
+        match_quality = self.get_match_quality(distance)
+        
+        verification_result = {
+            "success": True,
+            "verified": is_verified,
+            "distance": distance,
+            "threshold": self.threshold,
+            "threshold_mode": self.threshold_mode,
+            "confidence": confidence,
+            "match_quality": match_quality,
+            "model": self.model_name,
+            **extra,
+            "error": None
+        }
+        
+        if verification_result["verified"]:
+            logger.info("✅ Face verification PASSED (distance: %.4f, confidence: %.2f%%)", 
+                       distance, confidence)
+        else:
+            logger.warning("❌ Face verification FAILED (distance: %.4f, confidence: %.2f%%)", 
+                          distance, confidence)
+        
+        return verification_result
+    
+    @staticmethod
+    def _detection_error(error: ValueError) -> Dict[str, Any]:
+        """
+        Converts a DeepFace ValueError into a failed verification result.
+        
+        Args:
+            error: The raised error (typically "Face could not be detected")
+        
+        Returns:
+            dict: Failed verification result with a user-friendly message
+        """
+        error_msg = str(error)
+        if isinstance(error, FaceQualityError):
+            logger.warning("Face quality gate rejected image (%s): %s", error.reason, error_msg)
+            return {
+                "success": False,
+                "verified": False,
+                "quality_reason": error.reason,
                 "error": error_msg
             }
+        
+        if "face" in error_msg.lower() and "detect" in error_msg.lower():
+            error_msg = "Could not detect a face in one or both images. Please use clearer photos."
+        
+        logger.error("Face verification error: %s", error_msg)
+        return {
+            "success": False,
+            "verified": False,
+            "error": error_msg
+        }
+    
+    def enroll_student(
+        self,
+        student_id: str,
+        image: ImageInput,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Computes a student's face template once and stores it in the gallery.
+        
+        Args:
+            student_id: The student's unique identifier
+            image: Enrollment photo (path, encoded bytes or BGR array)
+            metadata: Optional student fields to store (name, roll_number, ...)
+        
+        Returns:
+            dict: Enrollment result containing:
+                - success (bool): Whether the template was stored
+                - student_id (str): The enrolled student
+                - model (str): Model the template was computed with
+                - error (str|None): Error message if enrollment failed
+        """
+        if self.gallery is None:
+            return {"success": False, "student_id": student_id, "error": "No face gallery configured"}
+        
+        if not self.backend_available():
+            return {
+                "success": False,
+                "student_id": student_id,
+                "error": "DeepFace is not installed. Please install with: pip install deepface"
+            }
+        
+        try:
+            img = decode_image(image, self.decode_max_side)
+            if img is None:
+                return {
+                    "success": False,
+                    "student_id": student_id,
+                    "error": "Could not read enrollment image. The file may be corrupted."
+                }
+            
+            embedding = self.represent(img)
+            self.gallery.enroll(student_id, self.model_name, embedding, metadata)
+            if self.face_index is not None:
+                self.face_index.add([student_id], embedding[np.newaxis])
+            return {"success": True, "student_id": student_id, "model": self.model_name, "error": None}
             
+        except FileNotFoundError as e:
+            return {"success": False, "student_id": student_id, "error": f"Enrollment image not found: {e}"}
+        
+        except ValueError as e:
+            return {"student_id": student_id, **self._detection_error(e)}
+        
+        except Exception as e:
+            logger.error("Unexpected error during enrollment of %s: %s", student_id, str(e))
+            return {"success": False, "student_id": student_id, "error": f"Enrollment failed: {str(e)}"}
+    
+    @profiled("verify_enrolled")
+    def verify_enrolled(self, selfie: ImageInput, student_id: str) -> Dict[str, Any]:
+        """
+        Verifies a live selfie against a student's enrolled template.
+        
+        Only the selfie is decoded and embedded; the reference embedding comes
+        from the gallery, so no profile photo has to be uploaded.
+        
+        Args:
+            selfie: Live selfie image (path, encoded bytes or BGR array)
+            student_id: The enrolled student's identifier
+        
+        Returns:
+            dict: Verification result (see verify_identity), plus student_id
+        """
+        if not self.backend_available():
+            return {
+                "success": False,
+                "verified": False,
+                "error": "DeepFace is not installed. Please install with: pip install deepface"
+            }
+        
+        reference = self.gallery.get_embedding(student_id, self.model_name) if self.gallery else None
+        if reference is None:
+            return {
+                "success": False,
+                "verified": False,
+                "student_id": student_id,
+                "error": f"Student {student_id} is not enrolled for model {self.model_name}"
+            }
+        
+        try:
+            selfie_img = decode_image(selfie, self.decode_max_side)
+            if selfie_img is None:
+                return {
+                    "success": False,
+                    "verified": False,
+                    "error": "Could not read selfie image. The file may be corrupted."
+                }
+            
+            selfie_embedding, detection = self.represent_with_info(selfie_img, self.check_live_image(selfie_img))
+            distance = self.cosine_distance(selfie_embedding, reference)
+            return self._build_result(distance, student_id=student_id, detection=detection)
+            
+        except FileNotFoundError as e:
+            return {"success": False, "verified": False, "error": f"Selfie not found: {e}"}
+        
+        except ValueError as e:
+            return self._detection_error(e)
+        
         except Exception as e:
             logger.error("Unexpected error during face verification: %s", str(e))
             return {
@@ -458,16 +1706,26 @@ class FaceVerifier:
                 "verified": False,
                 "error": f"Verification failed: {str(e)}"
             }
+    
+    @staticmethod
+    def eye_aspect_ratios(eye_points: np.ndarray) -> np.ndarray:
+        """
+        Vectorized Eye Aspect Ratio over any number of eyes (and frames).
         
-        finally:
-            # Cleanup: Remove processed images if created
-            if processed_profile_path and processed_profile_path != profile_image_path:
-                if os.path.exists(processed_profile_path):
-                    try:
-                        os.remove(processed_profile_path)
-                        logger.debug("Cleaned up processed profile: %s", processed_profile_path)
-                    except Exception:
-                        pass
+        Args:
+            eye_points: Pixel coordinates of the 6 eye landmarks
+                        (p1..p6), shape (..., 6, 2)
+        
+        Returns:
+            np.ndarray: EAR per eye, shape (...); 0.0 where the eye has no width
+        """
+        eye_points = np.asarray(eye_points, dtype=np.float32)
+        # Vertical pairs (p2, p6) and (p3, p5), horizontal pair (p1, p4)
+        vertical = np.linalg.norm(eye_points[..., [1, 2], :] - eye_points[..., [5, 4], :], axis=-1).sum(axis=-1)
+        horizontal = np.linalg.norm(eye_points[..., 0, :] - eye_points[..., 3, :], axis=-1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ear = vertical / (2.0 * horizontal)
+        return np.where(horizontal > 0, ear, 0.0)
     
     @staticmethod
     def calculate_ear(eye_landmarks: list, frame_shape: Tuple[int, int]) -> float:
@@ -488,26 +1746,11 @@ class FaceVerifier:
         Returns:
             float: The Eye Aspect Ratio (0.0 to ~0.4)
         """
-        def get_coords(landmark):
-            return int(landmark.x * frame_shape[1]), int(landmark.y * frame_shape[0])
-        
-        # Get coordinates for all 6 landmarks
-        p1, p2, p3, p4, p5, p6 = [get_coords(lm) for lm in eye_landmarks]
-        
-        # Calculate vertical distances
-        dist_vertical_1 = math.hypot(p2[0] - p6[0], p2[1] - p6[1])
-        dist_vertical_2 = math.hypot(p3[0] - p5[0], p3[1] - p5[1])
-        
-        # Calculate horizontal distance
-        dist_horizontal = math.hypot(p1[0] - p4[0], p1[1] - p4[1])
-        
-        if dist_horizontal == 0:
-            return 0.0
-        
-        # EAR = (vertical_1 + vertical_2) / (2 * horizontal)
-        ear = (dist_vertical_1 + dist_vertical_2) / (2.0 * dist_horizontal)
-        return ear
+        points = np.array([(lm.x, lm.y) for lm in eye_landmarks], dtype=np.float32)
+        points *= (frame_shape[1], frame_shape[0])
+        return float(FaceVerifier.eye_aspect_ratios(points))
     
+    @timed("cleanup")
     def cleanup_temp_files(self) -> int:
         """
         Removes all temporary files created during verification.
@@ -529,47 +1772,17 @@ class FaceVerifier:
         return removed_count
 
 
-# Dummy data for testing (will be replaced with MongoDB later)
-DUMMY_STUDENTS = {
-    "student_001": {
-        "name": "Rahul Kumar",
-        "roll_number": "CS2024001",
-        "class": "12-A",
-        "selfie_on_file": "rahul_selfie.jpg"
-    },
-    "student_002": {
-        "name": "Priya Singh",
-        "roll_number": "CS2024002", 
-        "class": "12-A",
-        "selfie_on_file": "priya_selfie.jpg"
-    }
-}
-
-
-def get_dummy_student(student_id: str) -> Optional[Dict[str, Any]]:
-    """
-    Retrieves dummy student data for testing.
-    
-    Args:
-        student_id: The student's unique identifier
-    
-    Returns:
-        dict: Student data or None if not found
-    """
-    return DUMMY_STUDENTS.get(student_id)
-
-
 # Module test
 if __name__ == "__main__":
     print("--- Face Verification Service Module Test ---\n")
     
     verifier = FaceVerifier()
     
-    print(f"DeepFace available: {DEEPFACE_AVAILABLE}")
-    print(f"MediaPipe available: {MEDIAPIPE_AVAILABLE}")
+    print(f"DeepFace available: {deepface_available()}")
+    print(f"MediaPipe available: {module_available('mediapipe')}")
     print(f"Model: {verifier.model_name}")
     print(f"Temp directory: {verifier.temp_dir}")
     
     # Note: Actual face verification requires real image files
     print("\nTo test face verification, run:")
-    print('  result = verifier.verify_identity("selfie.jpg", "id_card.jpg")')
+    print('  result = verifier.verify_identity("selfie.jpg", "profile.jpg")')
@@ -14,6 +14,8 @@ import requests
 from geopy.distance import geodesic
 from typing import Dict, Any, Optional, Tuple
 
+from .metrics import timed
+
 # Configure module-level logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -145,7 +147,8 @@ class GPSManager:
             student_coords = (student_lat, student_lon)
             
             # Calculate geodesic distance (accounts for Earth's curvature)
-            distance_meters = geodesic(teacher_coords, student_coords).meters
+            with timed("gps_geodesic"):
+                distance_meters = geodesic(teacher_coords, student_coords).meters
             
             # Round to 2 decimal places for cleaner output
             distance_meters = round(distance_meters, 2)
@@ -0,0 +1,233 @@
+"""
+Image Loader Module
+====================
+Shared image decoding for face verification, document pre-processing and OCR.
+
+Mobile uploads are 12 MP JPEGs, while face detection and OCR need a
+fraction of that. Decoding at full size and resizing afterwards costs CPU
+and tens of MB per request. This module provides:
+- Reduced-resolution JPEG decoding (IMREAD_REDUCED_COLOR_2/4/8), picking
+  the largest reduction that still covers the caller's target size
+- EXIF orientation applied the same way for every format and source
+- JPEG, PNG and WebP through OpenCV; HEIC/HEIF (with pillow-heif) and
+  other Pillow formats as a fallback
+- A pixel-count limit checked from the header, before anything is decoded
+"""
+
+import io
+import os
+import logging
+from typing import Optional, Tuple, Union
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from .lazy_imports import optional_import
+from .metrics import timed
+
+# Configure module-level logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Images above this many pixels are rejected before decoding (a 12 MP phone
+# photo is far below; a decompression bomb is far above)
+MAX_PIXELS = int(os.getenv("IMAGE_MAX_PIXELS", "50000000"))
+
+# (reduction factor, OpenCV decode flag), largest reduction first
+_REDUCED_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+
+# EXIF orientation tag value -> operations turning the stored pixels upright
+_EXIF_ORIENTATION = {
+    2: (None, True),
+    3: (cv2.ROTATE_180, False),
+    4: (cv2.ROTATE_180, True),
+    5: (cv2.ROTATE_90_COUNTERCLOCKWISE, True),
+    6: (cv2.ROTATE_90_CLOCKWISE, False),
+    7: (cv2.ROTATE_90_CLOCKWISE, True),
+    8: (cv2.ROTATE_90_COUNTERCLOCKWISE, False),
+}
+
+_EXIF_ORIENTATION_TAG = 0x0112
+
+ImageSource = Union[str, bytes, bytearray, memoryview]
+
+_heif_registered = False
+
+
+class ImageTooLargeError(ValueError):
+    """Raised when an image has more pixels than the configured limit."""
+
+
+def _register_heif() -> bool:
+    """Registers the HEIC/HEIF Pillow plugin once, if pillow-heif is installed."""
+    global _heif_registered
+    if not _heif_registered:
+        pillow_heif = optional_import("pillow_heif")
+        if pillow_heif is None:
+            return False
+        pillow_heif.register_heif_opener()
+        _heif_registered = True
+    return True
+
+
+def probe(data: Union[bytes, memoryview]) -> Optional[Tuple[str, int, int, int]]:
+    """
+    Reads format, size and EXIF orientation from the image header.
+
+    Pillow parses only the header here; no pixels are decoded.
+
+    Args:
+        data: Encoded image bytes
+
+    Returns:
+        tuple: (format, width, height, EXIF orientation), or None if the
+               format is not recognised
+
+    Raises:
+        ImageTooLargeError: If Pillow's own decompression-bomb guard trips
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            orientation = 1
+            if img.format in ("JPEG", "WEBP", "PNG", "HEIF", "TIFF"):
+                orientation = img.getexif().get(_EXIF_ORIENTATION_TAG, 1)
+            return img.format, img.width, img.height, orientation
+    except Image.DecompressionBombError as e:
+        raise ImageTooLargeError(str(e))
+    except Exception:
+        return None
+
+
+def reduction_for(width: int, height: int, max_side: Optional[int]) -> Tuple[int, int]:
+    """
+    Picks the largest JPEG decode reduction that keeps the longest side at
+    or above max_side.
+
+    Args:
+        width: Stored image width
+        height: Stored image height
+        max_side: Longest side the caller needs (None = full resolution)
+
+    Returns:
+        tuple: (reduction factor, OpenCV decode flag)
+    """
+    if max_side:
+        for factor, flag in _REDUCED_FLAGS:
+            if max(width, height) // factor >= max_side:
+                return factor, flag
+    return 1, cv2.IMREAD_COLOR
+
+
+def apply_orientation(image: np.ndarray, orientation: int) -> np.ndarray:
+    """Rotates/mirrors decoded pixels according to an EXIF orientation value."""
+    rotation, mirror = _EXIF_ORIENTATION.get(orientation, (None, False))
+    if mirror:
+        image = cv2.flip(image, 1)
+    if rotation is not None:
+        image = cv2.rotate(image, rotation)
+    return image
+
+
+def _decode_with_pillow(data: Union[bytes, memoryview], max_side: Optional[int]) -> Optional[np.ndarray]:
+    """Fallback for formats OpenCV cannot read (HEIC/HEIF, ...)."""
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            if max_side and max(img.size) > max_side:
+                # For JPEG, draft() decodes at a reduced DCT scale, like IMREAD_REDUCED_*
+                img.draft("RGB", (max_side, max_side))
+            rgb = np.asarray(img.convert("RGB"))
+    except Exception:
+        return None
+    return cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)
+
+
+@timed("decode")
+def load_image(
+    source: ImageSource,
+    max_side: Optional[int] = None,
+    max_pixels: Optional[int] = None
+) -> Optional[np.ndarray]:
+    """
+    Decodes an image file or buffer into an upright BGR array.
+
+    JPEGs are decoded at the largest reduction (1/2, 1/4, 1/8) whose longest
+    side is still at least max_side; other formats are decoded at full size.
+    The result is not resized further, so it may be larger than max_side.
+
+    Args:
+        source: File path, or encoded image bytes / memoryview
+        max_side: Longest side the caller needs (None = full resolution)
+        max_pixels: Pixel limit checked before decoding
+                    (None = IMAGE_MAX_PIXELS, 0 = no limit)
+
+    Returns:
+        np.ndarray: The decoded BGR image, or None if it could not be decoded
+
+    Raises:
+        FileNotFoundError: If a path is given and the file does not exist
+        ImageTooLargeError: If the image has more than max_pixels pixels
+    """
+    if isinstance(source, str):
+        if not os.path.exists(source):
+            raise FileNotFoundError(source)
+        with open(source, "rb") as f:
+            data = f.read()
+    else:
+        data = source
+    if not len(data):
+        return None
+
+    header = probe(data)
+    if header is None and _register_heif():
+        # Pillow only recognises HEIC once the plugin is registered
+        header = probe(data)
+    if header is None:
+        # Unknown to Pillow: let OpenCV try, without size checks
+        buffer = np.frombuffer(data, dtype=np.uint8)
+        return cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+
+    image_format, width, height, orientation = header
+    max_pixels = MAX_PIXELS if max_pixels is None else max_pixels
+    if max_pixels and width * height > max_pixels:
+        raise ImageTooLargeError(
+            f"Image is too large ({width}x{height}, {width * height / 1e6:.1f} MP; "
+            f"limit {max_pixels / 1e6:.1f} MP)")
+
+    image = None
+    if image_format in ("JPEG", "PNG", "WEBP", "BMP", "TIFF"):
+        _, flag = reduction_for(width, height, max_side) if image_format == "JPEG" else (1, cv2.IMREAD_COLOR)
+        buffer = np.frombuffer(data, dtype=np.uint8)
+        image = cv2.imdecode(buffer, flag | cv2.IMREAD_IGNORE_ORIENTATION)
+    if image is None:
+        image = _decode_with_pillow(data, max_side)
+    if image is None:
+        return None
+
+    return apply_orientation(image, orientation)
+
+
+def encode_jpeg(image: np.ndarray, max_side: Optional[int] = None, quality: int = 90) -> bytes:
+    """
+    Encodes a BGR image as JPEG, downscaling it to max_side first.
+
+    Args:
+        image: Decoded BGR image
+        max_side: Longest side of the encoded image (None = keep size)
+        quality: JPEG quality (0-100)
+
+    Returns:
+        bytes: The encoded JPEG
+    """
+    h, w = image.shape[:2]
+    if max_side and max(h, w) > max_side:
+        scale = max_side / max(h, w)
+        image = cv2.resize(image, (max(1, round(w * scale)), max(1, round(h * scale))), interpolation=cv2.INTER_AREA)
+    ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise ValueError("Could not encode image as JPEG")
+    return encoded.tobytes()
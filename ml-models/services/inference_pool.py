@@ -0,0 +1,377 @@
+"""
+Inference Pool Module
+======================
+Runs face embedding in a pool of worker processes.
+
+A DeepFace forward pass holds the GIL-bound Python side of TensorFlow for
+hundreds of milliseconds, so running it inside the API process starves the
+event loop and caps throughput at one core. This module provides:
+- A process pool whose workers each build and warm up the model once
+- A pinned TensorFlow/OpenMP thread budget per worker
+- Forward passes over batches of faces detected and prepared in the API
+  process, and whole group photos (detection included)
+- Zero-copy hand-off of face batches and images through shared memory
+- Request deadlines enforced in the worker, when a task is dequeued, and in
+  the caller, which stops waiting (and cancels the task if it has not
+  started) once the budget runs out
+"""
+
+import os
+import time
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from multiprocessing import shared_memory
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+from .deadline import DeadlineExceeded, check_deadline, record_drop, remaining_budget
+
+# Configure module-level logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# (shared memory block name, shape, dtype string) describing one array
+ImageSpec = Tuple[str, Tuple[int, ...], str]
+
+# Per-process state, set by _init_worker inside each worker
+_worker_verifier = None
+
+
+def _init_worker(model_name: str, detector_backend: str, detection_max_side: Optional[int],
+                 embedding_config: Optional[Dict[str, Any]], threads: int, ready_counter) -> None:
+    """
+    Worker process initializer: pins the thread budget, builds and warms up the model.
+
+    Thread limits must be set through the environment before TensorFlow is
+    imported for the first time in this process.
+    """
+    global _worker_verifier
+
+    for var in ("OMP_NUM_THREADS", "TF_NUM_INTRAOP_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    os.environ["TF_NUM_INTEROP_THREADS"] = "1"
+
+    import cv2
+    from services.face_service import FaceVerifier
+
+    embedding_config = dict(embedding_config or {})
+    cv2.setNumThreads(threads)
+    if embedding_config.get("embedding_backend", "deepface") == "deepface":
+        try:
+            import tensorflow as tf
+            tf.config.threading.set_intra_op_parallelism_threads(threads)
+            tf.config.threading.set_inter_op_parallelism_threads(1)
+        except Exception as e:
+            logger.warning("Could not pin TensorFlow threads in worker %d: %s", os.getpid(), str(e))
+    else:
+        embedding_config["onnx_threads"] = threads
+
+    _worker_verifier = FaceVerifier(
+        model_name=model_name,
+        detector_backend=detector_backend,
+        detection_max_side=detection_max_side,
+        **embedding_config
+    )
+    warm = _worker_verifier.warm_up()
+    if not warm["success"]:
+        # Fails the executor, and with it InferencePool.start()
+        raise RuntimeError(f"Worker {os.getpid()} could not load {model_name}: {warm['error']}")
+
+    with ready_counter.get_lock():
+        ready_counter.value += 1
+
+
+def _worker_call(expires_at: Optional[float], fn, *args) -> Any:
+    """
+    Runs a task unless its request's deadline (Unix time) passed while it
+    was queued for a worker (runs in a worker).
+    """
+    if expires_at is not None and time.time() >= expires_at:
+        raise DeadlineExceeded("inference_worker")
+    return fn(*args)
+
+
+def _worker_input_size() -> Tuple[int, int]:
+    """(height, width) the worker's model expects (runs in a worker)."""
+    return _worker_verifier._model_input_size()
+
+
+def _worker_embed_faces(spec: ImageSpec) -> np.ndarray:
+    """Runs one forward pass over prepared faces in shared memory (runs in a worker)."""
+    name, shape, dtype = spec
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        faces = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+        embeddings = _worker_verifier._forward(faces)
+        # Drop the view before closing the block it points into
+        del faces
+        return embeddings
+    finally:
+        try:
+            block.close()
+        except BufferError:
+            pass
+
+
+def _worker_represent_all_faces(spec: ImageSpec) -> Tuple[np.ndarray, List[Dict[str, int]]]:
+    """Embeds every face in one shared-memory image (runs in a worker)."""
+    name, shape, dtype = spec
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        image = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+        result = _worker_verifier.represent_all_faces(image)
+        del image
+        return result
+    finally:
+        try:
+            block.close()
+        except BufferError:
+            pass
+
+
+class InferencePool:
+    """
+    Process pool computing face embeddings outside the API process.
+
+    The parent detects and prepares faces, copies a batch of them into a
+    shared memory block and sends only the block name to a worker.
+    Embeddings (a few KB each) come back through the normal result pipe.
+
+    Attributes:
+        model_name (str): DeepFace model each worker builds
+        workers (int): Number of worker processes
+        threads_per_worker (int): TensorFlow/OpenMP threads per worker
+    """
+
+    def __init__(
+        self,
+        model_name: str = "VGG-Face",
+        workers: int = 2,
+        threads_per_worker: Optional[int] = None,
+        detector_backend: str = "opencv",
+        detection_max_side: Optional[int] = 640,
+        embedding_config: Optional[Dict[str, Any]] = None
+    ):
+        """
+        Initialize the InferencePool (workers are started by start()).
+
+        Args:
+            model_name: DeepFace model each worker builds
+            workers: Number of worker processes
+            threads_per_worker: Thread budget per worker (None = cores / workers)
+            detector_backend: Face detector backend used by the workers (group photos)
+            detection_max_side: Longest side of the downscaled detection copy
+            embedding_config: FaceVerifier.embedding_config() for the workers (None = DeepFace)
+        """
+        self.model_name = model_name
+        self.workers = max(1, workers)
+        self.threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // self.workers)
+        self.detector_backend = detector_backend
+        self.detection_max_side = detection_max_side
+        self.embedding_config = embedding_config
+
+        # Spawn (not fork) so workers never inherit a half-initialized TensorFlow
+        self._context = multiprocessing.get_context("spawn")
+        self._ready = self._context.Value("i", 0)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._input_size: Optional[Tuple[int, int]] = None
+
+        self._counter_lock = threading.Lock()
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.startup_seconds: Optional[float] = None
+
+        logger.info("InferencePool configured: %d workers x %d threads (%s)",
+                    self.workers, self.threads_per_worker, model_name)
+
+    def start(self, timeout: float = 600.0) -> bool:
+        """
+        Starts the workers and waits until every one has warmed up its model.
+
+        Args:
+            timeout: Seconds to wait for all workers
+
+        Returns:
+            bool: True if all workers became ready in time; False after the
+                  timeout, or as soon as a worker fails to load the model
+        """
+        if self._executor is None:
+            self._ready.value = 0
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=self._context,
+                initializer=_init_worker,
+                initargs=(self.model_name, self.detector_backend, self.detection_max_side,
+                          self.embedding_config, self.threads_per_worker, self._ready)
+            )
+
+        start = time.perf_counter()
+        # A trivial task per worker forces the executor to launch its processes;
+        # if a worker's initializer fails, these fail with BrokenProcessPool
+        priming = [self._executor.submit(os.getpid) for _ in range(self.workers)]
+
+        while self.ready_workers < self.workers:
+            failed = next((f for f in priming if f.done() and f.exception() is not None), None)
+            if failed is not None:
+                logger.error("InferencePool: workers failed to start (%d/%d ready): %s",
+                             self.ready_workers, self.workers, failed.exception())
+                self.shutdown()
+                return False
+            if time.perf_counter() - start > timeout:
+                logger.error("InferencePool: only %d/%d workers ready after %.0fs",
+                             self.ready_workers, self.workers, timeout)
+                return False
+            time.sleep(0.1)
+
+        self.startup_seconds = round(time.perf_counter() - start, 3)
+        logger.info("✅ InferencePool ready: %d workers in %.2fs", self.workers, self.startup_seconds)
+        return True
+
+    @property
+    def ready_workers(self) -> int:
+        """Number of workers that have finished warming up."""
+        return self._ready.value
+
+    @property
+    def ready(self) -> bool:
+        """Whether every worker has its model loaded."""
+        return self._executor is not None and self.ready_workers >= self.workers
+
+    def input_size(self) -> Tuple[int, int]:
+        """(height, width) the workers' model expects, asked from a worker once."""
+        if self._executor is None:
+            raise RuntimeError("InferencePool has not been started")
+        if self._input_size is None:
+            self._input_size = tuple(self._executor.submit(_worker_input_size).result())
+        return self._input_size
+
+    def embed_faces(self, faces: List[np.ndarray]) -> np.ndarray:
+        """
+        Runs one forward pass over prepared faces in a worker process.
+
+        Args:
+            faces: Faces prepared by FaceVerifier._prepare_face, all of the
+                   model's input size
+
+        Returns:
+            np.ndarray: Embeddings, shape (N, D)
+        """
+        if self._executor is None:
+            raise RuntimeError("InferencePool has not been started")
+
+        blocks = []
+        try:
+            spec = self._to_shared_memory(np.stack(faces).astype(np.float32, copy=False), blocks)
+            return self._run(_worker_embed_faces, spec)
+        finally:
+            self._release(blocks)
+
+    def represent_all_faces(self, image: np.ndarray) -> Tuple[np.ndarray, List[Dict[str, int]]]:
+        """
+        Embeds every face in one image (e.g. a group photo) in a worker process.
+
+        Args:
+            image: Decoded BGR image
+
+        Returns:
+            tuple: (embeddings of shape (N, D), facial area dict per face)
+        """
+        if self._executor is None:
+            raise RuntimeError("InferencePool has not been started")
+
+        blocks = []
+        try:
+            spec = self._to_shared_memory(image, blocks)
+            return self._run(_worker_represent_all_faces, spec)
+        finally:
+            self._release(blocks)
+
+    @staticmethod
+    def _to_shared_memory(image: np.ndarray, blocks: list) -> ImageSpec:
+        """Copies an image into a new shared memory block (appended to blocks)."""
+        image = np.ascontiguousarray(image)
+        block = shared_memory.SharedMemory(create=True, size=max(1, image.nbytes))
+        blocks.append(block)
+        np.ndarray(image.shape, dtype=image.dtype, buffer=block.buf)[...] = image
+        return block.name, image.shape, image.dtype.str
+
+    @staticmethod
+    def _release(blocks: list) -> None:
+        """Frees shared memory blocks once the worker is done with them."""
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    def _run(self, fn, *args) -> Any:
+        """
+        Runs a task in a worker and waits for it, keeping counters.
+
+        The task carries the request's deadline: the worker skips it if the
+        deadline passed while it was queued, and the caller waits at most
+        until the deadline, cancelling the task if it has not started yet.
+
+        Raises:
+            DeadlineExceeded: If the request's deadline passes first
+        """
+        check_deadline("inference_pool")
+        budget = remaining_budget()
+        # Workers compare against wall-clock time: the deadline's clock is per-process
+        expires_at = None if budget is None else time.time() + budget
+        with self._counter_lock:
+            self.submitted += 1
+        future = self._executor.submit(_worker_call, expires_at, fn, *args)
+        try:
+            result = future.result(timeout=budget)
+        except DeadlineExceeded as e:
+            self._count_drop(e.stage)
+            raise
+        except FutureTimeoutError:
+            future.cancel()
+            self._count_drop("inference_pool")
+            raise DeadlineExceeded("inference_pool")
+        except Exception:
+            with self._counter_lock:
+                self.failed += 1
+            raise
+        with self._counter_lock:
+            self.completed += 1
+        return result
+
+    def _count_drop(self, stage: str) -> None:
+        """Counts a task dropped for its deadline, here and in the deadline stats."""
+        record_drop(stage)
+        with self._counter_lock:
+            self.dropped += 1
+
+    def shutdown(self) -> None:
+        """Stops the worker processes."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns pool state and counters.
+
+        Returns:
+            dict: Worker counts, thread budget, startup time and task counters
+        """
+        with self._counter_lock:
+            submitted, completed, failed, dropped = self.submitted, self.completed, self.failed, self.dropped
+        return {
+            "model": self.model_name,
+            "workers": self.workers,
+            "ready_workers": self.ready_workers,
+            "threads_per_worker": self.threads_per_worker,
+            "startup_seconds": self.startup_seconds,
+            "tasks_submitted": submitted,
+            "tasks_completed": completed,
+            "tasks_failed": failed,
+            "tasks_dropped": dropped,
+            "in_flight": submitted - completed - failed - dropped
+        }
@@ -0,0 +1,306 @@
+"""
+Job Queue Module
+=================
+In-process asynchronous job queue with a bounded worker pool.
+
+At lecture start hundreds of students mark attendance within a minute,
+and each /attendance/verify call holds an HTTP connection for seconds.
+With the job queue a client submits its attendance and gets a job ID back
+in milliseconds, while a fixed number of workers drain the queue at the
+rate the face pipeline can sustain. This module provides:
+- JobQueue, a FIFO of coroutine jobs run by a configurable number of
+  asyncio workers on the server's event loop
+- Per-job status (queued / running / done / failed / dropped) with the
+  queue position, timestamps and result
+- Request deadlines (see deadline.py) carried into the job: a job whose
+  deadline passes while it is queued is dropped instead of run
+- Result retention for a fixed TTL after a job finishes
+- Backpressure: submit() refuses new jobs once the queue is full, with an
+  estimate of when to retry
+- Status change notifications for WebSocket push
+"""
+
+import time
+import uuid
+import asyncio
+import logging
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+
+from .deadline import current_deadline, deadline_expired, record_drop, reset, set_deadline
+
+# Configure module-level logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(RuntimeError):
+    """Raised when a job is submitted to a full queue; retry_after is in seconds."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Job:
+    """
+    One submitted job.
+
+    Attributes:
+        id (str): Job ID handed to the client
+        seq (int): Submission order
+        status (str): "queued", "running", "done", "failed" or "dropped"
+        result: Return value of the job (when done)
+        error (str): Error message (when failed or dropped)
+        deadline (float): Deadline of the submitting request (monotonic clock)
+    """
+
+    TERMINAL = ("done", "failed", "dropped")
+
+    def __init__(self, seq: int, func: Callable[..., Awaitable], args: tuple, kwargs: dict):
+        self.id = uuid.uuid4().hex
+        self.seq = seq
+        self.status = "queued"
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.submitted_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.deadline = current_deadline()
+        self._call = (func, args, kwargs)
+        self._changed = asyncio.Event()
+
+    def _set_status(self, status: str) -> None:
+        """Updates the status and wakes everything watching this job."""
+        self.status = status
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+
+class JobQueue:
+    """
+    FIFO job queue drained by a fixed pool of asyncio workers.
+
+    Jobs are coroutine functions; blocking work inside them must go to a
+    thread (run_in_threadpool) as it would in an endpoint. start() and
+    close() must be called from the event loop that serves requests.
+
+    Attributes:
+        name (str): Name used in logs and statistics
+        workers (int): Jobs that run at the same time
+        max_queued (int): Jobs that may wait before submit() refuses more
+        result_ttl (float): Seconds a finished job's result is kept
+    """
+
+    # Number of recent job durations kept for the Retry-After estimate
+    DURATION_WINDOW = 256
+
+    def __init__(self, workers: int = 4, max_queued: int = 256, result_ttl: float = 300.0, name: str = "jobs"):
+        """
+        Initialize the JobQueue (workers start with start()).
+
+        Args:
+            workers: Jobs that run at the same time
+            max_queued: Jobs that may wait before submit() refuses more
+            result_ttl: Seconds a finished job's result is kept
+            name: Name used in logs and statistics
+        """
+        self.name = name
+        self.workers = max(1, workers)
+        self.max_queued = max(1, max_queued)
+        self.result_ttl = result_ttl
+
+        self._jobs: Dict[str, Job] = {}
+        self._finished: deque = deque()
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: list = []
+        self._durations: deque = deque(maxlen=self.DURATION_WINDOW)
+        self._submitted = 0
+        self._started = 0
+        self._counts = {"done": 0, "failed": 0, "dropped": 0, "rejected": 0, "expired": 0}
+
+    async def start(self) -> None:
+        """Starts the worker tasks on the running event loop."""
+        self._queue = asyncio.Queue(maxsize=self.max_queued)
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"{self.name}-worker-{i}")
+            for i in range(self.workers)
+        ]
+        logger.info("JobQueue '%s' started: workers=%d, max_queued=%d, result_ttl=%.0fs",
+                    self.name, self.workers, self.max_queued, self.result_ttl)
+
+    async def close(self) -> None:
+        """Cancels the workers; queued and running jobs are abandoned."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def _avg_duration(self) -> float:
+        """Mean duration of recent jobs in seconds (1s before any finished)."""
+        return sum(self._durations) / len(self._durations) if self._durations else 1.0
+
+    def depth(self) -> int:
+        """Jobs currently waiting for a worker."""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def expected_wait(self) -> float:
+        """Seconds a job submitted now would wait before it starts."""
+        return self.depth() * self._avg_duration() / self.workers
+
+    def submit(self, func: Callable[..., Awaitable], *args: Any, **kwargs: Any) -> Dict[str, Any]:
+        """
+        Queues func(*args, **kwargs) as a new job.
+
+        Args:
+            func: Coroutine function running the job
+            *args, **kwargs: Its arguments
+
+        Returns:
+            dict: The job's status (see get())
+
+        Raises:
+            QueueFullError: If max_queued jobs are already waiting
+            RuntimeError: If the queue has not been started
+        """
+        if self._queue is None:
+            raise RuntimeError(f"JobQueue '{self.name}' is not started")
+        self._expire()
+
+        job = Job(self._submitted, func, args, kwargs)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self._counts["rejected"] += 1
+            retry_after = max(1, round(self.expected_wait()))
+            raise QueueFullError(f"Job queue is full ({self.max_queued} jobs waiting)", retry_after)
+
+        self._submitted += 1
+        self._jobs[job.id] = job
+        return self._snapshot(job)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns a job's status.
+
+        Args:
+            job_id: ID returned by submit()
+
+        Returns:
+            dict: job_id, status, position (jobs ahead of it, while queued),
+                  submitted_at / started_at / finished_at, queue_ms / run_ms,
+                  and result or error once finished; None if the job is
+                  unknown or its result has expired
+        """
+        self._expire()
+        job = self._jobs.get(job_id)
+        return self._snapshot(job) if job is not None else None
+
+    async def watch(self, job_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yields the job's status now and after every change, until it finishes.
+
+        Args:
+            job_id: ID returned by submit()
+        """
+        job = self._jobs.get(job_id)
+        if job is None:
+            return
+        while True:
+            changed = job._changed
+            yield self._snapshot(job)
+            if job.status in Job.TERMINAL:
+                return
+            await changed.wait()
+
+    def _snapshot(self, job: Job) -> Dict[str, Any]:
+        """The client-facing status of a job."""
+        status = {
+            "job_id": job.id,
+            "status": job.status,
+            "submitted_at": job.submitted_at,
+            "started_at": job.started_at,
+            "finished_at": job.finished_at,
+        }
+        if job.status == "queued":
+            # FIFO: everything submitted earlier and not yet started is ahead
+            status["position"] = job.seq - self._started
+            status["expected_wait_s"] = round(status["position"] * self._avg_duration() / self.workers, 1)
+        if job.started_at is not None:
+            status["queue_ms"] = round((job.started_at - job.submitted_at) * 1000, 1)
+        if job.finished_at is not None:
+            status["run_ms"] = round((job.finished_at - job.started_at) * 1000, 1)
+        if job.status == "done":
+            status["result"] = job.result
+        elif job.status in ("failed", "dropped"):
+            status["error"] = job.error
+        return status
+
+    async def _worker(self) -> None:
+        """Runs queued jobs one at a time, forever."""
+        while True:
+            job = await self._queue.get()
+            self._started += 1
+            job.started_at = time.time()
+            job._set_status("running")
+            func, args, kwargs = job._call
+            job._call = None  # Release the payload (e.g. uploaded images) once it runs
+            token = set_deadline(job.deadline)
+            try:
+                if job.deadline is not None and deadline_expired(job.deadline):
+                    record_drop(f"{self.name}_jobs")
+                    job.error = "Request deadline passed while the job was queued"
+                    status = "dropped"
+                else:
+                    job.result = await func(*args, **kwargs)
+                    status = "done"
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Job %s failed: %s", job.id, str(e))
+                job.error = str(e)
+                status = "failed"
+            finally:
+                reset(token)
+                self._queue.task_done()
+
+            job.finished_at = time.time()
+            if status != "dropped":
+                self._durations.append(job.finished_at - job.started_at)
+            self._counts[status] += 1
+            self._finished.append(job)
+            job._set_status(status)
+
+    def _expire(self) -> None:
+        """Drops finished jobs whose result has outlived result_ttl."""
+        cutoff = time.time() - self.result_ttl
+        while self._finished and self._finished[0].finished_at < cutoff:
+            job = self._finished.popleft()
+            self._jobs.pop(job.id, None)
+            self._counts["expired"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns queue statistics.
+
+        Returns:
+            dict: workers, max_queued, queued, running, retained results,
+                  submitted / done / failed / dropped / rejected / expired
+                  counters,
+                  mean job duration and the current expected wait
+        """
+        self._expire()
+        queued = self.depth()
+        return {
+            "name": self.name,
+            "workers": self.workers,
+            "max_queued": self.max_queued,
+            "result_ttl_s": self.result_ttl,
+            "queued": queued,
+            "running": self._started - self._counts["done"] - self._counts["failed"] - self._counts["dropped"],
+            "retained_results": len(self._finished),
+            "submitted": self._submitted,
+            **self._counts,
+            "avg_job_ms": round(self._avg_duration() * 1000, 1) if self._durations else None,
+            "expected_wait_s": round(self.expected_wait(), 1),
+        }
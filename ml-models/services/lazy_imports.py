@@ -0,0 +1,149 @@
+"""
+Lazy Imports Module
+====================
+Deferred loading of the heavy optional backends (DeepFace/TensorFlow,
+MediaPipe, Groq) and a report of where startup time goes.
+
+Importing TensorFlow alone takes seconds and hundreds of MB, which every
+worker start, test run and health-only container used to pay before the
+first request. This module provides:
+- optional_import(): imports a backend on first use, once, thread-safely
+- module_available(): checks a backend is installed without importing it
+- preload(): imports backends in a background thread
+- import_report(): per-backend import time, outcome and loading thread
+
+For a full per-module breakdown of the remaining eager imports, run
+`python -X importtime -c "import main" 2> importtime.log`.
+"""
+
+import sys
+import time
+import logging
+import importlib
+import importlib.util
+import threading
+from typing import Dict, Any, Callable, Iterable, Optional
+
+# Configure module-level logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_module_locks: Dict[str, threading.Lock] = {}
+_modules: Dict[str, Any] = {}
+_report: Dict[str, Dict[str, Any]] = {}
+
+_MISSING = object()
+
+
+def module_available(name: str) -> bool:
+    """
+    Checks whether a module is installed without importing it.
+
+    Args:
+        name: Top-level or dotted module name
+
+    Returns:
+        bool: True if the module can be found (or is already imported)
+    """
+    if name in sys.modules:
+        return True
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def optional_import(
+    name: str,
+    attr: Optional[str] = None,
+    on_load: Optional[Callable[[Any], None]] = None
+) -> Any:
+    """
+    Imports an optional backend on first use and caches the outcome.
+
+    Concurrent first calls block until the single import finishes; a
+    failed import is not retried.
+
+    Args:
+        name: Module to import, e.g. "deepface"
+        attr: Attribute (or submodule) to return instead of the module,
+              e.g. "DeepFace" for `from deepface import DeepFace`
+        on_load: Called with the result after a successful first import
+
+    Returns:
+        The module (or attribute), or None if it is not installed
+    """
+    key = f"{name}.{attr}" if attr else name
+    cached = _modules.get(key, _MISSING)
+    if cached is not _MISSING:
+        return cached
+
+    with _lock:
+        module_lock = _module_locks.setdefault(key, threading.Lock())
+
+    with module_lock:
+        cached = _modules.get(key, _MISSING)
+        if cached is not _MISSING:
+            return cached
+
+        start = time.perf_counter()
+        error = None
+        try:
+            value = importlib.import_module(name)
+            if attr:
+                value = getattr(value, attr, None) or importlib.import_module(f"{name}.{attr}")
+            if on_load is not None:
+                on_load(value)
+            logger.info("✅ %s loaded in %.2fs", key, time.perf_counter() - start)
+        except Exception as e:
+            # Broken installs raise more than ImportError (e.g. missing CUDA libraries)
+            value, error = None, str(e)
+            logger.warning("⚠️ %s not available: %s", key, error)
+
+        with _lock:
+            _report[key] = {
+                "loaded": value is not None,
+                "seconds": round(time.perf_counter() - start, 3),
+                "thread": threading.current_thread().name,
+                "error": error
+            }
+        _modules[key] = value
+        return value
+
+
+def preload(loaders: Iterable[Callable[[], Any]], name: str = "preload") -> threading.Thread:
+    """
+    Runs import/warm-up callables one after another in a daemon thread.
+
+    Args:
+        loaders: Callables to run (exceptions are logged, not raised)
+        name: Thread name, reported in import_report()
+
+    Returns:
+        threading.Thread: The started thread
+    """
+    loaders = list(loaders)
+
+    def run():
+        for loader in loaders:
+            try:
+                loader()
+            except Exception as e:
+                logger.error("Background load failed in %s: %s", getattr(loader, "__name__", loader), str(e))
+
+    thread = threading.Thread(target=run, name=name, daemon=True)
+    thread.start()
+    return thread
+
+
+def import_report() -> Dict[str, Dict[str, Any]]:
+    """
+    Returns the outcome of every lazy import so far.
+
+    Returns:
+        dict: Per backend: loaded (bool), seconds (float), thread (str)
+              and error (str|None)
+    """
+    with _lock:
+        return {key: dict(entry) for key, entry in _report.items()}
@@ -0,0 +1,367 @@
+"""
+Liveness Service Module
+========================
+Blink-based liveness detection over a short stream of frames.
+
+A printed or replayed photo never blinks. This module watches the Eye
+Aspect Ratio (EAR) of both eyes across frames and confirms liveness as soon
+as one blink (eyes closed for EYE_AR_CONSEC_FRAMES frames, then reopened)
+is seen. It provides:
+- A reusable pool of MediaPipe FaceMesh instances per worker process
+- Vectorized EAR for both eyes of a frame in one NumPy expression
+- A per-stream session that decides early and ignores later frames
+- A hard frame budget after which the stream is rejected
+"""
+
+import queue
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, Iterable, Optional
+
+import cv2
+import numpy as np
+
+from .face_service import FaceVerifier, ImageInput, decode_image
+from .lazy_imports import optional_import
+
+# Configure module-level logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Landmark indices of both eyes, shape (2, 6): one EAR computation per row
+EYE_LANDMARKS = np.array([FaceVerifier.LEFT_EYE_LANDMARKS, FaceVerifier.RIGHT_EYE_LANDMARKS])
+
+
+def load_mediapipe():
+    """Returns the MediaPipe module, imported on first use (None if not installed)."""
+    return optional_import("mediapipe")
+
+
+class FaceMeshPool:
+    """
+    Pool of MediaPipe FaceMesh instances shared by all requests of a worker.
+
+    FaceMesh graphs are expensive to build and not thread-safe, so each
+    instance is checked out by one request at a time and reused afterwards.
+
+    Attributes:
+        size (int): Number of FaceMesh instances
+    """
+
+    def __init__(self, size: int = 2):
+        """
+        Initialize the FaceMeshPool (instances are built lazily on first use).
+
+        Args:
+            size: Maximum number of concurrently used FaceMesh instances
+        """
+        self.size = max(1, size)
+        self._idle: "queue.Queue" = queue.Queue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def checkout(self, timeout: Optional[float] = None):
+        """
+        Takes a FaceMesh instance out of the pool, building one if the pool
+        is not full yet. Return it with checkin().
+
+        Args:
+            timeout: Seconds to wait for a free instance (None = forever)
+
+        Returns:
+            The FaceMesh instance
+
+        Raises:
+            queue.Empty: If no instance became free within the timeout
+        """
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            create = self._created < self.size
+            if create:
+                self._created += 1
+        if create:
+            try:
+                return self._create()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        return self._idle.get(timeout=timeout)
+
+    def checkin(self, mesh) -> None:
+        """
+        Returns a FaceMesh instance to the pool, reset so the next request
+        does not continue tracking the previous request's face.
+        """
+        mesh.reset()
+        self._idle.put(mesh)
+
+    @contextmanager
+    def acquire(self, timeout: Optional[float] = None):
+        """
+        Context manager around checkout()/checkin().
+
+        Args:
+            timeout: Seconds to wait for a free instance (None = forever)
+
+        Yields:
+            The FaceMesh instance
+        """
+        mesh = self.checkout(timeout)
+        try:
+            yield mesh
+        finally:
+            self.checkin(mesh)
+
+    @staticmethod
+    def _create():
+        mp = load_mediapipe()
+        if mp is None:
+            raise RuntimeError("MediaPipe is not installed. Please install with: pip install mediapipe")
+        # Video mode tracks the face between frames instead of re-detecting it
+        return mp.solutions.face_mesh.FaceMesh(
+            static_image_mode=False,
+            max_num_faces=1,
+            refine_landmarks=True,
+            min_detection_confidence=0.5,
+            min_tracking_confidence=0.5
+        )
+
+    def close(self) -> None:
+        """Releases all idle FaceMesh instances."""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class BlinkSession:
+    """
+    Tracks one frame stream until a blink is confirmed or the budget runs out.
+
+    Feed frames in order with add_frame(); once `decided` is True, further
+    frames are dropped without being decoded.
+
+    Attributes:
+        max_frames (int): Hard frame budget for the stream
+        ear_threshold (float): EAR below which the eyes count as closed
+        consec_frames (int): Closed frames required for a blink
+        max_side (int): Frames are downscaled to this longest side before FaceMesh
+    """
+
+    def __init__(
+        self,
+        mesh,
+        max_frames: int = 90,
+        ear_threshold: float = FaceVerifier.EYE_AR_THRESH,
+        consec_frames: int = FaceVerifier.EYE_AR_CONSEC_FRAMES,
+        max_side: int = 480
+    ):
+        """
+        Initialize the BlinkSession.
+
+        Args:
+            mesh: FaceMesh instance (from FaceMeshPool.acquire) - video mode
+                  tracking state is per stream, so one mesh serves one session
+            max_frames: Hard frame budget
+            ear_threshold: EAR below which the eyes count as closed
+            consec_frames: Consecutive closed frames required for a blink
+            max_side: Longest side frames are downscaled to
+        """
+        self.mesh = mesh
+        self.max_frames = max_frames
+        self.ear_threshold = ear_threshold
+        self.consec_frames = consec_frames
+        self.max_side = max_side
+
+        self.frames = 0
+        self.frames_with_face = 0
+        self.dropped = 0
+        self.closed_run = 0
+        self.blinks = 0
+        self.min_ear: Optional[float] = None
+        self.decided = False
+        self.live = False
+        self.reason: Optional[str] = None
+
+    def frame_ear(self, frame: np.ndarray) -> Optional[float]:
+        """
+        Mean EAR of both eyes in one BGR frame.
+
+        Returns:
+            float: The EAR, or None if no face was found
+        """
+        h, w = frame.shape[:2]
+        if max(h, w) > self.max_side:
+            scale = self.max_side / max(h, w)
+            frame = cv2.resize(frame, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+            h, w = frame.shape[:2]
+
+        result = self.mesh.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        if not result.multi_face_landmarks:
+            return None
+
+        landmarks = result.multi_face_landmarks[0].landmark
+        points = np.array([(landmarks[i].x, landmarks[i].y) for i in EYE_LANDMARKS.ravel()], dtype=np.float32)
+        points = points.reshape(2, 6, 2) * (w, h)
+        return float(FaceVerifier.eye_aspect_ratios(points).mean())
+
+    def add_frame(self, frame: ImageInput) -> bool:
+        """
+        Processes the next frame of the stream.
+
+        Args:
+            frame: Encoded frame bytes or a decoded BGR array
+
+        Returns:
+            bool: True once the session is decided (stop sending frames)
+        """
+        if self.decided:
+            self.dropped += 1
+            return True
+
+        self.frames += 1
+        image = decode_image(frame, self.max_side)
+        ear = self.frame_ear(image) if image is not None else None
+
+        if ear is not None:
+            self.frames_with_face += 1
+            self.min_ear = ear if self.min_ear is None else min(self.min_ear, ear)
+            if ear < self.ear_threshold:
+                self.closed_run += 1
+            else:
+                # Eyes reopened: a long enough closed run was a blink
+                if self.closed_run >= self.consec_frames:
+                    self.blinks += 1
+                    self._decide(True, "Blink detected")
+                    return True
+                self.closed_run = 0
+
+        if self.frames >= self.max_frames:
+            self._decide(False, "No blink detected within the frame budget"
+                         if self.frames_with_face else "No face detected in the stream")
+        return self.decided
+
+    def finish(self, timeout: Optional[str] = None) -> None:
+        """
+        Ends the stream; an undecided session is rejected.
+
+        Args:
+            timeout: What timed out (e.g. "no frame for 5s"), if the server
+                     ended the stream rather than the client
+        """
+        if self.decided:
+            return
+        if not self.frames_with_face:
+            reason = "No face detected in the stream" + (f" (timed out: {timeout})" if timeout else "")
+        elif timeout:
+            reason = f"Stream timed out before a blink was detected ({timeout})"
+        else:
+            reason = "Stream ended before a blink was detected"
+        self._decide(False, reason)
+
+    def _decide(self, live: bool, reason: str) -> None:
+        self.decided, self.live, self.reason = True, live, reason
+
+    def result(self) -> Dict[str, Any]:
+        """
+        Returns the liveness result.
+
+        Returns:
+            dict: Liveness result containing:
+                - success (bool): Whether the stream was evaluated
+                - live (bool): Whether a blink was confirmed
+                - reason (str): Why the session was decided
+                - frames_processed (int): Frames decoded and analysed
+                - frames_with_face (int): Frames in which a face was found
+                - frames_dropped (int): Frames received after the decision
+                - blinks (int): Confirmed blinks
+                - min_ear (float|None): Lowest EAR seen
+                - ear_threshold (float): EAR threshold used
+        """
+        return {
+            "success": True,
+            "live": self.live,
+            "reason": self.reason,
+            "frames_processed": self.frames,
+            "frames_with_face": self.frames_with_face,
+            "frames_dropped": self.dropped,
+            "blinks": self.blinks,
+            "min_ear": round(self.min_ear, 4) if self.min_ear is not None else None,
+            "ear_threshold": self.ear_threshold,
+            "error": None
+        }
+
+
+class LivenessDetector:
+    """
+    Runs blink-liveness checks with a shared FaceMeshPool.
+
+    Attributes:
+        pool (FaceMeshPool): FaceMesh instances reused across requests
+        max_frames (int): Hard frame budget per stream
+        max_side (int): Longest side frames are downscaled to
+        acquire_timeout (float): Seconds to wait for a free FaceMesh
+    """
+
+    def __init__(self, pool_size: int = 2, max_frames: int = 90, max_side: int = 480,
+                 acquire_timeout: float = 5.0):
+        """
+        Initialize the LivenessDetector.
+
+        Args:
+            pool_size: Number of FaceMesh instances (concurrent streams)
+            max_frames: Hard frame budget per stream
+            max_side: Longest side frames are downscaled to
+            acquire_timeout: Seconds to wait for a free FaceMesh
+        """
+        self.pool = FaceMeshPool(pool_size)
+        self.max_frames = max_frames
+        self.max_side = max_side
+        self.acquire_timeout = acquire_timeout
+
+    @property
+    def available(self) -> bool:
+        """Whether MediaPipe is installed (imports it on first call)."""
+        return load_mediapipe() is not None
+
+    def new_session(self, mesh) -> BlinkSession:
+        """Creates a BlinkSession on a checked-out FaceMesh."""
+        return BlinkSession(mesh, max_frames=self.max_frames, max_side=self.max_side)
+
+    def check(self, frames: Iterable[ImageInput], total: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Evaluates a sequence of frames, stopping at the first decision.
+
+        Frames are consumed lazily: with a generator, frames after the
+        decision are never read or decoded.
+
+        Args:
+            frames: Encoded frames (or BGR arrays) in capture order
+            total: Number of frames sent, to report dropped frames
+
+        Returns:
+            dict: Liveness result (see BlinkSession.result)
+        """
+        if not self.available:
+            return {"success": False, "live": False,
+                    "error": "MediaPipe is not installed. Please install with: pip install mediapipe"}
+
+        with self.pool.acquire(timeout=self.acquire_timeout) as mesh:
+            session = self.new_session(mesh)
+            for frame in frames:
+                if session.add_frame(frame):
+                    break
+            session.finish()
+
+        result = session.result()
+        if total is not None:
+            result["frames_dropped"] = max(0, total - session.frames)
+        logger.info("Liveness: live=%s after %d frames (%s)", session.live, session.frames, session.reason)
+        return result
@@ -0,0 +1,178 @@
+"""
+Metrics Module
+===============
+Prometheus-style metrics for the ML service.
+
+The only signal of where time goes used to be the INFO log lines. This
+module provides:
+- A latency histogram per pipeline stage (upload read, decode, GPS
+  geodesic, Bluetooth mode, face detection, embedding, distance, Groq round
+  trip, cleanup), recorded by the services themselves so every endpoint
+  that runs a stage contributes
+- timed(), a context manager / decorator costing two clock reads and one
+  short lock per call, cheap enough to leave on in production
+- Every recorded stage also added to the current request's trace (see
+  tracing.py), for Server-Timing headers
+- Collectors: callables that read gauges and counters the services
+  already keep (cache hits, queue depths, in-flight requests, model load
+  state) only when /metrics is scraped, adding nothing to the hot path
+- render(), producing the Prometheus text exposition format (version 0.0.4)
+  without the prometheus_client dependency
+"""
+
+import time
+import bisect
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from .tracing import current_trace
+
+# Configure module-level logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Name of the stage latency histogram
+STAGE_METRIC = "ml_stage_duration_seconds"
+
+# Stages span microseconds (distance) to seconds (Groq round trip)
+STAGE_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+    0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+_lock = threading.Lock()
+# Stage -> [per-bucket counts..., +Inf count], sum of seconds
+_stage_counts: Dict[str, List[int]] = {}
+_stage_sums: Dict[str, float] = {}
+_collectors: List[Callable[[], Iterable["Metric"]]] = []
+
+
+class Metric:
+    """
+    One gauge or counter family returned by a collector.
+
+    Attributes:
+        name (str): Metric name (counters end in _total)
+        kind (str): "gauge" or "counter"
+        help (str): One-line description
+        samples (list): (labels, value) pairs
+    """
+
+    def __init__(self, name: str, kind: str, help: str):
+        self.name = name
+        self.kind = kind
+        self.help = help
+        self.samples: List[Tuple[Dict[str, str], float]] = []
+
+    def add(self, value: float, **labels: str) -> "Metric":
+        """Adds a sample with the given labels; returns self for chaining."""
+        self.samples.append((labels, value))
+        return self
+
+
+def observe(stage: str, seconds: float, start: Optional[float] = None) -> None:
+    """
+    Records one duration of `stage` in the stage histogram and in the
+    current request's trace.
+
+    Args:
+        stage: Stage name (the "stage" label)
+        seconds: Duration in seconds
+        start: time.perf_counter() at which the stage started, for the
+               trace (None = it ended just now)
+    """
+    index = bisect.bisect_left(STAGE_BUCKETS, seconds)
+    with _lock:
+        counts = _stage_counts.get(stage)
+        if counts is None:
+            counts = _stage_counts[stage] = [0] * (len(STAGE_BUCKETS) + 1)
+            _stage_sums[stage] = 0.0
+        counts[index] += 1
+        _stage_sums[stage] += seconds
+    trace = current_trace()
+    if trace is not None:
+        trace.add(stage, seconds, start)
+
+
+@contextmanager
+def timed(stage: str):
+    """
+    Records the duration of the enclosed block (or decorated function) as
+    `stage`, whether it returns or raises.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - start, start)
+
+
+def register_collector(collect: Callable[[], Iterable[Metric]]) -> None:
+    """
+    Adds a collector called on every render().
+
+    Args:
+        collect: Returns the Metric families to expose
+    """
+    _collectors.append(collect)
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        '{}="{}"'.format(key, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in labels.items()
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value: Optional[float]) -> str:
+    if value is None:
+        return "NaN"
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render() -> str:
+    """
+    Renders the stage histogram and all collected metrics.
+
+    Returns:
+        str: Metrics in the Prometheus text exposition format
+    """
+    lines = [
+        f"# HELP {STAGE_METRIC} Duration of pipeline stages.",
+        f"# TYPE {STAGE_METRIC} histogram",
+    ]
+    with _lock:
+        snapshot = {stage: (list(counts), _stage_sums[stage]) for stage, counts in _stage_counts.items()}
+    for stage, (counts, total) in sorted(snapshot.items()):
+        cumulative = 0
+        for bound, count in zip(STAGE_BUCKETS, counts):
+            cumulative += count
+            lines.append(f'{STAGE_METRIC}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+        cumulative += counts[-1]
+        lines.append(f'{STAGE_METRIC}_bucket{{stage="{stage}",le="+Inf"}} {cumulative}')
+        lines.append(f'{STAGE_METRIC}_sum{{stage="{stage}"}} {total!r}')
+        lines.append(f'{STAGE_METRIC}_count{{stage="{stage}"}} {cumulative}')
+
+    for collect in list(_collectors):
+        try:
+            families = list(collect())
+        except Exception as e:
+            # A broken collector must not take the whole scrape down
+            logger.error("Metrics collector %s failed: %s", getattr(collect, "__name__", collect), str(e))
+            continue
+        for metric in families:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for labels, value in metric.samples:
+                lines.append(f"{metric.name}{_format_labels(labels)} {_format_value(value)}")
+
+    return "\n".join(lines) + "\n"
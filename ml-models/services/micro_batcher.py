@@ -0,0 +1,246 @@
+"""
+Micro-Batching Module
+======================
+Collects work items from concurrent callers into small batches.
+
+When many students mark attendance at once, running one forward pass per
+selfie wastes most of the model's throughput. A MicroBatcher holds incoming
+items for at most a few milliseconds (or until the batch is full), runs one
+batched call, and hands each caller its own result. This module provides:
+- A thread-based batcher usable from synchronous code (Future per item)
+- Configurable maximum batch size and maximum wait
+- Optional concurrent dispatch of batches (e.g. one per inference worker)
+- Batch size and queueing latency statistics for tuning
+- Items whose request deadline passed while queued are dropped before
+  the batch runs
+- Batches holding an item of a profiled request (see profiler.py) are
+  profiled in the thread that runs them
+"""
+
+import time
+import queue
+import logging
+import threading
+from collections import deque, Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Sequence
+
+from .deadline import DeadlineExceeded, current_deadline, deadline_expired, record_drop, reset, set_deadline
+from .profiler import current_session, run_profiled
+
+# Configure module-level logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """
+    Groups submitted items into batches collected by a single worker thread.
+
+    The batch function receives a list of items and must return a list of the
+    same length. A result that is an Exception instance is raised to that
+    item's caller only, so one bad input does not fail the whole batch.
+
+    Attributes:
+        name (str): Name used in logs and statistics
+        max_batch_size (int): Upper bound on items per batch
+        max_wait_ms (float): Longest time the first item of a batch waits for company
+        max_concurrent_batches (int): Batches that may run at the same time
+    """
+
+    # Number of recent queue-wait samples kept for percentile statistics
+    LATENCY_WINDOW = 1024
+
+    def __init__(
+        self,
+        batch_fn: Callable[[List[Any]], Sequence[Any]],
+        max_batch_size: int = 8,
+        max_wait_ms: float = 5.0,
+        name: str = "batcher",
+        max_concurrent_batches: int = 1
+    ):
+        """
+        Initialize the MicroBatcher and start its worker thread.
+
+        Args:
+            batch_fn: Function processing a list of items into a list of results
+            max_batch_size: Maximum number of items per batch
+            max_wait_ms: Maximum time to hold a batch open for more items
+            name: Name used in logs and statistics
+            max_concurrent_batches: Batches that may run at once. While all
+                slots are busy, new items keep accumulating into the next batch.
+        """
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_ms = max(0.0, max_wait_ms)
+        self.name = name
+        self.max_concurrent_batches = max(1, max_concurrent_batches)
+
+        self._slots = threading.Semaphore(self.max_concurrent_batches)
+        self._dispatcher = (
+            ThreadPoolExecutor(max_workers=self.max_concurrent_batches, thread_name_prefix=f"{name}-batch")
+            if self.max_concurrent_batches > 1 else None
+        )
+        self._queue: "queue.Queue" = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._batch_sizes: Counter = Counter()
+        self._queue_waits_ms: deque = deque(maxlen=self.LATENCY_WINDOW)
+        self._batches = 0
+        self._items = 0
+        self._closed = False
+
+        self._worker = threading.Thread(target=self._run, name=f"{name}-worker", daemon=True)
+        self._worker.start()
+
+        logger.info("MicroBatcher '%s' started: max_batch_size=%d, max_wait_ms=%.1f, concurrency=%d",
+                    name, self.max_batch_size, self.max_wait_ms, self.max_concurrent_batches)
+
+    def submit(self, item: Any) -> Future:
+        """
+        Queues an item for the next batch.
+
+        Args:
+            item: The work item
+
+        Returns:
+            Future: Resolves to the item's result (or raises its exception)
+        """
+        if self._closed:
+            raise RuntimeError(f"MicroBatcher '{self.name}' is closed")
+
+        future: Future = Future()
+        # The caller's request deadline and profiling session travel with the item
+        self._queue.put((item, future, time.perf_counter(), current_deadline(), current_session()))
+        return future
+
+    def _collect(self) -> List[tuple]:
+        """Blocks for the first item, then gathers more until full or timed out."""
+        first = self._queue.get()
+        if first is None:
+            return []
+
+        batch = [first]
+        deadline = first[2] + self.max_wait_ms / 1000.0
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                entry = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is None:
+                # Close requested - finish this batch, then stop
+                self._queue.put(None)
+                break
+            batch.append(entry)
+        return batch
+
+    def _run(self) -> None:
+        """Worker loop: wait for a free slot, collect a batch, dispatch it."""
+        while True:
+            self._slots.acquire()
+            batch = self._collect()
+            if not batch:
+                self._slots.release()
+                if self._dispatcher is not None:
+                    self._dispatcher.shutdown(wait=False)
+                return
+
+            if self._dispatcher is None:
+                self._process(batch)
+            else:
+                self._dispatcher.submit(self._process, batch)
+
+    def _process(self, batch: List[tuple]) -> None:
+        """Runs one batch and resolves each caller's future."""
+        try:
+            started = time.perf_counter()
+            # Skip items whose callers already gave up, or whose deadline passed
+            live = []
+            for entry in batch:
+                if not entry[1].set_running_or_notify_cancel():
+                    continue
+                if entry[3] is not None and deadline_expired(entry[3]):
+                    record_drop(f"{self.name}_queue")
+                    entry[1].set_exception(DeadlineExceeded(f"{self.name} batch"))
+                    continue
+                live.append(entry)
+            if not live:
+                return
+
+            with self._stats_lock:
+                self._batches += 1
+                self._items += len(live)
+                self._batch_sizes[len(live)] += 1
+                self._queue_waits_ms.extend((started - entry[2]) * 1000.0 for entry in live)
+
+            # The batch runs on behalf of its callers: it may run until the last
+            # of their deadlines (or without one if any caller has none)
+            deadlines = [entry[3] for entry in live]
+            token = set_deadline(None if None in deadlines else max(deadlines))
+            try:
+                results = run_profiled([entry[4] for entry in live], self.name, self.batch_fn,
+                                       [entry[0] for entry in live], batch_size=len(live))
+                if len(results) != len(live):
+                    raise RuntimeError(f"batch function returned {len(results)} results for {len(live)} items")
+            except Exception as e:
+                logger.error("MicroBatcher '%s' batch of %d failed: %s", self.name, len(live), str(e))
+                for _, future, *_ in live:
+                    future.set_exception(e)
+                return
+            finally:
+                reset(token)
+
+            for (_, future, *_), result in zip(live, results):
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+        finally:
+            self._slots.release()
+
+    def close(self) -> None:
+        """Stops accepting items and lets the worker drain the queue and exit."""
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of items waiting for a batch."""
+        return self._queue.qsize()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns batching statistics.
+
+        Returns:
+            dict: Batch count, average batch size, batch size histogram and
+                  queueing latency (mean/p50/p95/max over recent items, in ms)
+        """
+        with self._stats_lock:
+            waits = sorted(self._queue_waits_ms)
+            histogram = {str(size): count for size, count in sorted(self._batch_sizes.items())}
+            batches, items = self._batches, self._items
+
+        def percentile(p: float) -> float:
+            if not waits:
+                return 0.0
+            return round(waits[min(len(waits) - 1, int(p * len(waits)))], 3)
+
+        return {
+            "name": self.name,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "max_concurrent_batches": self.max_concurrent_batches,
+            "queue_depth": self.queue_depth,
+            "batches": batches,
+            "items": items,
+            "avg_batch_size": round(items / batches, 3) if batches else 0.0,
+            "batch_size_histogram": histogram,
+            "queue_wait_ms": {
+                "mean": round(sum(waits) / len(waits), 3) if waits else 0.0,
+                "p50": percentile(0.50),
+                "p95": percentile(0.95),
+                "max": round(waits[-1], 3) if waits else 0.0
+            }
+        }
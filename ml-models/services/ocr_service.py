@@ -14,9 +14,15 @@ import base64
 import json
 import re
 import logging
+import threading
 from typing import Dict, Any, Optional
 from dotenv import load_dotenv
 
+from .lazy_imports import optional_import, module_available
+from .image_loader import ImageSource, load_image, encode_jpeg
+from .metrics import timed
+from .profiler import profiled
+
 # Configure module-level logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -24,14 +30,9 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
-# Try to import Groq SDK
-try:
-    from groq import Groq
-    GROQ_AVAILABLE = True
-    logger.info("✅ Groq SDK loaded successfully")
-except ImportError as e:
-    GROQ_AVAILABLE = False
-    logger.warning("⚠️ Groq SDK not available: %s", str(e))
+# The Groq SDK (and its HTTP stack) is imported when the first OCR request
+# builds the client, or by the server's background warm-up
+GROQ_AVAILABLE = module_available("groq")
 
 
 class IDCardExtractor:
@@ -88,6 +89,7 @@ Return ONLY valid JSON in this exact format:
         self.model_name = model_name
         self.client = None
         self.api_configured = False
+        self._client_lock = threading.Lock()
         
         # Get API key from argument or environment
         self.api_key = api_key or os.getenv("GROQ_API_KEY")
@@ -100,27 +102,55 @@ Return ONLY valid JSON in this exact format:
             logger.warning("GROQ_API_KEY not found. OCR functionality will be limited.")
             return
         
-        # Configure the Groq client
-        try:
-            self.client = Groq(api_key=self.api_key)
-            self.api_configured = True
-            logger.info("✅ Groq API configured successfully with model: %s", model_name)
-        except Exception as e:
-            logger.error("❌ Failed to configure Groq API: %s", str(e))
+        # The Groq client itself is built on first use (see get_client)
+        self.api_configured = True
+        logger.info("✅ Groq API configured with model: %s", model_name)
+    
+    def get_client(self):
+        """
+        Returns the Groq client, importing the SDK and building it on first use.
+        
+        Returns:
+            The Groq client
+        
+        Raises:
+            RuntimeError: If the Groq SDK cannot be imported
+        """
+        if self.client is None:
+            with self._client_lock:
+                if self.client is None:
+                    groq_client = optional_import("groq", "Groq")
+                    if groq_client is None:
+                        raise RuntimeError("Groq SDK could not be imported")
+                    self.client = groq_client(api_key=self.api_key)
+        return self.client
     
     @staticmethod
-    def image_to_base64(image_path: str) -> str:
+    def image_to_base64(image_path: ImageSource, max_side: int = 1600) -> str:
         """
-        Converts an image file to base64 encoded string.
+        Converts an image file to a base64 encoded JPEG for the vision model.
+        
+        The image is decoded at a reduced scale where possible, turned upright
+        from its EXIF orientation and re-encoded at most max_side pixels on its
+        longest side - ID card text stays legible, and a 12 MP photo shrinks
+        from several MB to a few hundred KB per request. WebP, PNG and HEIC
+        inputs come out as JPEG too.
         
         Args:
-            image_path: Path to the image file
+            image_path: Path to the image file, or the encoded image bytes
+            max_side: Longest side of the image sent to the model
         
         Returns:
-            str: Base64 encoded image string
+            str: Base64 encoded JPEG string
+        
+        Raises:
+            ValueError: If the image cannot be decoded or exceeds the pixel limit
         """
-        with open(image_path, "rb") as img:
-            return base64.b64encode(img.read()).decode("utf-8")
+        image = load_image(image_path, max_side=max_side)
+        if image is None:
+            name = os.path.basename(image_path) if isinstance(image_path, str) else "uploaded image"
+            raise ValueError(f"Could not read image: {name}")
+        return base64.b64encode(encode_jpeg(image, max_side=max_side)).decode("utf-8")
     
     @staticmethod
     def safe_json_parse(text: str) -> Dict[str, Any]:
@@ -144,7 +174,8 @@ Return ONLY valid JSON in this exact format:
             raise ValueError(f"No JSON object found in model output:\n{text}")
         return json.loads(match.group())
     
-    def extract_details(self, image_path: str, custom_prompt: Optional[str] = None) -> Dict[str, Any]:
+    @profiled("extract_details")
+    def extract_details(self, image_path: ImageSource, custom_prompt: Optional[str] = None) -> Dict[str, Any]:
         """
         Extracts text details from a college ID card image using Groq LLaMA-4-Scout.
         
@@ -156,7 +187,8 @@ Return ONLY valid JSON in this exact format:
         5. Returns structured document data
         
         Args:
-            image_path: Path to the ID card image file
+            image_path: Path to the ID card image file, or the encoded image
+                        bytes / memoryview of an upload
             custom_prompt: Optional custom prompt to override the default
         
         Returns:
@@ -179,15 +211,16 @@ Return ONLY valid JSON in this exact format:
                 "error": "Groq API is not configured. Please set GROQ_API_KEY in .env file."
             }
         
-        # Validate image file exists
-        if not os.path.exists(image_path):
+        # Validate image file exists (uploads arrive as bytes, not paths)
+        if isinstance(image_path, str) and not os.path.exists(image_path):
             return {
                 "success": False,
                 "error": f"Image file not found: {image_path}"
             }
         
         try:
-            logger.info("Extracting text from: %s", os.path.basename(image_path))
+            logger.info("Extracting text from: %s",
+                        os.path.basename(image_path) if isinstance(image_path, str) else "uploaded image")
             
             # Convert image to base64
             image_b64 = self.image_to_base64(image_path)
@@ -199,25 +232,26 @@ Return ONLY valid JSON in this exact format:
             print("prompt run")
             
             # Call Groq API with LLaMA-4-Scout vision model
-            response = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {"type": "text", "text": prompt},
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/jpeg;base64,{image_b64}"
+            with timed("groq_round_trip"):
+                response = self.get_client().chat.completions.create(
+                    model=self.model_name,
+                    messages=[
+                        {
+                            "role": "user",
+                            "content": [
+                                {"type": "text", "text": prompt},
+                                {
+                                    "type": "image_url",
+                                    "image_url": {
+                                        "url": f"data:image/jpeg;base64,{image_b64}"
+                                    }
                                 }
-                            }
-                        ]
-                    }
-                ],
-                temperature=0,
-                max_tokens=300
-            )
+                            ]
+                        }
+                    ],
+                    temperature=0,
+                    max_tokens=300
+                )
             
             # Get raw output from model
             raw_output = response.choices[0].message.content
@@ -257,6 +291,7 @@ Return ONLY valid JSON in this exact format:
                 "error": f"Extraction failed: {str(e)}"
             }
     
+    @profiled("extract_name_only")
     def extract_name_only(self, image_path: str) -> Optional[str]:
         """
         Quickly extracts just the name from a college ID card.
@@ -279,25 +314,26 @@ Return just the name, nothing else. No JSON, no explanation.
         try:
             image_b64 = self.image_to_base64(image_path)
             
-            response = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {"type": "text", "text": prompt},
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/jpeg;base64,{image_b64}"
+            with timed("groq_round_trip"):
+                response = self.get_client().chat.completions.create(
+                    model=self.model_name,
+                    messages=[
+                        {
+                            "role": "user",
+                            "content": [
+                                {"type": "text", "text": prompt},
+                                {
+                                    "type": "image_url",
+                                    "image_url": {
+                                        "url": f"data:image/jpeg;base64,{image_b64}"
+                                    }
                                 }
-                            }
-                        ]
-                    }
-                ],
-                temperature=0,
-                max_tokens=100
-            )
+                            ]
+                        }
+                    ],
+                    temperature=0,
+                    max_tokens=100
+                )
             
             return response.choices[0].message.content.strip()
         except Exception as e:
@@ -0,0 +1,163 @@
+"""
+ONNX Embedder Module
+=====================
+Face embedding models exported to ONNX, run on CPU without TensorFlow.
+
+The Keras graphs behind DeepFace are the largest memory and latency cost
+of the service. export_face_models.py converts them to ONNX once; this
+module runs the exported graphs with ONNX Runtime or OpenCV's DNN module.
+It provides:
+- OnnxEmbedder, a drop-in for the Keras model FaceVerifier calls
+  (same input_shape convention, same predict() on preprocessed BGR batches)
+- Optional INT8-quantized variants (<model>.int8.onnx, ONNX Runtime only)
+- NHWC (tf2onnx exports) and NCHW input layouts
+
+The exported graph computes the same function as the Keras model, so
+embeddings and cosine distances stay comparable with MODEL_THRESHOLDS
+(see test_onnx_parity.py and benchmark_face_models.py --backends).
+"""
+
+import os
+import json
+import logging
+import threading
+from typing import Dict, Any, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from .lazy_imports import optional_import
+
+# Configure module-level logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Runtimes able to execute an exported model
+RUNTIMES = ("onnxruntime", "opencv-dnn")
+
+
+def model_paths(model_dir: str, model_name: str, int8: bool = False) -> Tuple[str, str]:
+    """
+    Returns the (model, metadata) file paths of an exported model.
+
+    Args:
+        model_dir: Directory written by export_face_models.py
+        model_name: DeepFace model name, e.g. "Facenet512"
+        int8: Whether to use the INT8-quantized variant
+
+    Returns:
+        tuple: (<model>.onnx or <model>.int8.onnx, <model>.json)
+    """
+    base = os.path.join(model_dir, model_name)
+    return (base + (".int8.onnx" if int8 else ".onnx")), base + ".json"
+
+
+class OnnxEmbedder:
+    """
+    Runs an exported face embedding model.
+
+    Attributes:
+        path (str): The .onnx file
+        runtime (str): "onnxruntime" or "opencv-dnn"
+        input_shape (tuple): (None, h, w, 3), like the Keras model it replaces
+        channels_first (bool): Whether the graph takes NCHW input
+    """
+
+    def __init__(self, path: str, runtime: str = "onnxruntime", threads: Optional[int] = None,
+                 metadata: Optional[Dict[str, Any]] = None):
+        """
+        Initialize the OnnxEmbedder and load the graph.
+
+        Args:
+            path: The .onnx file
+            runtime: "onnxruntime" or "opencv-dnn"
+            threads: Intra-op threads (None = runtime default)
+            metadata: Export metadata (input_size, layout); required by
+                      opencv-dnn, which cannot report input shapes
+
+        Raises:
+            FileNotFoundError: If the model file does not exist
+            RuntimeError: If the runtime is unknown or not installed
+        """
+        if runtime not in RUNTIMES:
+            raise RuntimeError(f"Unknown ONNX runtime {runtime!r}; choose from {', '.join(RUNTIMES)}")
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Exported model not found: {path} (run export_face_models.py)")
+
+        self.path = path
+        self.runtime = runtime
+        metadata = metadata or {}
+
+        if runtime == "onnxruntime":
+            ort = optional_import("onnxruntime")
+            if ort is None:
+                raise RuntimeError("ONNX Runtime is not installed. Please install with: pip install onnxruntime")
+            options = ort.SessionOptions()
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            if threads:
+                options.intra_op_num_threads = threads
+                options.inter_op_num_threads = 1
+            self._session = ort.InferenceSession(path, sess_options=options, providers=["CPUExecutionProvider"])
+            model_input = self._session.get_inputs()[0]
+            self._input_name = model_input.name
+            shape = list(model_input.shape)
+            self.channels_first = shape[1] in (1, 3) and shape[3] not in (1, 3)
+            height, width = (shape[2], shape[3]) if self.channels_first else (shape[1], shape[2])
+        else:
+            if "input_size" not in metadata:
+                raise RuntimeError(f"opencv-dnn needs the export metadata of {path} (input_size)")
+            self._net = cv2.dnn.readNetFromONNX(path)
+            # cv2.dnn.Net is not safe to call from several threads at once
+            self._lock = threading.Lock()
+            self.channels_first = metadata.get("layout") == "NCHW"
+            height, width = metadata["input_size"]
+
+        self.input_shape = (None, int(height), int(width), 3)
+        logger.info("OnnxEmbedder loaded %s with %s (input %dx%d)", os.path.basename(path), runtime, height, width)
+
+    @classmethod
+    def for_model(cls, model_name: str, model_dir: str, runtime: str = "onnxruntime", int8: bool = False,
+                  threads: Optional[int] = None) -> "OnnxEmbedder":
+        """
+        Loads the exported variant of a DeepFace model.
+
+        Args:
+            model_name: DeepFace model name
+            model_dir: Directory written by export_face_models.py
+            runtime: "onnxruntime" or "opencv-dnn"
+            int8: Whether to load the INT8-quantized variant
+            threads: Intra-op threads (None = runtime default)
+
+        Returns:
+            OnnxEmbedder: The loaded model
+        """
+        path, metadata_path = model_paths(model_dir, model_name, int8)
+        metadata = {}
+        if os.path.exists(metadata_path):
+            with open(metadata_path, "r", encoding="utf-8") as f:
+                metadata = json.load(f)
+        return cls(path, runtime=runtime, threads=threads, metadata=metadata)
+
+    def predict(self, batch: np.ndarray, verbose: int = 0) -> np.ndarray:
+        """
+        Embeds a batch of preprocessed faces (same contract as Keras predict).
+
+        Args:
+            batch: Preprocessed BGR faces (FaceVerifier._prepare_face), shape (N, h, w, 3)
+            verbose: Ignored (Keras compatibility)
+
+        Returns:
+            np.ndarray: Embeddings, shape (N, D)
+        """
+        batch = np.asarray(batch, dtype=np.float32)
+        if self.channels_first:
+            batch = batch.transpose(0, 3, 1, 2)
+        batch = np.ascontiguousarray(batch)
+
+        if self.runtime == "onnxruntime":
+            output = self._session.run(None, {self._input_name: batch})[0]
+        else:
+            with self._lock:
+                self._net.setInput(batch)
+                output = self._net.forward()
+        return np.asarray(output, dtype=np.float32).reshape(len(batch), -1)
@@ -0,0 +1,509 @@
+"""
+Request Profiler Module
+========================
+On-demand profiling of production requests.
+
+Stage timings (see tracing.py) say which stage of a request is slow, not
+which code inside it. Reproducing a hot spot locally rarely works - it
+depends on the production images, load and Groq latency. This module
+provides:
+- RequestProfiler, armed at runtime to profile the next N requests or a
+  sampled fraction of them, or a single request that asks for it
+- Two modes: "sampler", a statistical sampler reading the stacks of the
+  request's threads every few milliseconds (cheap enough for production,
+  and it sees time spent waiting on the network), and "cprofile", exact
+  call counts and times from cProfile
+- profiled(), a decorator marking the functions profiled inside a request
+  (face verification, document pre-processing, the Groq call); the
+  request's work runs in worker threads, and a profiler follows one
+  thread, so each marked call is profiled in the thread that runs it
+- run_profiled(), profiling work other threads do for profiled requests
+  (the micro-batcher's forward passes); inference worker
+  processes are not profiled - their time shows as the wait for them
+- Per profiled request, in the profile directory: collapsed stacks
+  (.collapsed, for flamegraph.pl or speedscope) or cProfile stats
+  (.pstats), and a .json with the request's stage timings and the
+  profiled calls
+- ProfilingMiddleware, choosing which requests are profiled and writing
+  their profiles once the response is sent
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import hmac
+import random
+import asyncio
+import cProfile
+import functools
+import logging
+import pstats
+import threading
+from collections import Counter, deque
+from contextvars import ContextVar
+from typing import Any, Dict, Iterable, List, Optional
+
+from .tracing import current_trace
+
+# Configure module-level logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+MODES = ("sampler", "cprofile")
+
+# Profiling session of the current request (None outside profiled requests)
+_session: ContextVar[Optional["ProfileSession"]] = ContextVar("profile_session", default=None)
+
+# Whether a profiled call is already running in this thread (nested calls
+# are part of the outer profile)
+_local = threading.local()
+
+
+class ProfileSession:
+    """
+    The profile of one request.
+
+    Attributes:
+        id (str): Profile ID, returned in the X-Profile-Id response header
+        path (str): Request path
+        mode (str): "sampler" or "cprofile"
+        calls (list): Profiled calls (function, duration, thread)
+        profiles (list): cProfile.Profile per profiled call (cprofile mode)
+        samples (Counter): Collapsed stack -> sample count (sampler mode)
+        threads (dict): Ident -> profiled function of the threads running a
+                        profiled call now
+    """
+
+    def __init__(self, path: str, mode: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.path = path
+        self.mode = mode
+        self.started_at = time.time()
+        self.status_code: Optional[int] = None
+        self.calls: List[Dict[str, Any]] = []
+        self.profiles: List[cProfile.Profile] = []
+        self.samples: Counter = Counter()
+        self.threads: Dict[int, str] = {}
+        self._start = time.perf_counter()
+
+    def elapsed_ms(self) -> float:
+        """Milliseconds since the request started."""
+        return round((time.perf_counter() - self._start) * 1000, 2)
+
+
+def current_session() -> Optional[ProfileSession]:
+    """The current request's profiling session, or None if it is not profiled."""
+    return _session.get()
+
+
+def profiled(name: str):
+    """
+    Profiles the decorated function when it runs inside a profiled request.
+
+    Outside profiled requests the cost is one context variable lookup.
+
+    Args:
+        name: Function name reported in the profile (root of its stacks)
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            session = _session.get()
+            if session is None or getattr(_local, "active", False):
+                return func(*args, **kwargs)
+            return _profiled_call([session], name, func, args, kwargs)
+        return wrapper
+    return decorator
+
+
+def run_profiled(sessions: Iterable[Optional[ProfileSession]], name: str, func, *args, **details):
+    """
+    Runs func(*args) in this thread, profiled for each of `sessions`.
+
+    For work done on behalf of requests outside their own context, e.g. a
+    micro-batch run by the batcher's thread: the batch is profiled once and
+    the profile is added to every profiled request in it.
+
+    Args:
+        sessions: Sessions of the requests the work is for (None entries
+                  and duplicates are ignored; no session = not profiled)
+        name: Function name reported in the profile (root of its stacks)
+        func: The work
+        *args: Its arguments
+        **details: Extra fields of the call record (e.g. items=8)
+    """
+    sessions = list({id(s): s for s in sessions if s is not None}.values())
+    if not sessions or getattr(_local, "active", False):
+        return func(*args)
+    return _profiled_call(sessions, name, func, args, {}, details)
+
+
+def _profiled_call(sessions: List[ProfileSession], name: str, func, args: tuple, kwargs: dict,
+                   details: Optional[Dict[str, Any]] = None):
+    """Runs func under the sessions' profilers (the root frame of sampled stacks)."""
+    _local.active = True
+    ident = threading.get_ident()
+    profile = cProfile.Profile() if any(s.mode == "cprofile" for s in sessions) else None
+    for session in sessions:
+        if session.mode == "sampler":
+            session.threads[ident] = name
+    start = time.perf_counter()
+    try:
+        if profile is not None:
+            return profile.runcall(func, *args, **kwargs)
+        return func(*args, **kwargs)
+    finally:
+        _local.active = False
+        end = time.perf_counter()
+        for session in sessions:
+            session.threads.pop(ident, None)
+            if profile is not None and session.mode == "cprofile":
+                session.profiles.append(profile)
+            session.calls.append({
+                "function": name,
+                "start_ms": round((start - session._start) * 1000, 3),
+                "duration_ms": round((end - start) * 1000, 3),
+                "thread": threading.current_thread().name,
+                **(details or {}),
+            })
+
+
+_PROFILED_CALL_CODE = _profiled_call.__code__
+
+
+def _collapse(frame, root: str) -> Optional[str]:
+    """
+    Renders a thread's stack as one collapsed-stack line (root first).
+
+    Frames above the profiled call (thread pool, event loop) are cut off;
+    returns None if the frame is not inside a profiled call.
+    """
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        if code is _PROFILED_CALL_CODE:
+            names.append(root)
+            return ";".join(reversed(names))
+        # co_qualname is new in Python 3.11 (the image runs 3.10)
+        name = getattr(code, "co_qualname", code.co_name)
+        names.append(f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return None
+
+
+class RequestProfiler:
+    """
+    Decides which requests are profiled, samples their threads and writes
+    their profiles.
+
+    A request is profiled when it sends `X-Profile` with a valid
+    `X-Admin-Token`, or while the profiler is armed: for the next `count`
+    requests, then for a `sample_rate` fraction of them.
+
+    Attributes:
+        output_dir (str): Directory profiles are written to
+        mode (str): Mode of armed profiling ("sampler" or "cprofile")
+        interval_s (float): Seconds between two stack samples
+        keep (int): Profiles kept on disk; older ones are deleted
+    """
+
+    def __init__(self, admin_token: str, output_dir: str, interval_ms: float = 5.0, keep: int = 100):
+        """
+        Initialize the RequestProfiler (disarmed).
+
+        Args:
+            admin_token: Token required to arm the profiler or profile a request
+            output_dir: Directory profiles are written to (created on first use)
+            interval_ms: Milliseconds between two stack samples
+            keep: Profiles kept on disk; older ones are deleted
+        """
+        if not admin_token:
+            raise ValueError("Profiling needs an admin token")
+        self._token = admin_token.encode()
+        self.output_dir = output_dir
+        self.interval_s = max(0.001, interval_ms / 1000)
+        self.keep = max(1, keep)
+
+        self.mode = "sampler"
+        self._remaining = 0
+        self._sample_rate = 0.0
+        self._armed_at: Optional[float] = None
+        self._profiled = 0
+        self._failed = 0
+        self._sample_errors = 0
+        self._recent: deque = deque()
+
+        self._lock = threading.Lock()
+        self._active: set = set()
+        self._wake = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+
+    def check_token(self, token: Optional[str]) -> bool:
+        """Whether `token` is the admin token (constant-time comparison)."""
+        return token is not None and hmac.compare_digest(token.encode(), self._token)
+
+    def arm(self, count: int = 0, sample_rate: float = 0.0, mode: str = "sampler") -> Dict[str, Any]:
+        """
+        Profiles the next `count` requests, then a `sample_rate` fraction of
+        requests until disarmed. Replaces any previous setting.
+
+        Args:
+            count: Requests to profile next
+            sample_rate: Fraction of requests profiled after those (0-1)
+            mode: "sampler" or "cprofile"
+
+        Returns:
+            dict: The profiler's status (see status())
+
+        Raises:
+            ValueError: On a negative count, a rate outside 0-1 or an unknown mode
+        """
+        if count < 0 or not 0.0 <= sample_rate <= 1.0:
+            raise ValueError("count must be >= 0 and sample_rate between 0 and 1")
+        if mode not in MODES:
+            raise ValueError(f"Unknown profiling mode '{mode}' (expected one of {', '.join(MODES)})")
+        with self._lock:
+            self._remaining = count
+            self._sample_rate = sample_rate
+            self.mode = mode
+            self._armed_at = time.time() if count or sample_rate else None
+        if count or sample_rate:
+            logger.warning("Profiler armed: next %d requests, sample rate %.3f, mode %s", count, sample_rate, mode)
+        else:
+            logger.info("Profiler disarmed")
+        return self.status()
+
+    def disarm(self) -> Dict[str, Any]:
+        """Stops armed profiling (requests sending X-Profile are still profiled)."""
+        return self.arm(0, 0.0, self.mode)
+
+    def select(self, headers: Dict[str, str]) -> Optional[str]:
+        """
+        Decides whether a request is profiled.
+
+        Args:
+            headers: Lower-cased request headers
+
+        Returns:
+            str: The profiling mode, or None if the request is not profiled
+        """
+        requested = headers.get("x-profile")
+        if requested is not None:
+            if self.check_token(headers.get("x-admin-token")):
+                return requested if requested in MODES else self.mode
+            logger.warning("Ignoring X-Profile without a valid X-Admin-Token")
+        with self._lock:
+            if self._remaining > 0:
+                self._remaining -= 1
+                return self.mode
+            if self._sample_rate > 0 and random.random() < self._sample_rate:
+                return self.mode
+        return None
+
+    def begin(self, path: str, mode: str) -> tuple:
+        """
+        Starts profiling the current request.
+
+        Returns:
+            tuple: (the ProfileSession, token to pass to end())
+        """
+        session = ProfileSession(path, mode)
+        with self._lock:
+            self._active.add(session)
+            if mode == "sampler":
+                if self._sampler is None or not self._sampler.is_alive():
+                    self._sampler = threading.Thread(target=self._sample_loop, name="request-profiler", daemon=True)
+                    self._sampler.start()
+                self._wake.set()
+        return session, _session.set(session)
+
+    def end(self, session: ProfileSession, token) -> None:
+        """Stops profiling the request (its profile is written by write())."""
+        _session.reset(token)
+        with self._lock:
+            self._active.discard(session)
+
+    def _sample_loop(self) -> None:
+        """Samples the stacks of threads running profiled calls, forever."""
+        while True:
+            self._wake.wait()
+            time.sleep(self.interval_s)
+            with self._lock:
+                sessions = [s for s in self._active if s.mode == "sampler"]
+                if not sessions:
+                    self._wake.clear()
+            try:
+                self._sample(sessions)
+            except Exception as e:
+                # One bad sample must not stop profiling for good
+                with self._lock:
+                    self._sample_errors += 1
+                    first = self._sample_errors == 1
+                if first:
+                    logger.error("Profiler sample failed (further failures are only counted): %s", str(e))
+
+    @staticmethod
+    def _sample(sessions: List[ProfileSession]) -> None:
+        """Adds one stack sample of every thread running a profiled call."""
+        if not any(session.threads for session in sessions):
+            return
+        frames = sys._current_frames()
+        try:
+            for session in sessions:
+                for ident, root in list(session.threads.items()):
+                    frame = frames.get(ident)
+                    stack = _collapse(frame, root) if frame is not None else None
+                    if stack is not None:
+                        session.samples[stack] += 1
+        finally:
+            del frames
+
+    def write(self, session: ProfileSession, trace: Optional[Dict[str, Any]] = None) -> List[str]:
+        """
+        Writes a finished request's profile to the output directory.
+
+        Args:
+            session: The request's ProfileSession
+            trace: The request's trace (RequestTrace.to_dict()), if traced
+
+        Returns:
+            list: Paths of the files written
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        slug = session.path.strip("/").replace("/", "-") or "root"
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(session.started_at))
+        base = os.path.join(self.output_dir, f"{stamp}_{slug}_{session.id}")
+        files = []
+
+        if session.mode == "cprofile" and session.profiles:
+            stats = pstats.Stats(session.profiles[0])
+            for profile in session.profiles[1:]:
+                stats.add(profile)
+            stats.dump_stats(base + ".pstats")
+            files.append(base + ".pstats")
+        elif session.mode == "sampler" and session.samples:
+            with open(base + ".collapsed", "w") as f:
+                for stack, count in session.samples.most_common():
+                    f.write(f"{stack} {count}\n")
+            files.append(base + ".collapsed")
+
+        report = {
+            "id": session.id,
+            "path": session.path,
+            "mode": session.mode,
+            "status_code": session.status_code,
+            "started_at": session.started_at,
+            "duration_ms": session.elapsed_ms(),
+            "sample_interval_ms": self.interval_s * 1000 if session.mode == "sampler" else None,
+            "samples": sum(session.samples.values()) if session.mode == "sampler" else None,
+            "calls": list(session.calls),
+            "trace": trace,
+        }
+        with open(base + ".json", "w") as f:
+            json.dump(report, f, indent=2)
+        files.append(base + ".json")
+
+        with self._lock:
+            self._profiled += 1
+            self._recent.append({"id": session.id, "path": session.path, "mode": session.mode,
+                                 "at": session.started_at, "files": files})
+            expired = self._recent.popleft() if len(self._recent) > self.keep else None
+        if expired is not None:
+            for path in expired["files"]:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        logger.info("Profiled %s (%s): %s", session.path, session.mode, ", ".join(files))
+        return files
+
+    def record_failure(self) -> None:
+        """Counts a profile that could not be written."""
+        with self._lock:
+            self._failed += 1
+
+    def status(self) -> Dict[str, Any]:
+        """
+        Returns profiler state.
+
+        Returns:
+            dict: mode, requests left to profile, sample rate, when it was
+                  armed, profiles written / failed, stack samples that
+                  failed, the output directory and the most recent
+                  profiles (newest first)
+        """
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "remaining": self._remaining,
+                "sample_rate": self._sample_rate,
+                "armed_at": self._armed_at,
+                "active": len(self._active),
+                "profiled": self._profiled,
+                "failed": self._failed,
+                "sample_errors": self._sample_errors,
+                "output_dir": os.path.abspath(self.output_dir),
+                "sample_interval_ms": self.interval_s * 1000,
+                "recent": list(reversed(self._recent))[:20],
+            }
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware profiling the requests to selected paths that the
+    RequestProfiler selects, and writing their profiles after the response.
+
+    It must run inside ServerTimingMiddleware, so the request's trace is
+    current when the profile is written.
+
+    Attributes:
+        profiler (RequestProfiler): Selects requests and writes profiles
+        paths (frozenset): Request paths that may be profiled
+    """
+
+    def __init__(self, app, profiler: RequestProfiler, paths: Iterable[str]):
+        """
+        Initialize the ProfilingMiddleware.
+
+        Args:
+            app: The wrapped ASGI application
+            profiler: Selects requests and writes profiles
+            paths: Request paths that may be profiled
+        """
+        self.app = app
+        self.profiler = profiler
+        self.paths = frozenset(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        headers = {key.decode("latin-1").lower(): value.decode("latin-1") for key, value in scope["headers"]}
+        mode = self.profiler.select(headers)
+        if mode is None:
+            await self.app(scope, receive, send)
+            return
+
+        session, token = self.profiler.begin(scope["path"], mode)
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                session.status_code = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"x-profile-id", session.id.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            self.profiler.end(session, token)
+            trace = current_trace()
+            try:
+                await asyncio.to_thread(self.profiler.write, session, trace.to_dict() if trace is not None else None)
+            except Exception as e:
+                self.profiler.record_failure()
+                logger.error("Could not write profile %s: %s", session.id, str(e))
@@ -0,0 +1,107 @@
+"""
+Stage Timer Module
+===================
+Per-request timing of pipeline stages.
+
+/attendance/verify runs its stages partly in parallel (decoding overlaps
+the GPS/Bluetooth checks, face verification overlaps OCR), so a single
+request duration no longer says where time went. This module provides:
+- StageTimer, recording the wall-clock duration of each named stage,
+  whether it runs inline, in a thread or as a concurrent task
+- Starting stages as tasks and cancelling the outstanding ones when a
+  mandatory check fails, with a record of what was cancelled
+"""
+
+import time
+import asyncio
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, List
+
+
+class StageTimer:
+    """
+    Records how long each stage of one request took.
+
+    Attributes:
+        stages (dict): Stage name -> duration in milliseconds
+        cancelled (list): Stages cancelled before they finished
+    """
+
+    def __init__(self):
+        """Initialize the StageTimer; the request clock starts now."""
+        self.stages: Dict[str, float] = {}
+        self.cancelled: List[str] = []
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Times the enclosed block as stage `name`.
+
+        A stage cancelled while running is listed in `cancelled` instead of
+        getting a duration.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        except asyncio.CancelledError:
+            if name not in self.cancelled:
+                self.cancelled.append(name)
+            raise
+        finally:
+            if name not in self.cancelled:
+                self.stages[name] = round((time.perf_counter() - start) * 1000, 2)
+
+    async def run(self, name: str, func: Callable[..., Awaitable], *args: Any, **kwargs: Any) -> Any:
+        """
+        Awaits func(*args, **kwargs) as stage `name` and returns its result.
+
+        Wrap it in asyncio.create_task() to run the stage concurrently. The
+        awaitable is only created once the task starts, so a task cancelled
+        before it ran leaves nothing behind.
+        """
+        with self.stage(name):
+            return await func(*args, **kwargs)
+
+    def start(self, name: str, func: Callable[..., Awaitable], *args: Any, **kwargs: Any) -> asyncio.Task:
+        """
+        Starts stage `name` as a concurrent task (see run()).
+
+        Returns:
+            asyncio.Task: The running stage; cancel it with cancel()
+        """
+        task = asyncio.create_task(self.run(name, func, *args, **kwargs))
+        self._tasks[name] = task
+        return task
+
+    def cancel(self, *names: str) -> None:
+        """
+        Cancels started stages that have not finished (all of them if no
+        names are given) and lists them as cancelled right away.
+
+        A stage running in a worker thread cannot be interrupted: the thread
+        finishes its call, but the result is discarded and nobody waits.
+        """
+        for name, task in self._tasks.items():
+            if (not names or name in names) and not task.done():
+                task.cancel()
+                if name not in self.cancelled:
+                    self.cancelled.append(name)
+
+    def elapsed_ms(self) -> float:
+        """Milliseconds since the timer was created."""
+        return round((time.perf_counter() - self._start) * 1000, 2)
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Returns the timing breakdown.
+
+        Returns:
+            dict: stages_ms (stage -> ms, in completion order), total_ms and,
+                  if any, the cancelled stages
+        """
+        summary = {"stages_ms": dict(self.stages), "total_ms": self.elapsed_ms()}
+        if self.cancelled:
+            summary["cancelled"] = list(self.cancelled)
+        return summary
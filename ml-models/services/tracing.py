@@ -0,0 +1,169 @@
+"""
+Request Tracing Module
+=======================
+Per-request stage traces and the Server-Timing header.
+
+/metrics shows where time goes on average; a slow request still has to
+be attributed to a stage. Every stage recorded for the metrics (see
+metrics.py) also lands in the trace of the request that ran it. This
+module provides:
+- RequestTrace, the spans (stage, start offset, duration, thread) of one
+  request, collected from the request's tasks and worker threads through
+  a context variable
+- A Server-Timing header with the summed duration of each stage, readable
+  in browser dev tools, the admin dashboard and load-test tools
+- The full trace as a dict for the opt-in debug flag of the endpoints
+- ServerTimingMiddleware, starting a trace for selected paths and adding
+  the header to their responses
+"""
+
+import time
+import threading
+from contextvars import ContextVar
+from typing import Any, Dict, Iterable, List, Optional
+
+# Trace of the current request (None outside traced requests)
+_trace: ContextVar[Optional["RequestTrace"]] = ContextVar("request_trace", default=None)
+
+
+class RequestTrace:
+    """
+    The stage spans of one request.
+
+    Spans may be added from any thread or task that inherited the request's
+    context; list appends are atomic, so no lock is taken.
+
+    Attributes:
+        spans (list): (stage, start offset in s, duration in s, thread name)
+    """
+
+    # Spans kept per request (a runaway loop must not grow the trace forever)
+    MAX_SPANS = 512
+
+    def __init__(self):
+        """Initialize the RequestTrace; the request clock starts now."""
+        self.spans: List[tuple] = []
+        self._start = time.perf_counter()
+
+    def add(self, stage: str, seconds: float, start: Optional[float] = None) -> None:
+        """
+        Adds a span.
+
+        Args:
+            stage: Stage name
+            seconds: Duration in seconds
+            start: time.perf_counter() at which the stage started
+                   (None = it ended just now)
+        """
+        if len(self.spans) >= self.MAX_SPANS:
+            return
+        if start is None:
+            start = time.perf_counter() - seconds
+        self.spans.append((stage, start - self._start, seconds, threading.current_thread().name))
+
+    def elapsed_ms(self) -> float:
+        """Milliseconds since the trace started."""
+        return round((time.perf_counter() - self._start) * 1000, 2)
+
+    def stage_totals(self) -> Dict[str, float]:
+        """Summed milliseconds per stage, in order of first appearance."""
+        totals: Dict[str, float] = {}
+        for stage, _, seconds, _ in list(self.spans):
+            totals[stage] = totals.get(stage, 0.0) + seconds * 1000
+        return {stage: round(ms, 3) for stage, ms in totals.items()}
+
+    def server_timing(self) -> str:
+        """
+        Renders the Server-Timing header value.
+
+        Returns:
+            str: One "<stage>;dur=<ms>" entry per stage, plus "total"
+        """
+        entries = [f"{stage};dur={ms}" for stage, ms in self.stage_totals().items()]
+        entries.append(f"total;dur={self.elapsed_ms()}")
+        return ", ".join(entries)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Returns the full trace.
+
+        Returns:
+            dict: total_ms, stages_ms (summed per stage) and spans (stage,
+                  start_ms from the start of the request, duration_ms,
+                  thread), ordered by start
+        """
+        spans = sorted(list(self.spans), key=lambda span: span[1])
+        return {
+            "total_ms": self.elapsed_ms(),
+            "stages_ms": self.stage_totals(),
+            "spans": [
+                {
+                    "stage": stage,
+                    "start_ms": round(offset * 1000, 3),
+                    "duration_ms": round(seconds * 1000, 3),
+                    "thread": thread,
+                }
+                for stage, offset, seconds, thread in spans
+            ],
+        }
+
+
+def current_trace() -> Optional[RequestTrace]:
+    """The current request's trace, or None if the request is not traced."""
+    return _trace.get()
+
+
+def start_trace() -> tuple:
+    """
+    Starts a trace for the current context.
+
+    Returns:
+        tuple: (the RequestTrace, token to pass to end_trace())
+    """
+    trace = RequestTrace()
+    return trace, _trace.set(trace)
+
+
+def end_trace(token) -> None:
+    """Restores the trace that was current before start_trace()."""
+    _trace.reset(token)
+
+
+class ServerTimingMiddleware:
+    """
+    ASGI middleware tracing requests to selected paths and adding a
+    Server-Timing header to their responses.
+
+    Attributes:
+        paths (frozenset): Request paths that are traced
+    """
+
+    def __init__(self, app, paths: Iterable[str]):
+        """
+        Initialize the ServerTimingMiddleware.
+
+        Args:
+            app: The wrapped ASGI application
+            paths: Request paths that are traced
+        """
+        self.app = app
+        self.paths = frozenset(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        trace, token = start_trace()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", trace.server_timing().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            end_trace(token)
@@ -0,0 +1,200 @@
+"""
+Upload Buffer Module
+=====================
+Bounded, in-memory handling of image uploads.
+
+Uploads used to be copied to ./temp_uploads, only for the next stage to
+read them back from disk. This module provides:
+- Image type sniffing from the first bytes of an upload (JPEG, PNG, WebP,
+  BMP, TIFF, HEIC/HEIF)
+- read_image(), which reads an upload in chunks into a single buffer,
+  rejecting non-images after the first chunk and oversized files as soon as
+  they pass the limit, and returns a memoryview the image loader decodes
+  from directly
+- UploadLimitMiddleware, which caps the request body while it is still
+  streaming in, before the multipart parser has buffered any of it
+"""
+
+import json
+import logging
+from typing import Iterable, Optional
+
+# Configure module-level logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Bytes read from an upload per call
+CHUNK_SIZE = 64 * 1024
+
+# Declared content types that say nothing about the payload (sniffed instead)
+GENERIC_CONTENT_TYPES = ("", "application/octet-stream", "binary/octet-stream")
+
+# ISO-BMFF brands of HEIC/HEIF/AVIF still images
+_HEIF_BRANDS = (b"heic", b"heix", b"hevc", b"hevx", b"heim", b"heis", b"mif1", b"msf1", b"avif")
+
+
+class UploadRejectedError(ValueError):
+    """Raised when an upload is refused; status_code is the HTTP status to answer with."""
+
+    status_code = 400
+
+
+class UploadTooLargeError(UploadRejectedError):
+    """Raised when an upload exceeds the size limit."""
+
+    status_code = 413
+
+
+class UnsupportedUploadError(UploadRejectedError):
+    """Raised when an upload is empty or not an image."""
+
+    status_code = 415
+
+
+def sniff_image_format(head: bytes) -> Optional[str]:
+    """
+    Identifies an image format from its leading bytes.
+
+    Args:
+        head: The first bytes of the upload (16 are enough)
+
+    Returns:
+        str: "JPEG", "PNG", "WEBP", "BMP", "TIFF" or "HEIF", or None if the
+             bytes are not a supported image
+    """
+    if head[:3] == b"\xff\xd8\xff":
+        return "JPEG"
+    if head[:8] == b"\x89PNG\r\n\x1a\n":
+        return "PNG"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "WEBP"
+    if head[:2] == b"BM":
+        return "BMP"
+    if head[:4] in (b"II*\x00", b"MM\x00*"):
+        return "TIFF"
+    if head[4:8] == b"ftyp" and head[8:12] in _HEIF_BRANDS:
+        return "HEIF"
+    return None
+
+
+async def read_image(upload, max_bytes: Optional[int] = None, chunk_size: int = CHUNK_SIZE) -> memoryview:
+    """
+    Reads an image upload into memory, validating it while it is read.
+
+    The declared content type and size are checked before anything is read,
+    the magic bytes after the first chunk and the running size after every
+    chunk, so a rejected upload is never copied out in full.
+
+    Args:
+        upload: The upload (Starlette/FastAPI UploadFile: async read(),
+                filename, content_type and size)
+        max_bytes: Size limit in bytes (None or 0 = no limit)
+        chunk_size: Bytes read per call
+
+    Returns:
+        memoryview: The encoded image, without a further copy
+
+    Raises:
+        UploadTooLargeError: If the upload is larger than max_bytes
+        UnsupportedUploadError: If the upload is empty or not an image
+    """
+    name = upload.filename or "upload"
+    declared = (upload.content_type or "").split(";")[0].strip().lower()
+    if not declared.startswith("image/") and declared not in GENERIC_CONTENT_TYPES:
+        raise UnsupportedUploadError(f"{name}: expected an image, got {declared}")
+    if max_bytes and upload.size is not None and upload.size > max_bytes:
+        raise UploadTooLargeError(f"{name}: upload is {upload.size} bytes; limit is {max_bytes} bytes")
+
+    buffer = bytearray(await upload.read(chunk_size))
+    if not buffer:
+        raise UnsupportedUploadError(f"{name}: upload is empty")
+    if sniff_image_format(buffer[:16]) is None:
+        raise UnsupportedUploadError(f"{name}: not a JPEG, PNG, WebP, BMP, TIFF or HEIC image")
+
+    while True:
+        chunk = await upload.read(chunk_size)
+        if not chunk:
+            break
+        buffer += chunk
+        if max_bytes and len(buffer) > max_bytes:
+            raise UploadTooLargeError(f"{name}: upload exceeds the limit of {max_bytes} bytes")
+
+    return memoryview(buffer)
+
+
+class UploadLimitMiddleware:
+    """
+    ASGI middleware capping the request body of upload endpoints.
+
+    A declared Content-Length above the limit is answered with 413 before
+    the body is read. Otherwise the body is counted as it streams in; once
+    it passes the limit the client gets 413, and the application sees a
+    disconnect, so the multipart parser stops buffering.
+
+    Attributes:
+        paths (frozenset): Request paths the limit applies to
+        max_bytes (int): Request body limit in bytes (0 = no limit)
+    """
+
+    def __init__(self, app, paths: Iterable[str], max_bytes: int):
+        """
+        Initialize the UploadLimitMiddleware.
+
+        Args:
+            app: The wrapped ASGI application
+            paths: Request paths the limit applies to
+            max_bytes: Request body limit in bytes (0 = no limit)
+        """
+        self.app = app
+        self.paths = frozenset(paths)
+        self.max_bytes = max_bytes
+
+    async def _reject(self, send) -> None:
+        """Sends the 413 response."""
+        body = json.dumps({"detail": f"Request body exceeds the limit of {self.max_bytes} bytes"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"connection", b"close"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.max_bytes or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length and content_length.isdigit() and int(content_length) > self.max_bytes:
+            logger.warning("Rejected %s: Content-Length %s exceeds %d bytes",
+                           scope["path"], content_length.decode(), self.max_bytes)
+            await self._reject(send)
+            return
+
+        received = 0
+        rejected = False
+
+        async def limited_receive():
+            nonlocal received, rejected
+            if rejected:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    rejected = True
+                    logger.warning("Rejected %s: body exceeds %d bytes", scope["path"], self.max_bytes)
+                    await self._reject(send)
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message):
+            # The client already has its 413; drop whatever the app answers
+            if not rejected:
+                await send(message)
+
+        await self.app(scope, limited_receive, guarded_send)
@@ -0,0 +1,114 @@
+"""
+Admission Control Test
+=======================
+Checks that AdmissionMiddleware sheds requests with 429 / 503 / 504 and
+Retry-After, and keeps upload time out of the service time estimate.
+
+Usage:
+    python -m pytest test_admission.py -v
+"""
+
+import json
+import time
+import asyncio
+
+from services import deadline
+from services.admission import AdmissionController, AdmissionMiddleware
+
+
+def _app(hold_s: float):
+    """ASGI app reading the whole body, then holding its slot for hold_s."""
+    async def app(scope, receive, send):
+        more_body = True
+        while more_body:
+            more_body = (await receive()).get("more_body", False)
+        await asyncio.sleep(hold_s)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+    return app
+
+
+async def _call(middleware, chunk_delay_s: float = 0.0, chunks: int = 1):
+    """Sends one POST /verify through the middleware; returns (status, headers, body)."""
+    remaining = [chunks]
+
+    async def receive():
+        await asyncio.sleep(chunk_delay_s)
+        remaining[0] -= 1
+        return {"type": "http.request", "body": b"x", "more_body": remaining[0] > 0}
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    await middleware({"type": "http", "method": "POST", "path": "/verify", "headers": []}, receive, send)
+    headers = dict(sent[0].get("headers", []))
+    body = json.loads(sent[1]["body"] or b"{}")
+    return sent[0]["status"], headers, body
+
+
+def test_full_queue_is_shed_with_429():
+    async def scenario():
+        controller = AdmissionController("test", max_concurrent=1, max_queued=1, max_wait_s=5)
+        middleware = AdmissionMiddleware(_app(0.1), {"/verify": controller})
+        results = await asyncio.gather(*(_call(middleware) for _ in range(3)))
+
+        statuses = sorted(status for status, _, _ in results)
+        assert statuses == [200, 200, 429]
+        status, headers, body = next(r for r in results if r[0] == 429)
+        assert body["reason"] == "queue_full"
+        assert int(headers[b"retry-after"]) >= 1
+
+    asyncio.run(scenario())
+
+
+def test_wait_over_budget_is_shed_with_503():
+    async def scenario():
+        controller = AdmissionController("test", max_concurrent=1, max_queued=5, max_wait_s=0.05)
+        middleware = AdmissionMiddleware(_app(0.2), {"/verify": controller})
+        results = await asyncio.gather(*(_call(middleware) for _ in range(2)))
+
+        assert sorted(status for status, _, _ in results) == [200, 503]
+        status, headers, body = next(r for r in results if r[0] == 503)
+        assert body["reason"] == "wait_timeout"
+        assert b"retry-after" in headers
+
+        # The service time is now known: a request expected to wait past
+        # the budget is shed up front
+        results = await asyncio.gather(*(_call(middleware) for _ in range(2)))
+        assert next(body for status, _, body in results if status == 503)["reason"] == "wait_budget"
+
+    asyncio.run(scenario())
+
+
+def test_request_past_its_deadline_is_dropped_with_504():
+    async def scenario():
+        controller = AdmissionController("test", max_concurrent=1, max_queued=5, max_wait_s=5)
+        middleware = AdmissionMiddleware(_app(0.2), {"/verify": controller})
+
+        async def with_deadline(budget_s):
+            token = deadline.set_deadline(time.monotonic() + budget_s)
+            try:
+                return await _call(middleware)
+            finally:
+                deadline.reset(token)
+
+        results = await asyncio.gather(_call(middleware), with_deadline(0.05))
+        assert [status for status, _, _ in results] == [200, 504]
+        assert results[1][2]["reason"] == "deadline"
+        assert controller.stats()["rejected"]["deadline"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_upload_time_is_not_service_time():
+    async def scenario():
+        controller = AdmissionController("test", max_concurrent=1, max_queued=1, max_wait_s=5)
+        middleware = AdmissionMiddleware(_app(0.05), {"/verify": controller})
+        status, _, _ = await _call(middleware, chunk_delay_s=0.1, chunks=3)
+
+        assert status == 200
+        assert controller.stats()["avg_service_ms"] < 150
+
+    asyncio.run(scenario())
@@ -0,0 +1,104 @@
+"""
+Brownout Test
+==============
+Checks that the brownout controller steps down under load, holds each
+tier for hold_s, and only steps back up once load is below the exit
+thresholds (hysteresis).
+
+Usage:
+    python -m pytest test_brownout.py -v
+"""
+
+import types
+
+import pytest
+
+from services import brownout as brownout_module
+from services.brownout import BrownoutController, BrownoutTier
+
+
+class _Clock:
+    """Stand-in for time.monotonic() that only moves when told to."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = _Clock()
+    monkeypatch.setattr(brownout_module.time, "monotonic", fake)
+    return fake
+
+
+def _controller(depth: dict, **thresholds) -> BrownoutController:
+    tiers = [BrownoutTier(name, types.SimpleNamespace(model_name=model))
+             for name, model in (("full", "VGG-Face"), ("cheap_model", "SFace"))]
+    settings = dict(enter_depth=10, exit_depth=2, enter_p95_ms=3000, exit_p95_ms=1000, hold_s=15)
+    settings.update(thresholds)
+    return BrownoutController(tiers, depth_fn=lambda: depth["value"], **settings)
+
+
+def _select_after(controller: BrownoutController, clock: _Clock, seconds: float) -> str:
+    clock.now += seconds
+    return controller.select().name
+
+
+def test_steps_down_on_depth_and_holds(clock):
+    depth = {"value": 0}
+    controller = _controller(depth)
+    assert controller.select().name == "full"
+
+    depth["value"] = 10
+    assert _select_after(controller, clock, 1) == "cheap_model"
+
+    # Load is gone, but the tier is held for hold_s after the switch
+    depth["value"] = 0
+    assert _select_after(controller, clock, 5) == "cheap_model"
+    assert _select_after(controller, clock, 11) == "full"
+    assert [s["to"] for s in controller.stats()["switches"]] == ["cheap_model", "full"]
+
+
+def test_stays_down_between_exit_and_enter_thresholds(clock):
+    depth = {"value": 12}
+    controller = _controller(depth, hold_s=0)
+    assert _select_after(controller, clock, 1) == "cheap_model"
+
+    # Below the enter threshold but above the exit threshold: no flapping
+    depth["value"] = 5
+    for _ in range(5):
+        assert _select_after(controller, clock, 1) == "cheap_model"
+
+    depth["value"] = 2
+    assert _select_after(controller, clock, 1) == "full"
+
+
+def test_steps_down_on_p95_latency(clock):
+    controller = _controller({"value": 0}, hold_s=0)
+    full = controller.select()
+    for _ in range(BrownoutController.MIN_SAMPLES):
+        controller.record(full, 5000.0)
+
+    assert _select_after(controller, clock, 1) == "cheap_model"
+    # Samples are per tier: the new tier starts without any
+    assert controller.stats()["samples"] == 0
+
+
+def test_load_is_evaluated_at_most_once_per_interval(clock):
+    depth = {"value": 0}
+    controller = _controller(depth, hold_s=0)
+    controller.select()
+
+    depth["value"] = 10
+    assert _select_after(controller, clock, BrownoutController.EVALUATE_INTERVAL_S / 2) == "full"
+    assert _select_after(controller, clock, BrownoutController.EVALUATE_INTERVAL_S / 2) == "cheap_model"
+
+
+def test_unusable_tier_falls_back_to_a_higher_one(clock):
+    controller = _controller({"value": 20}, hold_s=0)
+    clock.now += 1
+    assert controller.select(usable=lambda tier: tier.name == "full").name == "full"
+    assert controller.stats()["current"] == "cheap_model"
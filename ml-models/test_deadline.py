@@ -0,0 +1,104 @@
+"""
+Deadline Test
+==============
+Checks deadline header parsing, drop counting and the 504 for requests
+that arrive already expired.
+
+Usage:
+    python -m pytest test_deadline.py -v
+"""
+
+import time
+import pickle
+import asyncio
+
+import pytest
+
+from services import deadline
+from services.deadline import DeadlineExceeded, DeadlineMiddleware
+
+
+def test_timeout_header_is_relative_to_arrival():
+    parsed = deadline.parse_headers({"x-request-timeout-ms": "1500"})
+    assert parsed - time.monotonic() == pytest.approx(1.5, abs=0.05)
+
+
+def test_absolute_deadline_header_is_converted_to_monotonic():
+    parsed = deadline.parse_headers({"x-request-deadline": str((time.time() + 2) * 1000)})
+    assert parsed - time.monotonic() == pytest.approx(2.0, abs=0.05)
+
+
+def test_timeout_header_wins_and_malformed_headers_are_ignored():
+    both = deadline.parse_headers({"x-request-timeout-ms": "1000",
+                                   "x-request-deadline": str((time.time() + 60) * 1000)})
+    assert both - time.monotonic() == pytest.approx(1.0, abs=0.05)
+    assert deadline.parse_headers({"x-request-timeout-ms": "soon"}) is None
+    assert deadline.parse_headers({}) is None
+
+
+def test_check_deadline_drops_and_counts_expired_work():
+    before = deadline.deadline_stats()["dropped"].get("test_stage", 0)
+
+    token = deadline.set_deadline(time.monotonic() + 60)
+    try:
+        deadline.check_deadline("test_stage")
+        assert deadline.remaining_budget() > 59
+    finally:
+        deadline.reset(token)
+
+    token = deadline.set_deadline(time.monotonic() - 1)
+    try:
+        with pytest.raises(DeadlineExceeded) as excinfo:
+            deadline.check_deadline("test_stage")
+        assert excinfo.value.stage == "test_stage"
+    finally:
+        deadline.reset(token)
+
+    assert deadline.deadline_stats()["dropped"]["test_stage"] == before + 1
+    # Without a deadline nothing is ever dropped
+    deadline.check_deadline("test_stage")
+    assert deadline.remaining_budget() is None
+
+
+def test_deadline_exceeded_survives_pickling():
+    # Worker processes send it back to the API process
+    error = pickle.loads(pickle.dumps(DeadlineExceeded("inference_worker")))
+    assert error.stage == "inference_worker"
+    assert str(error) == "Request deadline exceeded before inference_worker"
+
+
+def _run_middleware(headers: dict, default_timeout_s: float = 0.0):
+    seen = {}
+
+    async def app(scope, receive, send):
+        seen["budget"] = deadline.remaining_budget()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    scope = {"type": "http", "method": "POST", "path": "/face/verify",
+             "headers": [(k.encode("latin-1"), v.encode("latin-1")) for k, v in headers.items()]}
+    asyncio.run(DeadlineMiddleware(app, default_timeout_s=default_timeout_s)(scope, receive, send))
+    return sent[0]["status"], seen.get("budget")
+
+
+def test_middleware_sets_the_request_deadline():
+    status, budget = _run_middleware({"x-request-timeout-ms": "2000"})
+    assert status == 200 and budget == pytest.approx(2.0, abs=0.1)
+
+    status, budget = _run_middleware({}, default_timeout_s=5)
+    assert status == 200 and budget == pytest.approx(5.0, abs=0.1)
+
+
+def test_middleware_rejects_requests_expired_on_arrival():
+    before = deadline.deadline_stats()["dropped"].get("arrival", 0)
+    status, budget = _run_middleware({"x-request-deadline": str((time.time() - 1) * 1000)})
+    assert status == 504 and budget is None
+    assert deadline.deadline_stats()["dropped"]["arrival"] == before + 1
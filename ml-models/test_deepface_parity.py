@@ -0,0 +1,73 @@
+"""
+DeepFace Parity Test
+=====================
+Checks that FaceVerifier's own embedding path (crop_face, _prepare_face,
+_forward) reproduces DeepFace.represent - the path MODEL_THRESHOLDS were
+calibrated on - for the same detected face.
+
+Each face photo in PARITY_FACES_DIR is detected once with DeepFace
+(opencv backend, aligned); the same facial area and eyes are then cropped
+and embedded by FaceVerifier, and compared with DeepFace.represent on the
+photo. Skipped when DeepFace is not installed or PARITY_FACES_DIR is unset.
+
+Usage:
+    PARITY_FACES_DIR=./faces python -m pytest test_deepface_parity.py -v
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+from services.face_detectors import crop_face
+from services.face_service import FaceVerifier, deepface_available, decode_image, load_deepface
+
+PARITY_FACES_DIR = os.getenv("PARITY_FACES_DIR")
+PARITY_MODELS = [m.strip() for m in os.getenv("PARITY_MODELS", "VGG-Face").split(",") if m.strip()]
+
+# Maximum cosine distance between the two embeddings of the same face:
+# interpolation and one-pixel rounding of the rotated box only, far below
+# the gap between threshold modes
+TOLERANCE = 0.01
+
+
+def _photos():
+    if not PARITY_FACES_DIR:
+        return []
+    return [os.path.join(PARITY_FACES_DIR, name) for name in sorted(os.listdir(PARITY_FACES_DIR))]
+
+
+@pytest.mark.skipif(not PARITY_FACES_DIR, reason="PARITY_FACES_DIR is not set")
+@pytest.mark.parametrize("model_name", PARITY_MODELS)
+def test_embedding_matches_deepface_represent(model_name):
+    if not deepface_available():
+        pytest.skip("DeepFace is not installed")
+    deepface = load_deepface()
+    verifier = FaceVerifier(model_name=model_name, detector_backend="opencv", detection_max_side=None)
+
+    compared = 0
+    for path in _photos():
+        image = decode_image(path)
+        if image is None:
+            continue
+        try:
+            expected = deepface.represent(img_path=image, model_name=model_name, detector_backend="opencv",
+                                          align=True, enforce_detection=True)
+            faces = deepface.extract_faces(img_path=image, detector_backend="opencv",
+                                           align=True, enforce_detection=True)
+        except ValueError:
+            continue
+
+        for face, reference in zip(faces, expected):
+            area = face["facial_area"]
+            detection = {key: area[key] for key in ("x", "y", "w", "h")}
+            for eye in ("left_eye", "right_eye"):
+                if area.get(eye) is not None:
+                    detection[eye] = area[eye]
+            actual = verifier._forward(verifier._prepare_face(crop_face(image, detection))[np.newaxis])[0]
+            distance = FaceVerifier.cosine_distance(actual, np.asarray(reference["embedding"], dtype=np.float32))
+            assert distance <= TOLERANCE, f"{os.path.basename(path)}: distance to DeepFace {distance:.5f}"
+            compared += 1
+
+    if not compared:
+        pytest.skip(f"No detectable faces in {PARITY_FACES_DIR}")
@@ -0,0 +1,33 @@
+"""
+Face Gallery Test
+==================
+Checks that enrolled templates stay attached to the student they were
+enrolled for, across reloads and removals.
+
+Usage:
+    python -m pytest test_face_gallery.py -v
+"""
+
+import numpy as np
+
+from services.face_gallery import FaceGallery
+
+MODEL = "Facenet512"
+
+
+def test_distinct_ids_do_not_share_a_template(tmp_path):
+    # Both IDs sanitize to the same file name "2021_CS_01"
+    first, second = "2021/CS/01", "2021_CS_01"
+    gallery = FaceGallery(storage_dir=str(tmp_path))
+    gallery.enroll(first, MODEL, np.full(4, 1.0))
+    gallery.enroll(second, MODEL, np.full(4, 2.0))
+
+    reloaded = FaceGallery(storage_dir=str(tmp_path))
+    np.testing.assert_array_equal(reloaded.get_embedding(first, MODEL), np.full(4, 1.0))
+    np.testing.assert_array_equal(reloaded.get_embedding(second, MODEL), np.full(4, 2.0))
+
+    assert reloaded.remove(second)
+    reloaded = FaceGallery(storage_dir=str(tmp_path))
+    np.testing.assert_array_equal(reloaded.get_embedding(first, MODEL), np.full(4, 1.0))
+    assert reloaded.get_embedding(second, MODEL) is None
+
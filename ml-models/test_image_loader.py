@@ -0,0 +1,93 @@
+"""
+Image Loader Test
+==================
+Checks reduced-resolution JPEG decoding, EXIF orientation handling and
+the pixel limit of load_image().
+
+Usage:
+    python -m pytest test_image_loader.py -v
+"""
+
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from services.image_loader import ImageTooLargeError, load_image, probe, reduction_for
+
+RED = (0, 0, 255)    # BGR
+BLUE = (255, 0, 0)
+
+
+def _encode(width: int, height: int, image_format: str = "JPEG", orientation: int = 1) -> bytes:
+    """Left half red, right half blue, with an optional EXIF orientation tag."""
+    img = Image.new("RGB", (width, height), (0, 0, 255))
+    img.paste((255, 0, 0), (0, 0, width // 2, height))
+    exif = Image.Exif()
+    if orientation != 1:
+        exif[0x0112] = orientation
+    buffer = io.BytesIO()
+    img.save(buffer, format=image_format, exif=exif.tobytes(), quality=95)
+    return buffer.getvalue()
+
+
+def _colour(image: np.ndarray, y: int, x: int) -> tuple:
+    return tuple(int(round(c / 255)) * 255 for c in image[y, x])
+
+
+@pytest.mark.parametrize("max_side, factor", [
+    (None, 1),
+    (4000, 1),
+    (2000, 2),
+    (1000, 4),
+    (400, 8),
+    (100, 8),   # never more than 1/8
+])
+def test_reduction_keeps_the_longest_side_above_max_side(max_side, factor):
+    assert reduction_for(4000, 3000, max_side)[0] == factor
+
+
+def test_jpeg_is_decoded_at_reduced_resolution():
+    data = _encode(1600, 1200)
+    assert load_image(data).shape == (1200, 1600, 3)
+    assert load_image(data, max_side=400).shape == (300, 400, 3)
+    # 1/4 would fall below 500 px, so 1/2 is used
+    assert load_image(data, max_side=500).shape == (600, 800, 3)
+
+
+def test_other_formats_are_decoded_at_full_size():
+    assert load_image(_encode(1600, 1200, "PNG"), max_side=400).shape == (1200, 1600, 3)
+
+
+@pytest.mark.parametrize("image_format", ["JPEG", "PNG", "WEBP"])
+def test_exif_orientation_is_applied(image_format):
+    data = _encode(80, 40, image_format, orientation=6)
+    assert probe(data)[3] == 6
+
+    # Rotated 90° clockwise: the red left half ends up on top
+    image = load_image(data)
+    assert image.shape[:2] == (80, 40)
+    assert _colour(image, 10, 20) == RED
+    assert _colour(image, 70, 20) == BLUE
+
+
+def test_orientation_is_applied_after_reduced_decoding():
+    data = _encode(1600, 800, orientation=8)
+    image = load_image(data, max_side=400)
+    # Rotated 90° counter-clockwise: the red left half ends up at the bottom
+    assert image.shape[:2] == (400, 200)
+    assert _colour(image, 350, 100) == RED
+    assert _colour(image, 50, 100) == BLUE
+
+
+def test_pixel_limit_is_checked_before_decoding():
+    data = _encode(1000, 1000)
+    with pytest.raises(ImageTooLargeError):
+        load_image(data, max_pixels=500_000)
+    assert load_image(data, max_pixels=0).shape == (1000, 1000, 3)
+
+
+def test_undecodable_input_returns_none():
+    assert load_image(b"") is None
+    assert load_image(b"definitely not an image") is None
@@ -0,0 +1,92 @@
+"""
+Job Queue Test
+===============
+Checks the attendance job queue's backpressure, result TTL and dropping
+of jobs whose request deadline passes while they wait.
+
+Usage:
+    python -m pytest test_job_queue.py -v
+"""
+
+import time
+import asyncio
+
+import pytest
+
+from services import deadline
+from services.job_queue import JobQueue, QueueFullError
+
+
+async def _sleep_job(seconds: float, value: str = "ok") -> str:
+    await asyncio.sleep(seconds)
+    return value
+
+
+async def _wait_finished(queue: JobQueue, job_id: str) -> dict:
+    async for status in queue.watch(job_id):
+        pass
+    return status
+
+
+def test_full_queue_rejects_with_retry_after():
+    async def scenario():
+        queue = JobQueue(workers=1, max_queued=2, name="test")
+        await queue.start()
+        try:
+            running = queue.submit(_sleep_job, 0.2)
+            await asyncio.sleep(0.01)  # the worker picks up the first job
+            queue.submit(_sleep_job, 0.2)
+            queue.submit(_sleep_job, 0.2)
+
+            with pytest.raises(QueueFullError) as excinfo:
+                queue.submit(_sleep_job, 0.2)
+            assert excinfo.value.retry_after >= 1
+            assert queue.stats()["rejected"] == 1
+
+            assert (await _wait_finished(queue, running["job_id"]))["result"] == "ok"
+            # A slot freed up: the next submission is accepted
+            queue.submit(_sleep_job, 0.0)
+        finally:
+            await queue.close()
+
+    asyncio.run(scenario())
+
+
+def test_results_expire_after_ttl():
+    async def scenario():
+        queue = JobQueue(workers=1, max_queued=4, result_ttl=0.05, name="test")
+        await queue.start()
+        try:
+            job = queue.submit(_sleep_job, 0.0, "done")
+            finished = await _wait_finished(queue, job["job_id"])
+            assert finished["status"] == "done" and finished["result"] == "done"
+
+            await asyncio.sleep(0.1)
+            assert queue.get(job["job_id"]) is None
+            assert queue.stats()["expired"] == 1
+        finally:
+            await queue.close()
+
+    asyncio.run(scenario())
+
+
+def test_job_past_its_deadline_is_dropped():
+    async def scenario():
+        queue = JobQueue(workers=1, max_queued=4, name="test")
+        await queue.start()
+        try:
+            queue.submit(_sleep_job, 0.1)
+            token = deadline.set_deadline(time.monotonic() + 0.02)
+            try:
+                late = queue.submit(_sleep_job, 0.0)
+            finally:
+                deadline.reset(token)
+
+            finished = await _wait_finished(queue, late["job_id"])
+            assert finished["status"] == "dropped"
+            assert "deadline" in finished["error"]
+            assert queue.stats()["dropped"] == 1
+        finally:
+            await queue.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,94 @@
+"""
+ONNX Parity Test
+=================
+Checks that the ONNX embedding backends reproduce the DeepFace (Keras)
+embeddings closely enough for MODEL_THRESHOLDS to keep their meaning.
+
+For every model exported to FACE_ONNX_MODEL_DIR (export_face_models.py),
+the same preprocessed faces are embedded by DeepFace and by each ONNX
+runtime / precision, and we compare:
+- the cosine distance between the two embeddings of the same face
+- the pairwise distances that verification thresholds are applied to
+
+Faces come from PARITY_FACES_DIR (face photos) when set, otherwise from
+random inputs of the model's input size. Skipped when DeepFace, the
+runtimes or the exported models are not available.
+
+Usage:
+    python -m pytest test_onnx_parity.py -v
+"""
+
+import os
+import itertools
+
+import numpy as np
+import pytest
+
+from services.face_service import FaceVerifier, deepface_available, decode_image
+from services.lazy_imports import module_available
+from services.onnx_embedder import model_paths
+
+ONNX_MODEL_DIR = os.getenv("FACE_ONNX_MODEL_DIR", "./models/onnx")
+PARITY_FACES_DIR = os.getenv("PARITY_FACES_DIR")
+
+# Maximum cosine distance between backends for the same face, and maximum
+# change of a pairwise distance (well below the gap between threshold modes)
+TOLERANCE = {
+    False: {"same_face": 1e-4, "pairwise": 1e-3},   # FP32
+    True: {"same_face": 0.02, "pairwise": 0.03},    # INT8
+}
+
+CASES = [
+    (model, runtime, int8)
+    for model in FaceVerifier.MODEL_THRESHOLDS
+    for runtime, int8 in (("onnxruntime", False), ("onnxruntime", True), ("opencv-dnn", False))
+    if os.path.exists(model_paths(ONNX_MODEL_DIR, model, int8)[0])
+]
+
+
+def _faces(reference: FaceVerifier, count: int = 8) -> np.ndarray:
+    """Preprocessed faces of the model's input size."""
+    if PARITY_FACES_DIR:
+        faces = []
+        for name in sorted(os.listdir(PARITY_FACES_DIR)):
+            image = decode_image(os.path.join(PARITY_FACES_DIR, name))
+            if image is None:
+                continue
+            try:
+                faces.append(reference._prepare_face(reference._detect_face(image)[0]))
+            except ValueError:
+                continue
+        if len(faces) >= 2:
+            return np.stack(faces).astype(np.float32)
+
+    height, width = reference._model_input_size()
+    return np.random.default_rng(0).random((count, height, width, 3), dtype=np.float32)
+
+
+@pytest.mark.skipif(not CASES, reason=f"No exported models in {ONNX_MODEL_DIR}")
+@pytest.mark.parametrize("model_name,runtime,int8", CASES)
+def test_onnx_matches_deepface(model_name, runtime, int8):
+    if not deepface_available():
+        pytest.skip("DeepFace is not installed")
+    if runtime == "onnxruntime" and not module_available("onnxruntime"):
+        pytest.skip("ONNX Runtime is not installed")
+
+    reference = FaceVerifier(model_name=model_name)
+    candidate = FaceVerifier(model_name=model_name, embedding_backend=runtime,
+                             onnx_model_dir=ONNX_MODEL_DIR, onnx_int8=int8)
+    assert candidate._model_input_size() == reference._model_input_size()
+
+    faces = _faces(reference)
+    expected = reference._forward(faces)
+    actual = candidate._forward(faces)
+    assert actual.shape == expected.shape
+
+    tolerance = TOLERANCE[int8]
+    same_face = [FaceVerifier.cosine_distance(a, e) for a, e in zip(actual, expected)]
+    assert max(same_face) <= tolerance["same_face"], f"same-face drift {max(same_face):.5f}"
+
+    drift = [
+        abs(FaceVerifier.cosine_distance(actual[i], actual[j]) - FaceVerifier.cosine_distance(expected[i], expected[j]))
+        for i, j in itertools.combinations(range(len(faces)), 2)
+    ]
+    assert max(drift) <= tolerance["pairwise"], f"pairwise distance drift {max(drift):.5f}"
@@ -0,0 +1,131 @@
+"""
+Upload Buffer Test
+===================
+Checks image type sniffing, read_image()'s early rejection of
+non-images and oversized uploads, and the streaming 413 of
+UploadLimitMiddleware.
+
+Usage:
+    python -m pytest test_upload_buffer.py -v
+"""
+
+import io
+import asyncio
+
+import pytest
+from starlette.datastructures import Headers, UploadFile
+
+from services.upload_buffer import (
+    UnsupportedUploadError, UploadLimitMiddleware, UploadTooLargeError, read_image, sniff_image_format
+)
+
+JPEG = b"\xff\xd8\xff\xe0" + b"\x00" * 60
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 60
+
+
+@pytest.mark.parametrize("head, expected", [
+    (JPEG, "JPEG"),
+    (PNG, "PNG"),
+    (b"RIFF\x00\x00\x00\x00WEBPVP8 ", "WEBP"),
+    (b"BM" + b"\x00" * 14, "BMP"),
+    (b"II*\x00" + b"\x00" * 12, "TIFF"),
+    (b"\x00\x00\x00\x18ftypheic\x00\x00\x00\x00", "HEIF"),
+    (b"%PDF-1.7\n" + b"\x00" * 7, None),
+    (b"", None),
+])
+def test_sniff_image_format(head, expected):
+    assert sniff_image_format(head[:16]) == expected
+
+
+def _upload(data: bytes, content_type: str = "image/jpeg", declare_size: bool = True) -> UploadFile:
+    return UploadFile(file=io.BytesIO(data), filename="selfie.jpg", size=len(data) if declare_size else None,
+                      headers=Headers({"content-type": content_type}))
+
+
+def test_read_image_returns_the_bytes():
+    data = JPEG * 100
+    view = asyncio.run(read_image(_upload(data), max_bytes=len(data), chunk_size=256))
+    assert isinstance(view, memoryview) and bytes(view) == data
+
+
+def test_read_image_sniffs_generic_content_types():
+    view = asyncio.run(read_image(_upload(PNG, content_type="application/octet-stream")))
+    assert bytes(view) == PNG
+
+
+@pytest.mark.parametrize("data, content_type", [
+    (b"%PDF-1.7\n" + b"\x00" * 100, "image/jpeg"),   # lies about its type
+    (JPEG, "application/pdf"),                        # declared as a non-image
+    (b"", "image/jpeg"),                              # empty
+])
+def test_read_image_rejects_non_images_with_415(data, content_type):
+    with pytest.raises(UnsupportedUploadError) as excinfo:
+        asyncio.run(read_image(_upload(data, content_type)))
+    assert excinfo.value.status_code == 415
+
+
+def test_read_image_rejects_oversized_uploads_while_reading():
+    data = JPEG * 100
+
+    with pytest.raises(UploadTooLargeError) as excinfo:
+        asyncio.run(read_image(_upload(data), max_bytes=1000))
+    assert excinfo.value.status_code == 413
+
+    # Without a declared size the limit is enforced chunk by chunk
+    upload = _upload(data, declare_size=False)
+    with pytest.raises(UploadTooLargeError):
+        asyncio.run(read_image(upload, max_bytes=1000, chunk_size=256))
+    assert upload.file.tell() < len(data)
+
+
+def _post(max_bytes, chunks, content_length=None, path="/face/verify"):
+    """Streams a request body in chunks through an UploadLimitMiddleware limiting /face/verify."""
+    messages = [{"type": "http.request", "body": chunk, "more_body": i < len(chunks) - 1}
+                for i, chunk in enumerate(chunks)]
+    state = {"app_received": 0, "app_disconnected": False}
+
+    async def app(scope, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                state["app_disconnected"] = True
+                break
+            state["app_received"] += len(message["body"])
+            if not message["more_body"]:
+                break
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    async def receive():
+        return messages.pop(0)
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    headers = [(b"content-length", str(content_length).encode())] if content_length is not None else []
+    scope = {"type": "http", "method": "POST", "path": path, "headers": headers}
+    asyncio.run(UploadLimitMiddleware(app, ["/face/verify"], max_bytes)(scope, receive, send))
+    return sent, state
+
+
+def test_body_within_the_limit_passes():
+    sent, state = _post(1000, [b"x" * 400, b"x" * 400])
+    assert sent[0]["status"] == 200 and state["app_received"] == 800
+
+
+def test_declared_content_length_over_the_limit_is_rejected_unread():
+    sent, state = _post(1000, [b"x" * 2000], content_length=2000)
+    assert sent[0]["status"] == 413 and state["app_received"] == 0
+
+
+def test_streaming_body_over_the_limit_is_cut_off():
+    sent, state = _post(1000, [b"x" * 600, b"x" * 600, b"x" * 600])
+    assert [m["status"] for m in sent if m["type"] == "http.response.start"] == [413]
+    assert state["app_disconnected"] and state["app_received"] == 600
+
+
+def test_other_paths_are_not_limited():
+    sent, state = _post(1000, [b"x" * 2000], content_length=2000, path="/health")
+    assert sent[0]["status"] == 200 and state["app_received"] == 2000